@@ -0,0 +1,179 @@
+import re
+
+
+"""
+Local, deterministic answer checking for run().
+
+The number is taken from the `Final Answer:` part of the model output (or a LaTeX \\boxed{...}).
+It understands thousands separators, units and currency signs, fractions (`1300/3`, `\\frac{1300}{3}`)
+and scientific notation (`1.2e5`, `1.2 × 10^5`). The comparison tolerance follows the precision of
+the expected answer: integers must match exactly, decimals up to their last printed digit.
+
+When the answer cannot be pinned down to one number the result is "ambiguous" and the caller
+falls back to the LLM check.
+"""
+
+_NUM = r"(?<![\w.])[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?:[eE][-+]?\d+)?|(?<![\w.])[-+]?\.\d+"
+_TOKEN = re.compile(
+    rf"(?P<sci>(?:{_NUM}))\s*(?:×|x|\*)\s*10\s*(?:\^|\*\*)\s*\{{?(?P<exp>[-+]?\d+)\}}?"
+    rf"|\\frac\{{(?P<fnum>{_NUM})\}}\{{(?P<fden>{_NUM})\}}"
+    rf"|(?P<num>{_NUM})\s*/\s*(?P<den>{_NUM})"
+    rf"|(?P<plain>{_NUM})"
+)
+_FINAL_ANSWER = re.compile(r"final\s+answer\s*\**\s*[:：]", re.IGNORECASE)
+_BOXED = re.compile(r"\\boxed\{((?:[^{}]|\{[^{}]*\})*)\}")
+_OBJECTIVE_WORDS = re.compile(
+    r"\b(?:objective|optimal value|profit|revenue|cost|total|maximum|minimum|max|min|answer)\b[^0-9\n+\-]{0,40}?$",
+    re.IGNORECASE,
+)
+# Expected answers such as "None" / "No Best Solution" mark problems without a feasible optimum
+_NO_SOLUTION = re.compile(
+    r"^\s*(?:none|no best solution)\s*$|\b(?:no (?:best |feasible |optimal )?solution|infeasible|unbounded)\b",
+    re.IGNORECASE,
+)
+
+
+class Number:
+    """A parsed number plus how it was written, which decides the comparison tolerance."""
+
+    def __init__(self, value: float, kind: str, decimals: int = 0):
+        self.value = value
+        self.kind = kind          # "integer", "decimal" or "fraction"
+        self.decimals = decimals
+
+    def __repr__(self):
+        return f"Number({self.value!r}, {self.kind})"
+
+
+def _to_float(literal: str) -> float:
+    return float(literal.replace(",", ""))
+
+
+def _decimals(literal: str) -> int:
+    mantissa = re.split(r"[eE]", literal)[0]
+    return len(mantissa.split(".")[1]) if "." in mantissa else 0
+
+
+def parse_numbers(text: str) -> list[Number]:
+    """All numbers in text, in order of appearance."""
+    text = text.replace("−", "-").replace("\\times", "×").replace("\\cdot", "×").replace("·", "×")
+    numbers = []
+    for m in _TOKEN.finditer(text):
+        if m.group("sci"):
+            literal = m.group("sci")
+            value = _to_float(literal) * 10 ** int(m.group("exp"))
+            numbers.append(Number(value, "decimal", max(0, _decimals(literal) - int(m.group("exp")))))
+        elif m.group("fnum") or m.group("num"):
+            num, den = (m.group("fnum"), m.group("fden")) if m.group("fnum") else (m.group("num"), m.group("den"))
+            if _to_float(den) == 0:
+                continue
+            value = _to_float(num) / _to_float(den)
+            numbers.append(Number(value, "integer" if float(value).is_integer() else "fraction"))
+        else:
+            literal = m.group("plain")
+            value = _to_float(literal)
+            is_integer = "." not in literal and "e" not in literal.lower()
+            numbers.append(Number(value, "integer" if is_integer else "decimal", _decimals(literal)))
+    return numbers
+
+
+def _final_answer_segment(text: str) -> str | None:
+    """Text after the last `Final Answer:` marker, up to the end of that paragraph."""
+    boxed = _BOXED.findall(text)
+    if boxed:
+        return boxed[-1]
+    markers = list(_FINAL_ANSWER.finditer(text))
+    if not markers:
+        return None
+    rest = text[markers[-1].end():].strip("\n")
+    paragraph = []
+    for line in rest.splitlines():
+        if not line.strip():
+            if paragraph:
+                break
+            continue
+        paragraph.append(line)
+    return "\n".join(paragraph).replace("**", "").replace("$", " ")
+
+
+def _consistent(numbers: list[Number]) -> bool:
+    """One value written several ways, e.g. `1300/3 ≈ 433.33`."""
+    values = [n.value for n in numbers]
+    return max(values) - min(values) <= max(0.005, 1e-4 * max(abs(v) for v in values))
+
+
+def _pick(segment: str, numbers: list[Number]) -> Number | None:
+    if _consistent(numbers):
+        return numbers[0]
+    # "x = 3, y = 4, maximum profit = 1,200": take the number labelled as the objective
+    if numbers:
+        # Parenthesised details (variable values, units) rarely hold the objective
+        outside = re.sub(r"\([^()]*\)", " ", segment)
+        outside_numbers = parse_numbers(outside)
+        if outside_numbers and _consistent(outside_numbers):
+            return outside_numbers[0]
+    labelled = [
+        m for m in _TOKEN.finditer(segment.replace("−", "-"))
+        if _OBJECTIVE_WORDS.search(segment[max(0, m.start() - 60):m.start()])
+    ]
+    if labelled:
+        return parse_numbers(labelled[-1].group(0))[0]
+    return None
+
+
+def extract_answer(text: str, require_marker: bool = True) -> tuple[Number | None, str | None]:
+    """
+    Args:
+        text (str): model output (or the content of an .ans.txt file with require_marker=False).
+
+    Returns:
+        tuple[Number | None, str | None]: the answer, or None plus the reason it is ambiguous.
+    """
+    segment = _final_answer_segment(text)
+    if segment is None:
+        if require_marker:
+            return None, "no 'Final Answer:' line"
+        segment = text
+    numbers = parse_numbers(segment)
+    if not numbers:  # also covers an empty \boxed{}
+        return None, "no number in the final answer"
+    picked = _pick(segment, numbers)
+    if picked is None:
+        return None, f"{len(numbers)} different numbers and none is labelled as the objective"
+    return picked, None
+
+
+def answers_match(predicted: Number, expected: Number) -> bool:
+    """Tolerance by the expected answer's type: exact for integers, last printed digit for decimals."""
+    diff = abs(predicted.value - expected.value)
+    if expected.kind in ("integer", "fraction"):
+        return diff <= 1e-6 * max(1.0, abs(expected.value))
+    return diff <= max(0.5 * 10 ** -expected.decimals + 1e-9, 1e-4 * abs(expected.value))
+
+
+def check_answer(final_answer: str, expected_text: str) -> dict:
+    """
+    Returns:
+        dict: status ("correct" / "incorrect" / "ambiguous"), llm_answer, correct_answer and,
+        when ambiguous, reason.
+    """
+    predicted, reason = extract_answer(final_answer)
+    if _NO_SOLUTION.search(expected_text) and not parse_numbers(expected_text):
+        segment = _final_answer_segment(final_answer)
+        result = {"llm_answer": predicted.value if predicted is not None else None, "correct_answer": expected_text.strip()}
+        if segment is not None and _NO_SOLUTION.search(segment):
+            return {"status": "correct", **result}
+        if predicted is not None:
+            return {"status": "incorrect", **result}
+        return {"status": "ambiguous", "reason": reason, **result}
+    expected, expected_reason = extract_answer(expected_text, require_marker=False)
+    if expected is None:
+        reason = f"expected answer: {expected_reason}"
+    result = {
+        "llm_answer": predicted.value if predicted is not None else None,
+        "correct_answer": expected.value if expected is not None else None,
+    }
+    if predicted is None or expected is None:
+        return {"status": "ambiguous", "reason": reason, **result}
+    return {"status": "correct" if answers_match(predicted, expected) else "incorrect", **result}
+
@@ -1,13 +1,22 @@
 import os
+import re
+import sys
+import glob
 import json
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import dotenv
+from openai import OpenAI
 
 # import lib.reasoning
 from openai_reasoning.reasoning_model import OpenAIReasoning
 from openai_reasoning_code import prompts
 from openai_reasoning import prompts as openai_prompts
+from openai_reasoning.answer_check import check_answer as check_answer_locally
+from openai_reasoning_code.streaming_log import problem_log
 
 
 dotenv.load_dotenv()
@@ -16,14 +25,26 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or ""
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY is not set")
 
+# How answers were checked in this process: "local" (answer_check) or "llm" (ambiguous, o3-mini fallback)
+CHECK_COUNTS = {"local": 0, "llm": 0}
+_CHECK_LOCK = threading.Lock()
 
-def run(input_path: str, log_file_path: str, reasoning):
+
+def run(input_path: str, log_file_path: str | None, reasoning, client: OpenAI | None = None,
+        model_name: str = "o3") -> dict:
+    """
+    Solve one problem and check the final answer.
+
+    If log_file_path is given the log is written there (overwritten); the log is also returned.
+    Pass a shared `client` when running problems concurrently (see main()).
+    `model_name` is the model used for every reasoning step (the answer check stays on o3-mini).
+    """
     # Read the problem description from the input file
     with open(input_path, "r") as f:
         problem_description = f.read()
 
     # Instantiate the reasoning model
-    model = OpenAIReasoning(api_key=OPENAI_API_KEY, model="o3")
+    model = OpenAIReasoning(api_key=OPENAI_API_KEY, model=model_name, client=client)
 
     if reasoning:
         model.reasoning_effort = reasoning
@@ -83,33 +104,144 @@ def run(input_path: str, log_file_path: str, reasoning):
 
     print("\nAnswer:\n", answer)
 
-    check_answer_model = OpenAIReasoning(api_key=OPENAI_API_KEY, model="o3-mini")
-    check_answer = check_answer_model.complete(
-        f"Following is the final answer to a specific problem, please extract the number from it.\n\nAnswer: {final_answer},\n\nMoreover, this is the correct answer to this problem: {answer}. Please tell me if they are same. If they are same, please output `correct; {{the extracted answer}}; {{the correct answer}}`, else, please output `incorrect; {{the extracted answer}}; {{the correct answer}}`",
-        system_prompt="You are a helpful assistant that helps extract the final answer(mostly number) from a answer to a specific problem",
-    )
+    # Compare locally; the o3-mini check only runs when the number cannot be pinned down
+    local_check = check_answer_locally(final_answer, answer)
+    ambiguity_reason = local_check.get("reason")
+    if local_check["status"] != "ambiguous":
+        check_method = "local"
+        check_answer = f"{local_check['status']}; {local_check['llm_answer']}; {local_check['correct_answer']}"
+        correct: bool = local_check["status"] == "correct"
+        llm_answer = local_check["llm_answer"]
+        correct_answer = local_check["correct_answer"]
+    else:
+        check_method = "llm"
+        print(f"\nLocal check ambiguous ({ambiguity_reason}); asking o3-mini.")
+        check_answer_model = OpenAIReasoning(api_key=OPENAI_API_KEY, model="o3-mini", client=client)
+        check_answer = check_answer_model.complete(
+            f"Following is the final answer to a specific problem, please extract the number from it.\n\nAnswer: {final_answer},\n\nMoreover, this is the correct answer to this problem: {answer}. Please tell me if they are same. If they are same, please output `correct; {{the extracted answer}}; {{the correct answer}}`, else, please output `incorrect; {{the extracted answer}}; {{the correct answer}}`",
+            system_prompt="You are a helpful assistant that helps extract the final answer(mostly number) from a answer to a specific problem",
+        )
+
+        parsed_check_answer = check_answer.split("; ")
+        try:
+            correct: bool = parsed_check_answer[0] == "correct"
+            llm_answer = parsed_check_answer[1]
+            correct_answer = parsed_check_answer[2]
+        except:
+            correct: bool = False
+            llm_answer = ""
+            correct_answer = ""
     print("\nCheck Answer:\n", check_answer)
 
-    parsed_check_answer = check_answer.split("; ")
-    try:
-        correct: bool = parsed_check_answer[0] == "correct"
-        llm_answer = parsed_check_answer[1]
-        correct_answer = parsed_check_answer[2]
-    except:
-        correct: bool = False
-        llm_answer = ""
-        correct_answer = ""
-
-    # Append output to specified log file
-    with open(log_file_path, "w") as f:
-        log_json = {
-            "input_question": input_path,
-            "raw_final_answer": check_answer,
-            "correct": correct,
-            "llm_answer": llm_answer,
-            "correct_answer": correct_answer,
-            "token_usage": model.token_used(),
-            "time_used": TIME_USED,
-        }
-        f.write(json.dumps(log_json))
-        f.write("\n")
+    with _CHECK_LOCK:
+        CHECK_COUNTS[check_method] += 1
+        checked = CHECK_COUNTS["local"] + CHECK_COUNTS["llm"]
+    print(f"[Check] {check_method}; LLM fallback used for {CHECK_COUNTS['llm']} of {checked} answers so far")
+
+    log_json = {
+        "input_question": input_path,
+        "raw_final_answer": check_answer,
+        "correct": correct,
+        "llm_answer": llm_answer,
+        "correct_answer": correct_answer,
+        "check_method": check_method,
+        "ambiguity_reason": ambiguity_reason,
+        "token_usage": model.token_used(),
+        "time_used": TIME_USED,
+    }
+    if log_file_path:
+        with open(log_file_path, "w") as f:
+            f.write(json.dumps(log_json))
+            f.write("\n")
+    return log_json
+
+
+def _natural_key(path: str) -> list:
+    # q2 < q10
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def _collect_inputs(pattern: str) -> list[str]:
+    """A directory (all .desc.txt inside), a glob pattern, or a single file."""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, f) for f in os.listdir(pattern) if f.endswith(".desc.txt")]
+    else:
+        paths = [p for p in glob.glob(pattern) if os.path.isfile(p)]
+    return sorted(paths, key=_natural_key)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _print_batch_summary(records: list[dict], wall_seconds: float) -> None:
+    solved = [r for r in records if "error" not in r]
+    print(f"\n===== Batch summary ({len(records)} problems, {wall_seconds:.1f}s wall) =====")
+    if len(solved) < len(records):
+        print(f"errors: {len(records) - len(solved)}")
+    if not solved:
+        return
+    correct = sum(1 for r in solved if r["correct"])
+    print(f"accuracy: {correct}/{len(solved)} ({correct / len(solved):.1%})")
+    latencies = [r["time_used"] for r in solved]
+    print(
+        f"latency: mean={sum(latencies) / len(latencies):.1f}s p50={_percentile(latencies, 0.5):.1f}s "
+        f"p95={_percentile(latencies, 0.95):.1f}s max={max(latencies):.1f}s"
+    )
+    for key in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "total_tokens"):
+        values = [r["token_usage"].get(key, 0) for r in solved]
+        print(f"{key}: total={sum(values)}, mean={sum(values) / len(values):.0f}")
+    llm_checks = sum(1 for r in solved if r.get("check_method") == "llm")
+    print(f"answer checks: local={len(solved) - llm_checks}, llm fallback={llm_checks}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m openai_reasoning.main",
+        description="Run the openai_reasoning pipeline over many problems"
+    )
+    parser.add_argument(
+        "-i", "--input", required=True,
+        help="A directory of .desc.txt files, a glob pattern (quote it) or a single .desc.txt file"
+    )
+    parser.add_argument("-o", "--output", required=True, help="JSONL file; one result line is appended per problem")
+    parser.add_argument("-m", "--model", default="o3", help="Model for the reasoning steps")
+    parser.add_argument("-r", "--reasoning", default="high", choices=["low", "medium", "high"], help="Reasoning effort")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Problems solved concurrently")
+    args = parser.parse_args()
+
+    inputs = _collect_inputs(args.input)
+    if not inputs:
+        print(f"ERROR: no input files match {args.input}")
+        sys.exit(1)
+
+    # One client (and connection pool) shared by every concurrent model instance
+    client = OpenAI(api_key=OPENAI_API_KEY)
+    write_lock = threading.Lock()
+
+    def _solve(input_path: str) -> dict:
+        name = re.sub(r"\.desc\.txt$", "", os.path.basename(input_path))
+        start = time.time()
+        # Console lines are prefixed with the problem name, so concurrent problems stay readable
+        with problem_log(None, name):
+            try:
+                record = run(input_path, None, args.reasoning, client=client, model_name=args.model)
+            except Exception as e:
+                print(f"ERROR: {type(e).__name__}: {e}")
+                record = {"input_question": input_path, "error": f"{type(e).__name__}: {e}", "time_used": time.time() - start}
+        record["model"] = args.model
+        record["reasoning"] = args.reasoning
+        with write_lock:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        records = list(pool.map(_solve, inputs))
+    _print_batch_summary(records, time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
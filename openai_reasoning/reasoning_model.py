@@ -3,8 +3,9 @@ from typing import Literal
 
 
 class OpenAIReasoning:
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str = "gpt-4o", client: OpenAI | None = None):
+        # A shared client lets concurrent instances reuse one connection pool
+        self.client = client if client is not None else OpenAI(api_key=api_key)
         self.messages = []
         self.model = model
 
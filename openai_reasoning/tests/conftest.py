@@ -0,0 +1,5 @@
+import os
+import sys
+
+# main.py imports its helpers as `openai_reasoning.<module>`, run from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
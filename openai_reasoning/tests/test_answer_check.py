@@ -0,0 +1,51 @@
+import pytest
+
+from openai_reasoning.answer_check import check_answer, extract_answer
+
+
+# (description, model output, expected answer text, status)
+CASES = [
+    ("plain integer", "Final Answer: 42", "42", "correct"),
+    ("thousands separator", "Final Answer: 1,200", "1200", "correct"),
+    ("currency and units", "**Final Answer:** $1,250.50 per week", "1250.5", "correct"),
+    ("units after the number", "Final Answer: 300 kg of flour", "300", "correct"),
+    ("plain fraction", "Final Answer: 1300/3", "433.33", "correct"),
+    ("latex fraction", "Final Answer: $\\frac{1300}{3}$", "433.33", "correct"),
+    ("fraction and decimal together", "Final Answer: 1300/3 ≈ 433.33", "433.33", "correct"),
+    ("scientific notation", "Final Answer: 1.2e5", "120000", "correct"),
+    ("times ten to the power", "Final Answer: 1.2 × 10^5", "120000", "correct"),
+    ("latex times ten", "Final Answer: $1.2 \\times 10^{5}$", "120000", "correct"),
+    ("boxed", "so the optimum is \\boxed{7}.", "7", "correct"),
+    ("boxed wins over the marker", "Final Answer: 3 trucks\n\\boxed{1500}", "1500", "correct"),
+    ("labelled objective", "Final Answer: x = 3, y = 4, maximum profit = 1,200", "1200", "correct"),
+    ("variable values in parentheses", "Final Answer: 250 (x = 10, y = 15)", "250", "correct"),
+    ("integer expected: exact", "Final Answer: 42.4", "42", "incorrect"),
+    ("decimal expected: last printed digit", "Final Answer: 12.34", "12.3", "correct"),
+    ("decimal expected: beyond the last digit", "Final Answer: 12.4", "12.3", "incorrect"),
+    ("decimal expected: two digits", "Final Answer: 433.3333", "433.33", "correct"),
+    ("wrong number", "Final Answer: 41", "42", "incorrect"),
+    ("no solution expected", "Final Answer: the problem is infeasible", "No Best Solution", "correct"),
+    ("number when no solution expected", "Final Answer: 10", "None", "incorrect"),
+    ("no marker", "The optimal value is 42.", "42", "ambiguous"),
+    ("several unlabelled numbers", "Final Answer: x = 3, y = 4", "3", "ambiguous"),
+    ("empty box", "\\boxed{}", "5", "ambiguous"),
+]
+
+
+@pytest.mark.parametrize("description, output, expected, status", CASES, ids=[case[0] for case in CASES])
+def test_check_answer(description, output, expected, status):
+    result = check_answer(output, expected)
+    assert result["status"] == status, result
+
+
+@pytest.mark.parametrize("text, value, kind", [
+    ("1,234,567", 1234567, "integer"),
+    ("-3.50", -3.5, "decimal"),
+    ("2/4", 0.5, "fraction"),
+    ("−7", -7, "integer"),
+])
+def test_expected_answer_parsing(text, value, kind):
+    number, reason = extract_answer(text, require_marker=False)
+    assert reason is None
+    assert number.value == pytest.approx(value)
+    assert number.kind == kind
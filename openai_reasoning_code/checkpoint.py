@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+import threading
+
+
+""" 🌟 每一步的 checkpoint
+
+solve() 的每個 LLM 步驟（分類、檢查、建模、審查、程式生成與修正）與每次程式執行的輸出，
+完成時就以「先寫暫存檔再 rename」的方式寫進 `<problem>_checkpoint.json`，中斷時不會留下半份檔案。
+
+--resume 時：已經寫出 log 的題目直接略過；只有 checkpoint 的題目重新呼叫 solve()，
+輸入（step 名稱 + prompt + 模型設定）與 checkpoint 相同的步驟直接取回輸出，不再呼叫 API，
+因此會從最後一個完成的步驟之後接著跑。題目內容改變時整份 checkpoint 作廢。
+"""
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def step_key(model_name: str, reasoning_effort: str, **kwargs) -> str:
+    """一個 LLM 步驟的輸入指紋；任何一個 prompt 或模型設定不同就不會命中。"""
+    return _sha256(json.dumps(
+        {"model": model_name, "effort": reasoning_effort, **kwargs}, sort_keys=True, ensure_ascii=False, default=str
+    ))
+
+
+class Checkpoint:
+    def __init__(self, path: str, problem: str, resume: bool = False):
+        """
+        Args:
+            path (str): checkpoint 檔案路徑。
+            problem (str): 題目原文，用來確認 checkpoint 屬於同一題。
+            resume (bool): False 時忽略既有的 checkpoint，從頭開始。
+        """
+        self.path = path
+        self.pid = os.getpid()
+        self.resumed_steps = 0
+        self._lock = threading.Lock()
+        self.data = {"problem_sha256": _sha256(problem), "steps": {}, "exec": {}}
+        if resume and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                saved = None
+            if isinstance(saved, dict) and saved.get("problem_sha256") == self.data["problem_sha256"]:
+                self.data = saved
+
+    @property
+    def completed_steps(self) -> list[str]:
+        return list(self.data["steps"])
+
+    def get_step(self, step_name: str, key: str) -> dict | None:
+        """
+        Returns:
+            dict | None: {"key", "output", "log"}；步驟沒有完成過或輸入不同時回傳 None。
+        """
+        entry = self.data["steps"].get(step_name)
+        if entry is None or entry["key"] != key:
+            return None
+        self.resumed_steps += 1
+        return entry
+
+    def save_step(self, step_name: str, key: str, output: str, log_entry: dict) -> None:
+        with self._lock:
+            self.data["steps"][step_name] = {"key": key, "output": output, "log": log_entry}
+        self._write()
+
+    def get_exec(self, key: str) -> str | None:
+        return self.data["exec"].get(key)
+
+    def save_exec(self, key: str, output: str) -> None:
+        with self._lock:
+            self.data["exec"][key] = output
+        self._write()
+
+    def discard(self) -> None:
+        """題目的 log 寫出之後就不再需要 checkpoint。"""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def _write(self) -> None:
+        # Portfolio workers are forked with the checkpoint in scope; only the owning process writes
+        if os.getpid() != self.pid:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,234 @@
+import ast
+import re
+
+
+""" 🌟 本地 PuLP 程式修補
+
+FIX_CODE_PROMPT 裡列出的常見錯誤，多半是機械式的，不需要再呼叫一次 LLM：
+1. int()/float()/round() 直接套在 LpAffineExpression / LpVariable 上（只改寫看得出是 PuLP 運算式的引數）
+2. 用 `<` / `>` 建立限制式 (PuLP 只支援 <=, >=, ==)
+3. 變數 / 限制式 / 問題名稱含有空白
+4. prob.solve() 沒有指定 PULP_CBC_CMD(msg=False)，或 PULP_CBC_CMD 沒有 import
+
+repair_pulp_code() 解析程式碼、做確定性的改寫並回傳新程式碼與修改清單。
+"""
+
+# 注入到修補後程式開頭的 helper：只有 PuLP 物件才會被轉成數值
+_VALUE_HELPER_NAME = "_repair_lp_value"
+_VALUE_HELPER_SRC = f'''
+def {_VALUE_HELPER_NAME}(x):
+    try:
+        import pulp as _repair_pulp
+        if isinstance(x, (_repair_pulp.LpAffineExpression, _repair_pulp.LpVariable)):
+            return _repair_pulp.value(x)
+    except ImportError:
+        pass
+    return x
+'''
+
+_NUMERIC_CASTS = ("int", "float", "round")
+_NAMED_CONSTRUCTORS = ("LpVariable", "LpProblem", "LpConstraint", "dicts", "matrix")
+_EXPRESSION_CONSTRUCTORS = ("LpVariable", "lpSum", "lpDot", "LpAffineExpression", "dicts", "matrix")
+_VALUE_ATTRIBUTES = ("value", "varValue")
+_SOLVER_CMD = "PULP_CBC_CMD"
+
+
+def _call_name(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def _strip_spaces(node: ast.AST) -> bool:
+    """把字串常數 (含 f-string 的常數片段) 中的空白換成底線，回傳是否有修改。"""
+    changed = False
+    if isinstance(node, ast.Constant) and isinstance(node.value, str) and " " in node.value:
+        node.value = node.value.strip().replace(" ", "_")
+        changed = True
+    elif isinstance(node, ast.JoinedStr):
+        for part in node.values:
+            if isinstance(part, ast.Constant) and isinstance(part.value, str) and " " in part.value:
+                part.value = part.value.replace(" ", "_")
+                changed = True
+    return changed
+
+
+def _is_lp_expression(node: ast.AST, lp_names: set[str], problem_names: set[str] = frozenset()) -> bool:
+    """node 看起來是 PuLP 運算式：LpVariable / lpSum / .dicts 的結果、它們的下標或屬性、或含有它們的算式。"""
+    if isinstance(node, ast.Name):
+        return node.id in lp_names
+    if isinstance(node, ast.Subscript):
+        return _is_lp_expression(node.value, lp_names, problem_names)
+    if isinstance(node, ast.Attribute):
+        if isinstance(node.value, ast.Name) and node.value.id in problem_names:
+            return node.attr == "objective"
+        return node.attr not in _VALUE_ATTRIBUTES and _is_lp_expression(node.value, lp_names, problem_names)
+    if isinstance(node, ast.Call):
+        return _call_name(node.func) in _EXPRESSION_CONSTRUCTORS
+    if isinstance(node, ast.BinOp):
+        return _is_lp_expression(node.left, lp_names, problem_names) or _is_lp_expression(node.right, lp_names, problem_names)
+    if isinstance(node, ast.UnaryOp):
+        return _is_lp_expression(node.operand, lp_names, problem_names)
+    if isinstance(node, (ast.ListComp, ast.GeneratorExp, ast.SetComp)):
+        return _is_lp_expression(node.elt, lp_names, problem_names)
+    if isinstance(node, ast.DictComp):
+        return _is_lp_expression(node.value, lp_names, problem_names)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return any(_is_lp_expression(elt, lp_names, problem_names) for elt in node.elts)
+    if isinstance(node, ast.Dict):
+        return any(_is_lp_expression(value, lp_names, problem_names) for value in node.values)
+    return False
+
+
+def _lp_names(tree: ast.AST, problem_names: set[str] = frozenset()) -> set[str]:
+    """被指派為 PuLP 運算式的變數名稱（`x = LpVariable.dicts(...)`、`total = lpSum(...)`、`expr = 2 * x[i]` ...）。"""
+    assignments = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            assignments.append((node.targets, node.value))
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign)) and node.value is not None:
+            assignments.append(([node.target], node.value))
+    names = set()
+    changed = True
+    while changed:  # expressions built from earlier expressions
+        changed = False
+        for targets, value in assignments:
+            if not _is_lp_expression(value, names, problem_names):
+                continue
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id not in names:
+                    names.add(target.id)
+                    changed = True
+    return names
+
+
+class _PulpRepairer(ast.NodeTransformer):
+
+    def __init__(self, problem_names: set[str], lp_names: set[str] = frozenset()):
+        self.problem_names = problem_names
+        self.lp_names = lp_names
+        self.fixes: list[str] = []
+
+    def _note(self, fix: str):
+        if fix not in self.fixes:
+            self.fixes.append(fix)
+
+    def _is_problem_target(self, target: ast.AST) -> bool:
+        # 找不到 LpProblem(...) 的指派時不改寫：`count += a > b` 之類的 `+=` 不是限制式
+        return bool(self.problem_names) and _call_name(target) in self.problem_names
+
+    def _relax_compare(self, node: ast.AST) -> ast.AST:
+        if isinstance(node, ast.Compare):
+            new_ops = []
+            for op in node.ops:
+                if isinstance(op, ast.Lt):
+                    new_ops.append(ast.LtE())
+                elif isinstance(op, ast.Gt):
+                    new_ops.append(ast.GtE())
+                else:
+                    new_ops.append(op)
+            if any(type(a) is not type(b) for a, b in zip(node.ops, new_ops)):
+                node.ops = new_ops
+                self._note("strict '<'/'>' constraint rewritten to '<='/'>='")
+        return node
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Add) and self._is_problem_target(node.target):
+            value = node.value
+            if isinstance(value, ast.Tuple) and value.elts:
+                value.elts[0] = self._relax_compare(value.elts[0])
+                if len(value.elts) > 1 and _strip_spaces(value.elts[1]):
+                    self._note("spaces removed from constraint name")
+            else:
+                node.value = self._relax_compare(value)
+        return node
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        name = _call_name(node.func)
+
+        # 1) int(expr) -> int(_repair_lp_value(expr))
+        if (
+            isinstance(node.func, ast.Name)
+            and name in _NUMERIC_CASTS
+            and node.args
+            and _is_lp_expression(node.args[0], self.lp_names, self.problem_names)
+        ):
+            node.args[0] = ast.Call(
+                func=ast.Name(id=_VALUE_HELPER_NAME, ctx=ast.Load()), args=[node.args[0]], keywords=[]
+            )
+            self._note(f"{name}() on PuLP expressions wrapped with pulp.value()")
+
+        # 2) prob.addConstraint(a < b)
+        elif name == "addConstraint" and node.args:
+            node.args[0] = self._relax_compare(node.args[0])
+
+        # 3) names with spaces
+        elif name in _NAMED_CONSTRUCTORS:
+            if node.args and _strip_spaces(node.args[0]):
+                self._note(f"spaces removed from {name}() name")
+            for kw in node.keywords:
+                if kw.arg == "name" and _strip_spaces(kw.value):
+                    self._note(f"spaces removed from {name}() name")
+
+        # 4) silent CBC solver
+        elif name == "solve" and isinstance(node.func, ast.Attribute) and not node.args and not node.keywords:
+            node.args = [ast.Call(
+                func=ast.Attribute(value=ast.Name(id="pulp", ctx=ast.Load()), attr=_SOLVER_CMD, ctx=ast.Load()),
+                args=[], keywords=[ast.keyword(arg="msg", value=ast.Constant(value=False))],
+            )]
+            self._note("prob.solve() given PULP_CBC_CMD(msg=False)")
+
+        if name == _SOLVER_CMD:
+            if not any(kw.arg == "msg" for kw in node.keywords):
+                node.keywords.append(ast.keyword(arg="msg", value=ast.Constant(value=False)))
+                self._note("PULP_CBC_CMD() set to msg=False")
+            if isinstance(node.func, ast.Name):
+                # 執行環境一定有 `pulp`，避免忘記 import PULP_CBC_CMD 造成 NameError
+                node.func = ast.Attribute(value=ast.Name(id="pulp", ctx=ast.Load()), attr=_SOLVER_CMD, ctx=ast.Load())
+                self._note("PULP_CBC_CMD referenced through the pulp module")
+        return node
+
+
+def _problem_names(tree: ast.AST) -> set[str]:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and _call_name(node.value.func) == "LpProblem":
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    names.add(target.id)
+    return names
+
+
+def repair_pulp_code(code: str) -> tuple[str, list[str]]:
+    """
+    對 LLM 產生的 PuLP 程式做確定性的本地修補。
+
+    Args:
+        code (str): 原始程式碼。
+
+    Returns:
+        tuple[str, list[str]]: 修補後的程式碼與修改項目；無法解析或沒有任何修改時，
+        回傳原程式碼與空清單。
+    """
+    try:
+        tree = ast.parse(code.replace('\u00A0', ' '))
+    except SyntaxError:
+        return code, []
+
+    problem_names = _problem_names(tree)
+    repairer = _PulpRepairer(problem_names, _lp_names(tree, problem_names))
+    tree = repairer.visit(tree)
+    if not repairer.fixes:
+        return code, []
+
+    ast.fix_missing_locations(tree)
+    repaired = ast.unparse(tree)
+    if any("pulp.value()" in fix for fix in repairer.fixes):
+        repaired = _VALUE_HELPER_SRC.lstrip() + "\n" + repaired
+    if not re.search(r"^import pulp\s*$", repaired, re.MULTILINE):
+        repaired = "import pulp\n" + repaired
+    return repaired, repairer.fixes
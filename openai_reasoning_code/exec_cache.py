@@ -0,0 +1,89 @@
+import os
+import ast
+import sys
+import json
+import hashlib
+import threading
+
+
+""" 🌟 執行結果快取
+
+以「正規化後的 AST」+ solver / 函式庫版本當 key，保存 run_generated_code 的輸出。
+只差在空白、註解的程式會得到同一個 key，重跑同一份資料集時不必再等 CBC。
+"""
+
+
+def _library_versions() -> str:
+    versions = [f"python={sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"]
+    for name in ("pulp", "numpy", "highspy", "scipy"):
+        try:
+            module = __import__(name)
+            versions.append(f"{name}={getattr(module, '__version__', 'unknown')}")
+        except ImportError:
+            versions.append(f"{name}=missing")
+    return ";".join(versions)
+
+
+LIBRARY_VERSIONS = _library_versions()
+
+
+def normalize_code(code: str) -> str:
+    """去掉註解與排版差異；無法解析時退而只去掉空白行與行尾空白。"""
+    cleaned = code.replace('\u00A0', ' ')
+    try:
+        return ast.dump(ast.parse(cleaned))
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in cleaned.splitlines() if line.strip())
+
+
+def code_key(code: str, extra: str = "") -> str:
+    """
+    Args:
+        code (str): 產生的程式碼。
+        extra (str): 其他會影響輸出的設定（例如 solver 參數），一併納入 key。
+    """
+    payload = "\n".join((normalize_code(code), LIBRARY_VERSIONS, extra))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExecutionCache:
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            output = self.memory.get(key)
+        if output is None and self.cache_dir and os.path.isfile(self._path(key)):
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    output = json.load(f)["output"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                output = None
+            if output is not None:
+                with self._lock:
+                    self.memory[key] = output
+        with self._lock:
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return output
+
+    def put(self, key: str, output: str) -> None:
+        with self._lock:
+            self.memory[key] = output
+        if self.cache_dir:
+            # 先寫暫存檔再 rename，避免中斷時留下半份 JSON
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"versions": LIBRARY_VERSIONS, "output": output}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
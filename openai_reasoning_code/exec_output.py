@@ -0,0 +1,196 @@
+import io
+import re
+from collections import deque
+
+
+""" 🌟 有上限的執行輸出
+
+CODE_GENERATOR_PROMPT 要求程式逐條印出約束式的 LHS 做驗證，TSP/MTZ 這類模型一跑就是幾萬行。
+BoundedOutput 取代 run_generated_code 裡的 StringIO：只保留前 HEAD_LINES 行與後 TAIL_LINES 行，
+中間被丟掉的行只計數，但判斷成敗需要的行（report() 的 sentinel、Objective value、Status、
+traceback、錯誤關鍵字、違反的檢查）另外保留，所以 _has_objective / _is_error_output / extract
+對截斷後的文字結果不變。記憶體與輸出長度與模型大小無關。
+
+修正 prompt 不再貼整份輸出，而是 summarize_output() 的摘要：
+行數、第一個 traceback、objective 行、status、違反的檢查與最後幾行。
+"""
+
+HEAD_LINES = 100
+TAIL_LINES = 100
+MAX_LINE_CHARS = 2000       # longer lines (e.g. a printed dict of every variable) are cut
+MAX_NOTABLE_LINES = 50      # notable lines retained from the omitted middle
+TRACEBACK_LINES = 60        # last lines kept of a single traceback
+SUMMARY_VIOLATIONS = 10
+SUMMARY_TAIL_LINES = 15
+SUMMARY_RECORD_CHARS = 500
+
+RESULT_SENTINEL = "##RESULT##"
+KILLED_SENTINEL = "##SANDBOX_KILLED##"  # sandbox.py: the program was stopped by a time / memory limit
+TRACEBACK_BEGIN = "---------- TRACEBACK ----------"
+TRACEBACK_END = "---------- END TRACEBACK ------"
+
+_OMITTED = re.compile(r"^\.\.\. \[(\d+) lines omitted, (\d+) lines total\] \.\.\.$", re.MULTILINE)
+_VIOLATION = re.compile(
+    r"violat|not satisf|unsatisf|infeasib|\bFAIL|\bfalse\s*$|[✗✘❌]",
+    re.IGNORECASE,
+)
+_NOTABLE = re.compile(
+    r"^(?:" + re.escape(RESULT_SENTINEL) + r"|" + re.escape(KILLED_SENTINEL) + r"|Objective value:|Status:)"
+    r"|\[Solver limit\]|Traceback|DATA_VALIDATION_FAILED|Error\b|Exception\b|Warning\b"
+    r"|Matrix must be n x n|not symmetric|length",  # model._is_error_output keywords
+)
+
+
+def is_violation(line: str) -> bool:
+    return _VIOLATION.search(line) is not None
+
+
+def _is_notable(line: str) -> bool:
+    return _NOTABLE.search(line) is not None or is_violation(line)
+
+
+class BoundedOutput(io.TextIOBase):
+    """
+    可以給 streaming_log.capture_output 使用的輸出緩衝，用量固定。
+
+    輸出不超過 head + tail 行時 getvalue() 與 StringIO 完全相同。
+    """
+
+    def __init__(self, head: int = HEAD_LINES, tail: int = TAIL_LINES):
+        super().__init__()
+        self.head_limit = head
+        self.head = []
+        self.tail = deque(maxlen=tail)
+        self.notable = deque(maxlen=MAX_NOTABLE_LINES)  # (line number, line) from the omitted middle
+        self.last_result = None                          # the last report() line is always kept
+        self.lines = 0
+        self.omitted = 0
+        self.truncated_lines = 0
+        self._partial = []
+        self._partial_len = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        pieces = s.split("\n")
+        for piece in pieces[:-1]:
+            self._append_partial(piece)
+            self._add_line("".join(self._partial) + "\n")
+            self._partial, self._partial_len = [], 0
+        self._append_partial(pieces[-1])
+        return len(s)
+
+    def _append_partial(self, piece: str) -> None:
+        room = MAX_LINE_CHARS - self._partial_len
+        if self._is_result_line(piece):
+            self._partial.append(piece)  # a cut report() record could no longer be parsed
+        elif room > 0:
+            self._partial.append(piece[:room])
+        self._partial_len += len(piece)
+
+    def _is_result_line(self, piece: str = "") -> bool:
+        return ("".join(self._partial) + piece[:len(RESULT_SENTINEL)]).startswith(RESULT_SENTINEL)
+
+    def _add_line(self, line: str) -> None:
+        self.lines += 1
+        if self._partial_len > MAX_LINE_CHARS and not line.startswith(RESULT_SENTINEL):
+            self.truncated_lines += 1
+            line = f"{line.rstrip(chr(10))} ... [{self._partial_len - MAX_LINE_CHARS} chars cut]\n"
+        if line.startswith(RESULT_SENTINEL):
+            self.last_result = (self.lines, line)
+        if len(self.head) < self.head_limit:
+            self.head.append(line)
+            return
+        if len(self.tail) == self.tail.maxlen:
+            number, evicted = self.tail[0]
+            self.omitted += 1
+            if _is_notable(evicted):
+                self.notable.append((number, evicted))
+        self.tail.append((self.lines, line))
+
+    def getvalue(self) -> str:
+        parts = list(self.head)
+        if self.omitted:
+            kept = {number for number, _ in self.notable}
+            middle = list(self.notable)
+            # The last report() record decides success; it must survive even if the notable buffer overflowed
+            if (
+                self.last_result is not None and self.last_result[0] not in kept
+                and self.head_limit < self.last_result[0] < self.tail[0][0]
+            ):
+                middle.append(self.last_result)
+            parts.append(f"... [{self.omitted} lines omitted, {self.lines} lines total] ...\n")
+            parts.extend(line for _, line in sorted(middle))
+            if middle:
+                parts.append("... [end of retained lines] ...\n")
+        parts.extend(line for _, line in self.tail)
+        parts.extend(self._partial)
+        return "".join(parts)
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]} ... [{len(text) - limit} chars cut]"
+
+
+def _first_traceback(lines: list[str]) -> list[str]:
+    for i, line in enumerate(lines):
+        if line.strip() == TRACEBACK_BEGIN or line.startswith("Traceback (most recent call last)"):
+            block = []
+            for follow in lines[i + (line.strip() == TRACEBACK_BEGIN):]:
+                if follow.strip() == TRACEBACK_END:
+                    break
+                block.append(follow)
+                # A bare traceback ends with the exception line (no indentation)
+                if line.strip() != TRACEBACK_BEGIN and len(block) > 1 and follow and not follow[0].isspace():
+                    break
+            if len(block) > TRACEBACK_LINES:
+                block = [f"... [{len(block) - TRACEBACK_LINES} traceback lines omitted] ..."] + block[-TRACEBACK_LINES:]
+            return block
+    return []
+
+
+def summarize_output(text: str) -> str:
+    """
+    執行輸出的精簡摘要，給 FIX_CODE_PROMPT 使用。
+
+    Args:
+        text (str): run_generated_code 的輸出（可能已由 BoundedOutput 截斷）。
+    """
+    if not isinstance(text, str):
+        return str(text)
+    lines = text.splitlines()
+    omitted = _OMITTED.search(text)
+    total = int(omitted.group(2)) if omitted else len(lines)
+
+    sections = [f"Output: {total} lines" + (f" ({omitted.group(1)} omitted from the capture)" if omitted else "")]
+    killed = [line for line in lines if line.startswith(KILLED_SENTINEL)]
+    if killed:
+        sections.append(f"Stopped by the sandbox: {killed[-1][len(KILLED_SENTINEL):].strip()}")
+    traceback_block = _first_traceback(lines)
+    if traceback_block:
+        sections.append("First traceback:\n" + "\n".join(traceback_block))
+    status = [line for line in lines if line.startswith("Status:")]
+    if status:
+        sections.append(status[-1])
+    objective = [line for line in lines if line.startswith("Objective value:")]
+    sections.append(objective[-1] if objective else "Objective line: missing (no 'Objective value: <number>' printed)")
+    result = [line for line in lines if line.startswith(RESULT_SENTINEL)]
+    sections.append(
+        f"report() record: {_clip(result[-1][len(RESULT_SENTINEL):].strip(), SUMMARY_RECORD_CHARS)}" if result
+        else "report() record: missing (report(...) was never called)"
+    )
+    violations = [
+        line for line in lines
+        if is_violation(line) and line not in traceback_block
+        and not line.startswith(("Status:", RESULT_SENTINEL, KILLED_SENTINEL))
+    ]
+    if violations:
+        shown = "\n".join(violations[:SUMMARY_VIOLATIONS])
+        more = f"\n... and {len(violations) - SUMMARY_VIOLATIONS} more" if len(violations) > SUMMARY_VIOLATIONS else ""
+        sections.append(f"Violated checks ({len(violations)}):\n{shown}{more}")
+    if not traceback_block:
+        sections.append(f"Last {min(SUMMARY_TAIL_LINES, len(lines))} lines:\n" + "\n".join(
+            _clip(line, SUMMARY_RECORD_CHARS) for line in lines[-SUMMARY_TAIL_LINES:]
+        ))
+    return "\n\n".join(sections)
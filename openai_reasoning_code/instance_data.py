@@ -0,0 +1,303 @@
+import re
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:  # 沒有 numpy 時以 list 代替
+    np = None
+
+
+""" 🌟 資料集實例解析
+
+讀回 datasets/ 底下各 parser 產生的 desc 格式，轉成結構化資料，
+讓 run_generated_code 直接把資料放進執行環境（名稱 INSTANCE），
+產生的程式就不必把整份原始文字嵌入再自行解析。
+
+格式來源
+TSP       datasets/dataset_tsp/parser.py          [TSP_DATA_INFO] + [ADJACENCY_MATRIX] / [NODE_COORDINATES]
+GCP       datasets/dataset_GCP/parser.py          [GCP_DATA_INFO] + [ADJACENCY_List]
+NSP       datasets/dataset_NSP/parsed.py          [NSP_DATA_INFO] + [SHIFT_INFO] / [SHIFT_TABLE] / ...
+VRP       datasets/datasest_VRP/find_common.py    [VRP_DATA_INFO] + [Depot] / [Customer Nodes]（也接受原始 CVRP 格式）
+Knapsack  datasets/dataset_Knapsack/parser2.py    value,weight CSV
+"""
+
+_HEADER_TYPES = (
+    ("[TSP_DATA_INFO]", "TSP"),
+    ("[GCP_DATA_INFO]", "GCP"),
+    ("[NSP_DATA_INFO]", "NSP"),
+    ("[VRP_DATA_INFO]", "VRP"),
+)
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+
+def _array(values, dtype=float):
+    if np is None:
+        return values
+    return np.array(values, dtype=dtype)
+
+
+def detect_instance_type(text: str) -> str | None:
+    """依 desc 檔的區段標頭判斷資料集類型；不是已知格式時回傳 None。"""
+    if not isinstance(text, str):
+        return None
+    for header, instance_type in _HEADER_TYPES:
+        if header in text:
+            return instance_type
+    if "NODE_COORD_SECTION" in text and "DEMAND_SECTION" in text:
+        return "VRP"
+    if re.search(r"^value,weight\s*$", text, re.MULTILINE) and "knapsack" in text.lower():
+        return "Knapsack"
+    return None
+
+
+def _sections(text: str) -> dict[str, list[str]]:
+    """把 `[SECTION]` 標頭底下的非空白行分組。"""
+    sections = {}
+    current = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if re.fullmatch(r"\[[A-Za-z_ ]+\]", line):
+            current = line[1:-1]
+            sections[current] = []
+        elif current is not None and line:
+            sections[current].append(line)
+    return sections
+
+
+def _list_after_colon(line: str) -> tuple[str, list[str]]:
+    key, _, rest = line.partition(":")
+    items = rest.strip().strip("[]")
+    return key.strip(), [item.strip() for item in items.split(",") if item.strip()]
+
+
+def _parse_tsp(text: str) -> dict:
+    sections = _sections(text)
+    data = {"type": "TSP"}
+    if "ADJACENCY_MATRIX" in sections:
+        rows = [[float(v) for v in _list_after_colon(line)[1]] for line in sections["ADJACENCY_MATRIX"]]
+        data["n"] = len(rows)
+        data["dist"] = _array(rows)
+        data["coords"] = None
+    else:
+        coords = [[float(v) for v in re.findall(_NUMBER, line.partition(":")[2])] for line in sections.get("NODE_COORDINATES", [])]
+        data["n"] = len(coords)
+        data["dist"] = None
+        data["coords"] = _array(coords)
+    match = re.search(r"Edge weight type:\s*(\w+)", text)
+    data["edge_weight_type"] = match.group(1) if match else None
+    return data
+
+
+def _parse_gcp(text: str) -> dict:
+    sections = _sections(text)
+    n = int(re.search(r"Node:\s*(\d+)", text).group(1))
+    edges = []
+    adjacency = {node: [] for node in range(1, n + 1)}
+    for line in sections.get("ADJACENCY_List", []):
+        key, neighbours = _list_after_colon(line)
+        u = int(key)
+        for v in map(int, neighbours):
+            edges.append((v, u))
+            adjacency[u].append(v)
+            adjacency[v].append(u)
+    return {
+        "type": "GCP",
+        "n": n,
+        "m": len(edges),
+        "edges": _array(edges, dtype=int),
+        "adjacency": {node: sorted(set(neigh)) for node, neigh in adjacency.items()},
+    }
+
+
+def _parse_knapsack(text: str) -> dict:
+    values, weights = [], []
+    lines = text.splitlines()
+    start = next(i for i, line in enumerate(lines) if line.strip() == "value,weight") + 1
+    for line in lines[start:]:
+        parts = line.strip().split(",")
+        if len(parts) != 2:
+            if values:
+                break
+            continue
+        try:
+            values.append(int(parts[0]))
+            weights.append(int(parts[1]))
+        except ValueError:
+            break
+    match = re.search(r"total weight(?: is)?\s*[:*]?\s*\*?\s*(\d+)", text, re.IGNORECASE)
+    return {
+        "type": "Knapsack",
+        "n": len(values),
+        "values": _array(values, dtype=int),
+        "weights": _array(weights, dtype=int),
+        "capacity": int(match.group(1)) if match else None,
+    }
+
+
+def _parse_nsp(text: str) -> dict:
+    sections = _sections(text)
+    info = dict(line.split(":", 1) for line in sections.get("NSP_DATA_INFO", []) if ":" in line)
+    shift_names = [name.strip() for name in info.get("ShiftNames", "").strip().strip("[]").split(",") if name.strip()]
+    shifts = []
+    for line in sections.get("SHIFT_INFO", []):
+        numbers = [int(v) for v in re.findall(r"\d+", line.partition(",")[2])]
+        shifts.append({
+            "name": line.split(",")[0].strip(),
+            "start": numbers[0], "duration": numbers[1],
+            "min_block": numbers[2], "max_block": numbers[3],
+        })
+    requirements = []
+    for line in sections.get("SHIFT_TABLE", []):
+        if line.startswith("#"):
+            continue
+        requirements.append([int(v) for v in _list_after_colon(line)[1]])
+    blocks = {}
+    for line in sections.get("BLOCK_CONSTRAINTS", []):
+        key = line.split(":")[0].strip()
+        lo, hi = re.findall(r"\d+", line)[:2]
+        blocks[key] = (int(lo), int(hi))
+    forbidden = [tuple(item.strip() for item in line.strip("[]").split(",")) for line in sections.get("FORBIDDEN_SEQUENCES", [])]
+    return {
+        "type": "NSP",
+        "schedule_length": int(info["LengthOfSchedule"]),
+        "num_employees": int(info["NumberOfEmployees"]),
+        "shift_names": shift_names,
+        "shifts": shifts,
+        "requirements": _array(requirements, dtype=int),
+        "work_block": blocks.get("WorkBlockLength"),
+        "off_block": blocks.get("OffBlockLength"),
+        "forbidden": forbidden,
+    }
+
+
+def _parse_vrp(text: str) -> dict:
+    coords, demands = {}, {}
+    if "[VRP_DATA_INFO]" in text:
+        sections = _sections(text)
+        info = dict((k.strip(), v.strip()) for k, v in (line.split(":", 1) for line in sections["VRP_DATA_INFO"] if ":" in line))
+        depot_match = re.match(r"Node (\d+): Coordinates: \(([^)]*)\), Demand: (\d+)", sections["Depot"][0])
+        depot = int(depot_match.group(1))
+        coords[depot] = tuple(float(v) for v in depot_match.group(2).split(","))
+        demands[depot] = int(depot_match.group(3))
+        for line in sections.get("Customer Nodes", []):
+            match = re.match(r"(\d+): \(([^)]*)\), Demand: (\d+)", line)
+            if match:
+                node = int(match.group(1))
+                coords[node] = tuple(float(v) for v in match.group(2).split(","))
+                demands[node] = int(match.group(3))
+        capacity, vehicles = info.get("Vehicle Capacity"), info.get("Number of Vehicles")
+    else:
+        # 原始 TSPLIB CVRP 格式 (datasest_VRP/common_vrp/*_desc.txt)
+        info, section, depot = {}, None, None
+        for raw in text.splitlines():
+            line = raw.strip()
+            if not line or line == "EOF":
+                continue
+            if line in ("NODE_COORD_SECTION", "DEMAND_SECTION", "DEPOT_SECTION"):
+                section = line
+            elif ":" in line and section is None:
+                key, value = line.split(":", 1)
+                info[key.strip()] = value.strip()
+            elif section == "NODE_COORD_SECTION":
+                parts = line.split()
+                coords[int(parts[0])] = (float(parts[1]), float(parts[2]))
+            elif section == "DEMAND_SECTION":
+                parts = line.split()
+                demands[int(parts[0])] = int(parts[1])
+            elif section == "DEPOT_SECTION" and depot is None and int(line) > 0:
+                depot = int(line)
+        capacity, vehicles = info.get("CAPACITY"), info.get("VEHICLES")
+    node_ids = sorted(coords)
+    return {
+        "type": "VRP",
+        "n": len(node_ids),
+        "capacity": int(capacity) if capacity else None,
+        "vehicles": int(vehicles) if vehicles else None,
+        "depot": depot,
+        "node_ids": node_ids,
+        "xy": _array([coords[node] for node in node_ids]),
+        "demand": _array([demands.get(node, 0) for node in node_ids], dtype=int),
+        "coords": coords,
+        "demands": demands,
+    }
+
+
+_PARSERS = {
+    "TSP": _parse_tsp,
+    "GCP": _parse_gcp,
+    "Knapsack": _parse_knapsack,
+    "NSP": _parse_nsp,
+    "VRP": _parse_vrp,
+}
+
+
+def parse_instance(text: str) -> dict | None:
+    """
+    將已知格式的問題文字解析成 INSTANCE 字典（欄位說明見 prompts.INSTANCE_DATA_DOCS）。
+
+    Returns:
+        dict | None: 解析結果；不是已知格式或解析失敗時回傳 None。
+    """
+    instance_type = detect_instance_type(text)
+    if instance_type is None:
+        return None
+    try:
+        data = _PARSERS[instance_type](text)
+    except (KeyError, ValueError, IndexError, AttributeError, StopIteration) as e:
+        print(f"[Instance] Failed to parse {instance_type} data: {e}")
+        return None
+    data["fingerprint"] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return data
+
+
+def is_data_row(line: str) -> bool:
+    """至少含一個數字、且幾乎沒有文字（容許像 `Demand` 這類短欄位名）的行。"""
+    if not re.search(r"\d", line) or line.startswith(("#", "[")):
+        return False
+    letters = re.sub(r"[^A-Za-z]", "", re.sub(_NUMBER, "", line))
+    return len(letters) <= 10
+
+
+def _row_values(line: str) -> list[float]:
+    # `12: [...]` 這種列號不算資料
+    body = line.partition(":")[2] if re.match(r"^\s*\d+\s*:", line) else line
+    return [float(v) for v in re.findall(_NUMBER, body)]
+
+
+def _summarize_block(rows: list[str], sample_rows: int) -> list[str]:
+    values = [v for row in rows for v in _row_values(row)]
+    widths = {len(_row_values(row)) for row in rows}
+    width = f"{min(widths)}-{max(widths)}" if len(widths) > 1 else str(widths.pop())
+    value_range = f"min {min(values):g}, max {max(values):g}" if values else "no numeric values"
+    return (
+        [f"# [summarized] {len(rows)} rows x {width} values ({value_range}); first {sample_rows} rows:"]
+        + [row if len(row) <= 200 else row[:200] + " ..." for row in rows[:sample_rows]]
+        + [f"# ... {len(rows) - sample_rows} more rows omitted; the full data is available at execution time."]
+    )
+
+
+def summarize_instance(text: str, sample_rows: int = 3) -> str | None:
+    """
+    把已知格式實例中的大型資料區塊縮成結構摘要（標頭、維度、數值範圍、前幾列），
+    其他文字原樣保留，給分類/建模/審查等推理步驟使用。
+
+    Returns:
+        str | None: 摘要文字；不是已知格式或沒有可縮減的區塊時回傳 None。
+    """
+    if detect_instance_type(text) is None:
+        return None
+    output, block = [], []
+    summarized = False
+    for line in text.splitlines() + [""]:
+        if is_data_row(line.strip()):
+            block.append(line)
+            continue
+        if len(block) > 2 * sample_rows + 1:
+            output.extend(_summarize_block(block, sample_rows))
+            summarized = True
+        else:
+            output.extend(block)
+        block = []
+        output.append(line)
+    return "\n".join(output[:-1]) if summarized else None
@@ -1,22 +1,52 @@
 import os
 import re
-import io
 import sys
 import json
 import argparse
 import time  
+import signal
+import contextvars
+import multiprocessing
 from dotenv import load_dotenv
 import traceback 
-from contextlib import redirect_stdout, redirect_stderr  
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from reasoning import OpenAIReasoning
+from code_repair import repair_pulp_code
+from exec_cache import ExecutionCache, code_key
+from exec_output import BoundedOutput, summarize_output, RESULT_SENTINEL, KILLED_SENTINEL
+from checkpoint import Checkpoint, step_key
+from streaming_log import capture_output, problem_log, bind
+from sandbox import SandboxPool, KILLED_STATUSES
+from solver_limits import limits_applied, last_limit_hit
+from solver_backend import BACKENDS
+from template_cache import TemplateCache, rebind_program
+from retrieval import ExampleIndex, format_examples
+from step_policy import StepBudget, STEP_POLICIES, record_durations
+from instance_data import parse_instance, summarize_instance, detect_instance_type
+from templates import select_template
+from token_count import count_tokens
 from prompts import (PROBLEM_MATCHING_PROMPT, INIT_ANSWER_PROMPT, GENERAL_EXPERT_PROMPT, MODIFIED_INIT_ANSWER_PROMPT, 
-                         CODE_GENERATOR_PROMPT, FIX_CODE_PROMPT, CHECK_MATCHING_PROMPT)
+                         CODE_GENERATOR_PROMPT, FIX_CODE_PROMPT, CHECK_MATCHING_PROMPT,
+                         INSTANCE_DATA_PROMPT, INSTANCE_DATA_DOCS, RETRIEVED_EXAMPLES_PROMPT,
+                         FUSED_CLASSIFICATION_PROMPT, FUSED_FORMULATION_PROMPT)
 
 
 # RUN LONGER MAKE IT PRECISER
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 model = None  # will be initialised in main() once CLI args are parsed
+# Per-problem clone of `model` for problems solved concurrently (--jobs), so token counts and
+# temporary reasoning_effort changes stay with their problem; falls back to the global model
+PROBLEM_MODEL = contextvars.ContextVar("problem_model", default=None)
+EXEC_CACHE = None  # ExecutionCache, enabled from main() with --exec-cache
+TEMPLATE_CACHE = None  # TemplateCache, enabled from main() with --template-cache
+RETRIEVAL_INDEX = None  # ExampleIndex over past logs, built in main() with --retrieve-from
+SANDBOX = None  # SandboxPool: generated code runs in worker processes with limits (--sandbox)
+# Checkpoint of the problem being solved (set per problem in main()); a ContextVar so
+# background threads started by solve() never write into it
+CHECKPOINT = contextvars.ContextVar("checkpoint", default=None)
+# time.monotonic() at which the current problem's --deadline runs out (set per problem in main())
+PROBLEM_DEADLINE = contextvars.ContextVar("problem_deadline", default=None)
 
 
 """ 🌟 各問題呼叫路徑  
@@ -30,6 +60,68 @@ DATASET_PATH = "datasets/dataset_tsp/parsed_output/small"
 
 DATASET_PATH = "datasets/dataset_Knapsack/small_100_1000"
 
+# Run-time switches for solve(); main() overrides them from the CLI flags.
+OPTIONS = {
+    "speculative_init": False,  # start INIT_ANSWER_PROMPT while the check rounds are still running
+    "check_agree_k": 2,         # stop the check loop after K consecutive unchanged rounds (0 = never stop early)
+    "check_max_rounds": 5,      # hard cap on CHECK_MATCHING_PROMPT rounds
+    "lazy_fix": False,          # execute generated code before Code Fix Loop 1 and skip the fix when it already works
+    "local_repair": False,      # try deterministic AST repairs (code_repair.py) before each Auto Debug Fix round
+    "portfolio_k": 1,           # >1: generate and execute K code candidates in parallel
+    "inject_data": False,       # pre-parse known dataset formats and inject them as INSTANCE instead of raw text
+    "summary_threshold": 0,     # >0: reasoning steps see a schema-only summary when the problem exceeds this many tokens
+    "direct_route": False,      # solve header-tagged dataset instances with the templates.py models, no LLM calls
+    "route_time_limit": 300,    # solver time limit (seconds) for the direct-route templates
+    "header_classify": True,    # classify dataset-tagged problems from their section headers instead of the LLM
+    "retrieve_k": 2,            # solved examples added to CODE_GENERATOR_PROMPT when RETRIEVAL_INDEX is set
+    "step_policy": "full",      # step_policy.STEP_POLICIES: which optional steps may be skipped / shortened
+    "deadline_seconds": 0,      # per-problem time budget used by the deadline-shedding policies (0 = none)
+    "fused": False,             # one call for classification + self-check, one for formulation + critique + revision
+    "solver_time_limit": 0,     # >0: cap timeLimit of every pulp solve in generated code (seconds)
+    "solver_threads": 0,        # >0: threads for pulp solvers that do not set their own
+    "solver_gap": 0,            # >0: relative MIP gap for pulp solvers that do not set their own
+    "solver_backend": "cbc",    # solver_backend.BACKENDS: in-process solver used in place of CBC, CBC as fallback
+}
+
+SOLVER_DEADLINE_MARGIN = 10  # seconds left after the solver for reporting / the next step
+MIN_SOLVER_SECONDS = 5       # the solver always gets at least this long, even past the deadline
+
+COMPLEXITY_TABLE = {
+    "LP": "P", "ILP": "NP-hard", "MILP": "NP-hard", "QP": "NP-hard",
+    "NLP": "NP-hard", "Knapsack": "NP-complete", "TSP": "NP-complete",
+    "Set Cover": "NP-complete", "GCP": "NP-hard", "VRP": "NP-hard", "NSP": "NP-hard", "Others": "Others"
+}
+
+# Classification JSON (PROBLEM_MATCHING_PROMPT schema) for instances whose type is fixed by
+# the dataset parsers' section headers (instance_data.detect_instance_type)
+HEADER_CLASSIFICATIONS = {
+    "TSP": {
+        "detected_type": "TSP",
+        "integer_vars": ["x_ij (1 if the tour travels from city i to city j)"],
+        "justification": "The [TSP_DATA_INFO] section marks a travelling salesman instance; binary edge variables select a single Hamiltonian tour.",
+    },
+    "GCP": {
+        "detected_type": "GCP",
+        "integer_vars": ["x_vc (1 if vertex v gets color c)", "w_c (1 if color c is used)"],
+        "justification": "The [GCP_DATA_INFO] section marks a graph coloring instance; minimise the number of colors so adjacent vertices differ.",
+    },
+    "Knapsack": {
+        "detected_type": "Knapsack",
+        "integer_vars": ["x_i (1 if item i is packed)"],
+        "justification": "The 0/1 knapsack preamble with a value,weight item table; binary item choices under one capacity constraint.",
+    },
+    "NSP": {
+        "detected_type": "NSP",
+        "integer_vars": ["y_eds (1 if employee e works shift s on day d)"],
+        "justification": "The [NSP_DATA_INFO] section marks a rotating nurse scheduling instance; binary shift assignments must meet coverage, block-length and forbidden-sequence rules.",
+    },
+    "VRP": {
+        "detected_type": "VRP",
+        "integer_vars": ["x_ij (1 if a vehicle travels from node i to node j)"],
+        "justification": "The [VRP_DATA_INFO] section marks a capacitated vehicle routing instance; binary arc variables form depot-based routes within vehicle capacity.",
+    },
+}
+
 
 def token_speed_calculator(step_name: str, token_log: dict, latest_tokens: dict, model: OpenAIReasoning, **kwargs) -> tuple[str, dict]:
     """
@@ -45,6 +137,17 @@ def token_speed_calculator(step_name: str, token_log: dict, latest_tokens: dict,
     Returns:
         tuple[str, dict]: API 的回傳結果和更新後的 token 狀態。
     """
+    # [MOD] Steps already completed before an interruption are replayed from the checkpoint
+    checkpoint = CHECKPOINT.get()
+    key = None
+    if checkpoint is not None:
+        key = step_key(model.model, model.reasoning_effort, step=step_name, **kwargs)
+        saved = checkpoint.get_step(step_name, key)
+        if saved is not None:
+            token_log[step_name] = {**saved["log"], "resumed": True}
+            print(f"[Resume] {step_name}: output restored from checkpoint.")
+            return saved["output"], latest_tokens
+
     start_time = time.monotonic()
     
     result = model.complete(**kwargs)
@@ -66,35 +169,216 @@ def token_speed_calculator(step_name: str, token_log: dict, latest_tokens: dict,
         "duration_seconds": round(duration, 4),
         "tokens_per_second": round(tokens_per_second, 2)
     }
+    if checkpoint is not None:
+        checkpoint.save_step(step_name, key, result, token_log[step_name])
     
     return result, current_tokens
 
 
+def current_model() -> OpenAIReasoning:
+    """目前這一題使用的模型：平行執行時是該題自己的實例，否則是全域 model。"""
+    return PROBLEM_MODEL.get() or model
+
+
+def _spawn_model() -> OpenAIReasoning:
+    """
+    建立一個與目前 model 設定相同的新實例，給同時進行的呼叫使用，
+    這樣各自的 token 計數不會互相干擾。
+    """
+    base = current_model()
+    return OpenAIReasoning(api_key=api_key, model=base.model, reasoning_effort=base.reasoning_effort)
+
+
+def _speculative_init_answer(problem: str, detected_type: str) -> tuple[str, dict]:
+    """
+    以初步的 detected_type 先行送出 INIT_ANSWER_PROMPT（在背景執行緒中執行）。
+
+    Returns:
+        tuple[str, dict]: 模型的回答，以及該步驟的 token/時間紀錄。
+    """
+    spec_model = _spawn_model()
+    spec_log = {}
+    answer, _ = token_speed_calculator(
+        "Initial Answer (speculative)", spec_log, spec_model.token_used().copy(), spec_model,
+        mes=problem,
+        system_prompt=INIT_ANSWER_PROMPT.format(
+            detected_type=detected_type,
+            complexity=COMPLEXITY_TABLE.get(detected_type, "Unknown"),
+        ),
+    )
+    return answer, spec_log["Initial Answer (speculative)"]
+
+
+# -----------------------------
+# [MOD] Structured result channel for generated code
+# -----------------------------
+FAILED_STATUSES = ("Not Solved", "Infeasible", "Unbounded", "Undefined")
+LP_STATUS_CODES = {1: "Optimal", 0: "Not Solved", -1: "Infeasible", -2: "Unbounded", -3: "Undefined"}
+
+
+def _to_plain(v):
+    """把 PuLP / numpy 物件轉成可以 JSON 序列化的數值或字串。"""
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, dict):
+        return {str(k): _to_plain(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_to_plain(x) for x in v]
+    if callable(getattr(v, "value", None)):  # LpVariable / LpAffineExpression
+        return _to_plain(v.value())
+    if callable(getattr(v, "item", None)):  # numpy scalar
+        return _to_plain(v.item())
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def _report(objective=None, status=None, variables=None, **extra) -> None:
+    """
+    Injected into the generated code's namespace as `report(...)`.
+    Emits a single JSON sentinel line so success is decided from a structured record.
+    """
+    if isinstance(status, int) and not isinstance(status, bool):
+        status = LP_STATUS_CODES.get(status, str(status))
+    record = {
+        "objective": _to_plain(objective),
+        "status": _to_plain(status),
+        "variables": {str(k): _to_plain(v) for k, v in (variables or {}).items()},
+    }
+    record.update({k: _to_plain(v) for k, v in extra.items()})
+    # [MOD] The solver stopped at an injected limit: the objective is the incumbent, not a proven optimum
+    hit = last_limit_hit()
+    if hit is not None and "solver_limit" not in record:
+        record["solver_limit"] = hit
+    print(RESULT_SENTINEL, json.dumps(record, ensure_ascii=False, default=str))
+
+
+def _result_record(text: str):
+    """回傳輸出中最後一筆 report() 紀錄；沒有呼叫 report() 時回傳 None。"""
+    if not isinstance(text, str) or RESULT_SENTINEL not in text:
+        return None
+    for line in reversed(text.splitlines()):
+        if line.startswith(RESULT_SENTINEL):
+            try:
+                record = json.loads(line[len(RESULT_SENTINEL):])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                return record
+    return None
+
+
+def _record_objective(record: dict):
+    objective = record.get("objective")
+    if isinstance(objective, bool) or not isinstance(objective, (int, float)):
+        return None
+    if objective != objective or objective in (float("inf"), float("-inf")):
+        return None
+    return float(objective)
+
+
+def _solver_limits() -> dict | None:
+    """
+    這次執行套用到 pulp solver 的限制（solver_limits.py）：CLI 的設定，
+    timeLimit 再以這一題剩下的 --deadline 與 sandbox 的 wall-clock 上限截短，讓 solver 自己停下來回報 incumbent。
+    --solver-backend 也放在這裡，所以會進到執行快取的 key 與 sandbox 的工作。
+    """
+    caps = []
+    deadline = PROBLEM_DEADLINE.get()
+    if deadline is not None:
+        caps.append(deadline - time.monotonic() - SOLVER_DEADLINE_MARGIN)
+    if SANDBOX is not None and SANDBOX.limits["wall_seconds"]:
+        caps.append(SANDBOX.limits["wall_seconds"] - SOLVER_DEADLINE_MARGIN)
+    caps = [max(MIN_SOLVER_SECONDS, int(cap)) for cap in caps]
+    if OPTIONS["solver_time_limit"]:
+        caps.append(OPTIONS["solver_time_limit"])
+    limits = {}
+    if caps:
+        limits["time_limit"] = min(caps)
+    if OPTIONS["solver_threads"]:
+        limits["threads"] = OPTIONS["solver_threads"]
+    if OPTIONS["solver_gap"]:
+        limits["gap_rel"] = OPTIONS["solver_gap"]
+    if OPTIONS["solver_backend"] != "cbc":
+        limits["backend"] = OPTIONS["solver_backend"]
+    return limits or None
+
+
+def _exec_namespace(instance: dict | None = None) -> dict:
+    """產生的程式執行時的 globals：report()、INSTANCE 與 pulp（sandbox worker 也用這個）。"""
+    env = {"__name__": "__main__", "report": _report}  # [MOD]
+    if instance is not None:
+        env["INSTANCE"] = instance
+    try:
+        import pulp  # noqa
+        env["pulp"] = pulp
+    except Exception:
+        pass  # If pulp isn't installed, let the code raise a clear error
+    return env
+
+
 # -----------------------------
 # [MOD] Helper: safe code execution with captured stdout/stderr
 # -----------------------------
-def run_generated_code(code_str: str) -> str:
+def run_generated_code(code_str: str, instance: dict | None = None) -> str:
     """
     Execute LLM-generated python code safely, capture stdout/stderr,
     and make sure required modules (e.g., pulp) are visible.
-    Returns the combined stdout/stderr text.
+    If `instance` is given (see instance_data.parse_instance) it is exposed to the code as `INSTANCE`.
+    Returns the combined stdout/stderr text, bounded by exec_output.BoundedOutput
+    (head/tail lines plus the lines that decide success; the rest is only counted).
+    With --sandbox the code runs in a SANDBOX worker process instead, under its time and memory limits.
     """
     # Normalize NBSP and similar unicode spaces
     cleaned = code_str.replace('\u00A0', ' ')
-    
+
+    # [MOD] Time limit / threads / gap injected into every pulp solve; they change the output, so they are part of the keys
+    limits = _solver_limits()
+    key_extra = (instance["fingerprint"] if instance else "") + (json.dumps(limits, sort_keys=True) if limits else "")
+
+    # [MOD] Identical programs (up to whitespace/comments) return the cached output
+    cache_key = None
+    if EXEC_CACHE is not None:
+        cache_key = code_key(cleaned, key_extra)
+        cached = EXEC_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+    checkpoint = CHECKPOINT.get()
+    checkpoint_key = None
+    if checkpoint is not None:
+        checkpoint_key = code_key(cleaned, key_extra)
+        saved = checkpoint.get_exec(checkpoint_key)
+        if saved is not None:
+            return saved
+
+    if SANDBOX is not None and SANDBOX.usable():
+        result = SANDBOX.run(cleaned, instance, limits)
+        output = result["output"]
+        if result["status"] in KILLED_STATUSES:
+            # Depends on the limits, not only on the code: never cached or checkpointed
+            print(f"[Sandbox] Program stopped ({result['status']}) after {result['wall_seconds']:.1f}s wall / "
+                  f"{result['cpu_seconds']:.1f}s cpu.")
+            return output
+    else:
+        output = _run_in_process(cleaned, instance, limits)
+    if cache_key is not None:
+        EXEC_CACHE.put(cache_key, output)
+    if checkpoint_key is not None:
+        checkpoint.save_exec(checkpoint_key, output)
+    return output
+
+
+def _run_in_process(cleaned: str, instance: dict | None = None, limits: dict | None = None) -> str:
     # Prepare execution namespace
-    env = {"__name__": "__main__"}  # [MOD]
-    try:
-        import pulp  # noqa
-        env["pulp"] = pulp
-    except Exception:
-        pass  # If pulp isn't installed, let the code raise a clear error
+    env = _exec_namespace(instance)
     
-    out_buf = io.StringIO()
-    err_buf = io.StringIO()
+    # [MOD] Constraint-by-constraint verification prints can run to tens of thousands of lines
+    out_buf = BoundedOutput()
+    err_buf = BoundedOutput()
     
     try:
-        with redirect_stdout(out_buf), redirect_stderr(err_buf):
+        with capture_output(out_buf, err_buf), limits_applied(limits):  # [MOD] context-local, safe with concurrent problems
             exec(cleaned, env, env)
     except Exception:
         out_buf.write("---------- TRACEBACK ----------\n")
@@ -106,15 +390,67 @@ def run_generated_code(code_str: str) -> str:
     if stderr_text:
         out_buf.write("\n[STDERR]\n")
         out_buf.write(stderr_text)
-    
     return out_buf.getvalue()
 
+
+def _init_portfolio_worker(options: dict, deadline: float | None, exec_cache_dir: str | None, exec_cache_on: bool) -> None:
+    """
+    Portfolio worker process 的初始化（forkserver / spawn 不會繼承父行程的狀態）：
+    帶入 CLI 的 OPTIONS、這一題的 deadline 與執行快取，並自成一個 process group，
+    結束 portfolio 時連同 CBC 子行程一起終止。
+    """
+    global EXEC_CACHE
+    os.setsid()
+    OPTIONS.update(options)
+    PROBLEM_DEADLINE.set(deadline)
+    if exec_cache_on:
+        EXEC_CACHE = ExecutionCache(exec_cache_dir)
+
+
+def _portfolio_exec_pool(k: int) -> ProcessPoolExecutor:
+    """不用 fork：父行程已經有 --jobs 與 streaming log 的執行緒。"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__, "pulp"])  # imported once by the server, not by every worker
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(
+        max_workers=k, mp_context=context, initializer=_init_portfolio_worker,
+        initargs=(dict(OPTIONS), PROBLEM_DEADLINE.get(),
+                  EXEC_CACHE.cache_dir if EXEC_CACHE is not None else None, EXEC_CACHE is not None),
+    )
+
+
+def _terminate_exec_pool(pool: ProcessPoolExecutor) -> None:
+    """shutdown(cancel_futures=True) 只取消還沒開始的候選；還在求解的 worker（與它的 CBC）在這裡直接終止。"""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)  # the worker and the cbc it started
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.kill()  # a worker still booting has not called setsid() yet
+    for process in processes:
+        process.join(timeout=5)
+
+
+def _timed_run(code_str: str, instance: dict | None = None) -> tuple[str, float]:
+    """run_generated_code 的計時版本，給 portfolio 的 worker process 使用。"""
+    start = time.monotonic()
+    output = run_generated_code(code_str, instance)
+    return output, time.monotonic() - start
+
 # -----------------------------
 # [MOD] Helpers: detect success/error and extract code
 # -----------------------------
 def _has_objective(text: str) -> bool:
     if not isinstance(text, str):
         return False
+    record = _result_record(text)
+    if record is not None:
+        return _record_objective(record) is not None
+    # Fallback for programs that never called report()
     pattern = r"Objective value:\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)"
     return re.search(pattern, text) is not None
 
@@ -122,6 +458,16 @@ def _has_objective(text: str) -> bool:
 def _is_error_output(text: str) -> bool:
     if not isinstance(text, str):
         return True
+    if KILLED_SENTINEL in text:
+        return True
+    record = _result_record(text)
+    if record is not None:
+        # A structured record only fails on a real exception, an explicit validation
+        # failure, or a non-optimal solver status — not on words in verification prints.
+        if "Traceback" in text or "DATA_VALIDATION_FAILED" in text:
+            return True
+        return str(record.get("status")) in FAILED_STATUSES
+    # Fallback keyword heuristics for programs that never called report()
     err_keywords = (
         "Traceback",
         "DATA_VALIDATION_FAILED",
@@ -134,6 +480,71 @@ def _is_error_output(text: str) -> bool:
     return any(k in text for k in err_keywords)
 
 
+def _classification_signature(text: str):
+    """
+    取出分類結果中決定後續步驟的部分 (detected_type, integer_vars)，
+    用於判斷檢查輪次是否已收斂；無法解析時回傳 None。
+    """
+    try:
+        start = text.find('{')
+        end = text.rfind('}') + 1
+        parsed = json.loads(text[start:end])
+        return parsed.get("detected_type"), tuple(sorted(str(v) for v in parsed.get("integer_vars") or []))
+    except (json.JSONDecodeError, AttributeError, TypeError):
+        return None
+
+
+def _header_classification(problem: str) -> dict | None:
+    """
+    [MOD] 由資料集 parser 產生的區段標頭直接得到分類 JSON（不呼叫 LLM）；
+    無法辨識的文字回傳 None，交給 PROBLEM_MATCHING_PROMPT。
+    """
+    instance_type = detect_instance_type(problem)
+    if instance_type not in HEADER_CLASSIFICATIONS:
+        return None
+    return dict(HEADER_CLASSIFICATIONS[instance_type])
+
+
+def _parse_fused_classification(text: str) -> tuple[dict, bool]:
+    """
+    [MOD] 解析 FUSED_CLASSIFICATION_PROMPT 的輸出。
+
+    Returns:
+        tuple[dict, bool]: 與 PROBLEM_MATCHING_PROMPT 相同三個 key 的分類結果，以及自我檢查是否改動了草稿。
+    """
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    parsed = json.loads(text[start:end])
+    q_c = {key: parsed.get(key) for key in ("detected_type", "integer_vars", "justification")}
+    q_c["integer_vars"] = q_c["integer_vars"] or []
+    draft = parsed.get("draft") or {}
+    changed = (
+        draft.get("detected_type") != q_c["detected_type"]
+        or sorted(map(str, draft.get("integer_vars") or [])) != sorted(map(str, q_c["integer_vars"]))
+    )
+    return q_c, changed
+
+
+def _parse_fused_formulation(text: str) -> tuple[str, bool | None]:
+    """
+    [MOD] 解析 FUSED_FORMULATION_PROMPT 的輸出：取 FINAL FORMULATION 區段作為 final_answer，
+    並讀出 CRITIQUE 中的 is_correct（無法解析時為 None）。找不到區段時整份輸出當作 final_answer。
+    """
+    final = re.split(r"^#+\s*FINAL FORMULATION\s*$", text, flags=re.MULTILINE)
+    critique = re.search(r"^#+\s*CRITIQUE\s*$(.*?)(?=^#+\s*FINAL FORMULATION)", text, flags=re.MULTILINE | re.DOTALL)
+    is_correct = None
+    if critique is not None:
+        match = re.search(r'\{[^{}]*"is_correct"[^{}]*\}', critique.group(1))
+        if match is not None:
+            try:
+                is_correct = bool(json.loads(match.group(0)).get("is_correct"))
+            except json.JSONDecodeError:
+                pass
+    if len(final) < 2 or not final[-1].strip():
+        return text, is_correct
+    return final[-1].strip(), is_correct
+
+
 def _extract_code_from_markdown(s: str) -> str:
     try:
         if "```python" in s:
@@ -146,6 +557,14 @@ def _extract_code_from_markdown(s: str) -> str:
     return s
 
 
+def _compiles(code: str) -> bool:
+    try:
+        compile(code.replace('\u00A0', ' '), "<generated>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
 def _violates_io(code: str) -> bool:
     if not isinstance(code, str):
         return True
@@ -158,161 +577,548 @@ def _violates_io(code: str) -> bool:
     )
     return any(tok in lowered for tok in banned)
 
-def _missing_required_context(code: str) -> bool:
+def _missing_required_context(code: str, data_injected: bool = False) -> bool:
     if not isinstance(code, str):
         return True
     need = ("raw_problem_text", "raw_model_text", "raw_classification_json")
+    if data_injected:
+        # The instance arrives through INSTANCE; embedding the raw text would only echo megabytes back
+        need = ("raw_model_text", "raw_classification_json")
     return not all(k in code for k in need)
 
 
-def solve(problem: str) -> tuple[str, dict]:
+def _code_generator_prompt(final_answer: str, instance: dict | None, examples: str = "") -> str:
+    prompt = CODE_GENERATOR_PROMPT.format(math_model_text=final_answer)
+    if instance is not None:
+        prompt += INSTANCE_DATA_PROMPT.format(
+            instance_type=instance["type"], instance_fields=INSTANCE_DATA_DOCS[instance["type"]]
+        )
+    if examples:
+        prompt += RETRIEVED_EXAMPLES_PROMPT.format(examples=examples)
+    return prompt
+
+
+def _retrieve_examples(problem: str, solve_stats: dict) -> str:
+    """[MOD] 從過去答對的題目中取最相似的 retrieve_k 題，排成 CODE_GENERATOR_PROMPT 的範例。"""
+    query_start = time.monotonic()
+    matches = RETRIEVAL_INDEX.query(problem, OPTIONS["retrieve_k"])
+    solve_stats["retrieval_query_seconds"] = round(time.monotonic() - query_start, 4)
+    solve_stats["retrieval_examples"] = len(matches)
+    if not matches:
+        return ""
+    print("[Retrieval] Similar solved problems: " + ", ".join(
+        f"{os.path.basename(example['desc_path'])} ({score:.2f})" for score, example in matches
+    ), "\n")
+    return format_examples(matches)
+
+
+def _generate_candidate(index: int, final_answer: str, instance: dict | None = None, examples: str = "") -> tuple[str, dict]:
+    """以獨立的 client 產生第 index 個程式候選，回傳 (模型回答, 該步驟紀錄)。"""
+    cand_model = _spawn_model()
+    cand_log = {}
+    step_name = f"Code Generation (candidate {index})"
+    math_ans, _ = token_speed_calculator(
+        step_name, cand_log, cand_model.token_used().copy(), cand_model,
+        mes=final_answer, system_prompt=_code_generator_prompt(final_answer, instance, examples)
+    )
+    return math_ans, cand_log[step_name]
+
+
+def _run_portfolio(final_answer: str, k: int, token_log: dict, solve_stats: dict, instance: dict | None = None,
+                   examples: str = "") -> dict:
+    """
+    同時請模型產生 k 個程式候選，並在 worker process 中平行執行。
+    只要某個 objective 已得到過半數候選支持就提早結束；否則等全部完成後取多數，
+    平手時取最早完成的那一個。
+
+    Returns:
+        dict: index / code / output 為勝出的候選（沒有時 code 為 None），
+        fallback_answer 為第一個產生完成的回答，供修正流程使用。
+    """
+    timings = [{"index": i} for i in range(k)]
+    successes = []  # (index, objective, code, output) in completion order
+    fallback_answer = None
+    gen_pool = ThreadPoolExecutor(max_workers=k)
+    # With --sandbox the candidates already run in separate worker processes
+    exec_pool = ThreadPoolExecutor(max_workers=k) if SANDBOX is not None else _portfolio_exec_pool(k)
+    try:
+        pending = {
+            gen_pool.submit(bind(_generate_candidate), i, final_answer, instance, examples): ("gen", i) for i in range(k)
+        }
+        codes = {}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, i = pending.pop(fut)
+                if kind == "gen":
+                    try:
+                        math_ans, step_log = fut.result()
+                    except Exception as e:
+                        print(f"[Portfolio] Candidate {i} generation failed: {e}")
+                        timings[i]["ok"] = False
+                        continue
+                    token_log[f"Code Generation (candidate {i})"] = step_log
+                    timings[i]["generation_seconds"] = step_log["duration_seconds"]
+                    if fallback_answer is None:
+                        fallback_answer = math_ans
+                    code = _extract_code_from_markdown(math_ans)
+                    if code.strip() == "":
+                        code = math_ans
+                    if not _compiles(code) or _violates_io(code):
+                        print(f"[Portfolio] Candidate {i} rejected by the syntax / I/O guard.")
+                        timings[i]["ok"] = False
+                        continue
+                    codes[i] = code
+                    pending[exec_pool.submit(_timed_run, code, instance)] = ("exec", i)
+                else:
+                    try:
+                        output, seconds = fut.result()
+                    except Exception as e:
+                        output, seconds = f"[Portfolio] worker failed: {e}", 0.0
+                    timings[i]["execution_seconds"] = round(seconds, 4)
+                    ok = _has_objective(output) and not _is_error_output(output)
+                    timings[i]["ok"] = ok
+                    if ok:
+                        objective = extract(output)
+                        timings[i]["objective"] = objective
+                        successes.append((i, objective, codes[i], output))
+
+            votes = {}
+            for _, objective, _, _ in successes:
+                votes[round(objective, 6)] = votes.get(round(objective, 6), 0) + 1
+            if votes and max(votes.values()) * 2 > k:
+                break
+    finally:
+        gen_pool.shutdown(wait=False, cancel_futures=True)
+        if isinstance(exec_pool, ProcessPoolExecutor):
+            _terminate_exec_pool(exec_pool)  # losing candidates must not keep solving
+        else:
+            exec_pool.shutdown(wait=False, cancel_futures=True)  # SANDBOX.run enforces the wall timeout
+
+    winner = {"index": None, "code": None, "output": None, "fallback_answer": fallback_answer}
+    if successes:
+        votes = {}
+        for _, objective, _, _ in successes:
+            votes[round(objective, 6)] = votes.get(round(objective, 6), 0) + 1
+        # max() keeps the first key on ties, i.e. the objective that finished first
+        majority = max(votes, key=votes.get)
+        index, _, code, output = next(s for s in successes if round(s[1], 6) == majority)
+        winner.update(index=index, code=code, output=output)
+        solve_stats["portfolio_agreement"] = votes[majority]
+        if len(votes) > 1:
+            print(f"[Portfolio] Candidates disagree on the objective: {votes}; keeping the majority {majority}.")
+
+    solve_stats["portfolio_winner"] = winner["index"] if winner["index"] is not None else -1
+    solve_stats["portfolio_candidates"] = timings
+    for t in timings:
+        print(f"[Portfolio] Candidate {t['index']}: {t}")
+    return winner
+
+
+def _solve_from_template_cache(problem: str, solve_stats: dict) -> str | None:
+    """
+    [MOD] 結構指紋相同的題目已經有成功的程式時，重新綁定到這一題的資料並執行驗證。
+
+    Returns:
+        str | None: 執行輸出；沒有命中、無法重新綁定或執行沒有產生 objective 時回傳 None。
+    """
+    solve_stats["template_cache_hit"] = False
+    entry = TEMPLATE_CACHE.get(problem)
+    if entry is None:
+        return None
+    code = rebind_program(entry, problem)
+    instance = parse_instance(problem) if entry["data_injected"] else None
+    if code is None or (entry["data_injected"] and instance is None):
+        print("[Template-Cache] Structural match, but the cached program cannot be re-bound to this instance.", "\n")
+        solve_stats["template_cache_rejected"] = True
+        return None
+
+    exec_output = run_generated_code(code, instance)
+    if not _has_objective(exec_output) or _is_error_output(exec_output):
+        print("[Template-Cache] Re-bound program failed verification; running the full pipeline.", "\n")
+        solve_stats["template_cache_rejected"] = True
+        return None
+
+    print(f"Extracted Code (template cache):\n{code}\n")
+    print(exec_output)
+    solve_stats["template_cache_hit"] = True
+    solve_stats["final_code"] = code
+    solve_stats["template_cache_saved_tokens"] = entry["tokens"]
+    solve_stats["template_cache_saved_seconds"] = entry["seconds"]
+    return exec_output
+
+
+def solve(problem: str) -> tuple[str, dict, dict]:
+    model = current_model()
 
     token_log = {}
+    solve_stats = {}
+    cache_hits_before = EXEC_CACHE.hits if EXEC_CACHE is not None else 0
     latest_tokens = model.token_used().copy() 
+    budget = StepBudget(OPTIONS["step_policy"], OPTIONS["deadline_seconds"])
 
-    # --- CLASSIFICATION ---
-    q_classify, latest_tokens = token_speed_calculator(
-        "Classification", token_log, latest_tokens, model,
-        mes=problem, system_prompt=PROBLEM_MATCHING_PROMPT
-    )
+    # [MOD] Problems that differ from an earlier one only in their numbers / data reuse its program
+    if TEMPLATE_CACHE is not None:
+        cached_output = _solve_from_template_cache(problem, solve_stats)
+        if cached_output is not None:
+            return cached_output, token_log, solve_stats
+
+    # [MOD] Large structured instances: the reasoning steps only need the structure
+    # (headers, dimensions, ranges, sample rows); the full data goes to the execution stage.
+    reasoning_problem = problem
+    summarized = False
+    if OPTIONS["summary_threshold"] > 0:
+        try:
+            problem_tokens = count_tokens(problem)
+        except Exception as e:  # the summary is optional: never let token counting abort solve()
+            problem_tokens = None
+            print(f"[Summary] Could not count tokens ({type(e).__name__}: {e}); summary skipped.", "\n")
+        if problem_tokens is not None and problem_tokens > OPTIONS["summary_threshold"]:
+            summary = summarize_instance(problem)
+            if summary is not None:
+                reasoning_problem = summary
+                summarized = True
+                try:
+                    summary_tokens = count_tokens(summary)
+                except Exception:
+                    summary_tokens = None
+                solve_stats["problem_tokens_before"] = problem_tokens
+                if summary_tokens is not None:
+                    solve_stats["problem_tokens_after"] = summary_tokens
+                print(f"[Summary] Problem text {problem_tokens} -> {summary_tokens} tokens for the reasoning steps.", "\n")
+    solve_stats["summarized"] = summarized
+
+    # [MOD] Dataset-tagged problems are classified from their section headers, which
+    # saves the classification call and every check round.
+    header_q_c = _header_classification(problem) if OPTIONS["header_classify"] else None
+    solve_stats["header_classified"] = header_q_c is not None
+    spec_future = None
+    if header_q_c is not None:
+        q_classify = json.dumps(header_q_c, ensure_ascii=False)
+        detected_type = header_q_c["detected_type"]
+        solve_stats["check_rounds"] = 0
+        print("Classification Result (from headers):", q_classify, "\n")
+    elif OPTIONS["fused"]:
+        # [MOD] Fused: classification and its self-verification in one structured call, no check rounds
+        fused_classify, latest_tokens = token_speed_calculator(
+            "Classification (fused)", token_log, latest_tokens, model,
+            mes=reasoning_problem, system_prompt=FUSED_CLASSIFICATION_PROMPT
+        )
+        print("Classification Result (fused):", fused_classify, "\n")
+        try:
+            fused_q_c, changed = _parse_fused_classification(fused_classify)
+        except json.JSONDecodeError:
+            print("CRITICAL ERROR: Fused classification failed. The model did not return valid JSON.")
+            print(f"Content received: {fused_classify}")
+            raise
+        q_classify = json.dumps(fused_q_c, ensure_ascii=False)
+        solve_stats["check_rounds"] = 0
+        solve_stats["fused_self_check_changed"] = changed
+        print(f"[Fused] Self-verification {'changed' if changed else 'kept'} the draft classification.", "\n")
+    else:
+        # --- CLASSIFICATION ---
+        q_classify, latest_tokens = token_speed_calculator(
+            "Classification", token_log, latest_tokens, model,
+            mes=reasoning_problem, system_prompt=PROBLEM_MATCHING_PROMPT
+        )
     
-    print("Classification Result:", q_classify, "\n")
+        print("Classification Result:", q_classify, "\n")
     
-    try:
-        start = q_classify.find('{')
-        end = q_classify.rfind('}') + 1
-        q_c = json.loads(q_classify[start:end])
-    except json.JSONDecodeError:
-        print(f"CRITICAL ERROR: Initial classification failed. The model did not return valid JSON.")
-        print(f"Content received: {q_classify}")
-        raise
+        try:
+            start = q_classify.find('{')
+            end = q_classify.rfind('}') + 1
+            q_c = json.loads(q_classify[start:end])
+        except json.JSONDecodeError:
+            print("CRITICAL ERROR: Initial classification failed. The model did not return valid JSON.")
+            print(f"Content received: {q_classify}")
+            raise
     
-    detected_type = q_c.get("detected_type", "Unknown")
+        detected_type = q_c.get("detected_type", "Unknown")
     
-    print(f"Init Problem Type: {detected_type}", "\n")
+        print(f"Init Problem Type: {detected_type}", "\n")
 
-    for i in range(5):
-        F_CHECK_MATCHING_PROMPT = CHECK_MATCHING_PROMPT.format(
-            detected_type=detected_type,
-            math_model_text=q_classify,
-        )
-        q_classify, latest_tokens = token_speed_calculator(
-            f"Check problem matching {i+1}", token_log, latest_tokens, model,
-            mes=q_classify, system_prompt=F_CHECK_MATCHING_PROMPT
-        )
+        # [MOD] Speculative formulation: the type rarely changes during the checks,
+        # so draft the initial answer with the preliminary type in the meantime.
+        if OPTIONS["speculative_init"]:
+            spec_pool = ThreadPoolExecutor(max_workers=1)
+            spec_future = spec_pool.submit(bind(_speculative_init_answer), reasoning_problem, detected_type)
+            spec_pool.shutdown(wait=False)
+
+        # [MOD] Fixed-point detection: stop once K consecutive rounds leave
+        # (detected_type, integer_vars) unchanged instead of always running every round.
+        agree_k = OPTIONS["check_agree_k"]
+        prev_signature = _classification_signature(q_classify)
+        agree_streak = 0
+        rounds_used = 0
+        for i in range(OPTIONS["check_max_rounds"]):
+            if budget.decide("Check problem matching") == "skip":
+                break
+            F_CHECK_MATCHING_PROMPT = CHECK_MATCHING_PROMPT.format(
+                detected_type=detected_type,
+                math_model_text=q_classify,
+            )
+            q_classify, latest_tokens = token_speed_calculator(
+                f"Check problem matching {i+1}", token_log, latest_tokens, model,
+                mes=q_classify, system_prompt=F_CHECK_MATCHING_PROMPT
+            )
+            rounds_used = i + 1
+
+            signature = _classification_signature(q_classify)
+            if signature is not None and signature == prev_signature:
+                agree_streak += 1
+            else:
+                agree_streak = 0
+            prev_signature = signature
+            if agree_k and agree_streak >= agree_k:
+                break
+
+        solve_stats["check_rounds"] = rounds_used
+        print(f"[Check] {rounds_used} check round(s) used (agreement streak {agree_streak}, K={agree_k}).", "\n")
     
     start = q_classify.find('{')
     end = q_classify.rfind('}') + 1   
     q_c = json.loads(q_classify[start:end])
     classification_json_str = json.dumps(q_c, ensure_ascii=False)
 
-    COMPLEXITY_TABLE = {
-        "LP": "P", "ILP": "NP-hard", "MILP": "NP-hard", "QP": "NP-hard",
-        "NLP": "NP-hard", "Knapsack": "NP-complete", "TSP": "NP-complete",
-        "Set Cover": "NP-complete", "GCP": "NP-hard", "Others": "Others"
-    }
     complexity = COMPLEXITY_TABLE.get(q_c["detected_type"], "Unknown")
 
     print(f"Final Problem Type: {q_c['detected_type']}")
     print(f"Problem Complexity: {complexity}", "\n")
 
-    # --- INITIAL ANSWER ---
-    F_INIT_ANSWER_PROMPT = INIT_ANSWER_PROMPT.format(
-        detected_type=q_c["detected_type"],
-        complexity=complexity
-    )
-    init_answer, latest_tokens = token_speed_calculator(
-        "Initial Answer", token_log, latest_tokens, model,
-        mes=problem, system_prompt=F_INIT_ANSWER_PROMPT
-    )
+    if OPTIONS["fused"]:
+        # [MOD] Fused: formulation, self-critique and revised formulation in one structured call
+        F_FUSED_FORMULATION_PROMPT = FUSED_FORMULATION_PROMPT.format(
+            detected_type=q_c["detected_type"],
+            complexity=complexity
+        )
+        fused_answer, latest_tokens = token_speed_calculator(
+            "Formulation (fused)", token_log, latest_tokens, model,
+            mes=reasoning_problem, system_prompt=F_FUSED_FORMULATION_PROMPT
+        )
+        print("Fused Formulation:", fused_answer, "\n")
+        final_answer, draft_correct = _parse_fused_formulation(fused_answer)
+        solve_stats["fused_draft_correct"] = draft_correct
+    else:
+        # --- INITIAL ANSWER ---
+        init_answer = None
+        if spec_future is not None:
+            wait_start = time.monotonic()
+            try:
+                spec_answer, spec_step_log = spec_future.result()
+            except Exception as e:
+                print(f"[Speculative] Speculative initial answer failed: {e}")
+                spec_answer, spec_step_log = None, None
+            waited = time.monotonic() - wait_start
 
-    print("Initial Answer:", init_answer, "\n")
+            hit = spec_answer is not None and q_c["detected_type"] == detected_type
+            if spec_step_log is not None:
+                token_log["Initial Answer (speculative)"] = spec_step_log
+            solve_stats["speculative_hit"] = hit
+            # On a hit the speculative call overlapped the check rounds; only the time we
+            # still had to wait for it counts against the critical path.
+            solve_stats["speculative_saved_seconds"] = (
+                round(spec_step_log["duration_seconds"] - waited, 4) if hit else 0.0
+            )
+            if hit:
+                init_answer = spec_answer
+                print(f"[Speculative] Hit: type stayed {detected_type}, reusing the speculative answer.")
+            else:
+                print(f"[Speculative] Miss: {detected_type} -> {q_c['detected_type']}, re-issuing the initial answer.")
 
-    # --- REVIEW ---
-    F_GENERAL_EXPERT_PROMPT = GENERAL_EXPERT_PROMPT.format(
-        detected_type=q_c["detected_type"],
-        complexity=complexity,
-        original_problem_text=problem,
-    )
-    review_answer, latest_tokens = token_speed_calculator(
-        "Review", token_log, latest_tokens, model,
-        mes=init_answer, system_prompt=F_GENERAL_EXPERT_PROMPT
-    )
+        if init_answer is None:
+            F_INIT_ANSWER_PROMPT = INIT_ANSWER_PROMPT.format(
+                detected_type=q_c["detected_type"],
+                complexity=complexity
+            )
+            init_answer, latest_tokens = token_speed_calculator(
+                "Initial Answer", token_log, latest_tokens, model,
+                mes=reasoning_problem, system_prompt=F_INIT_ANSWER_PROMPT
+            )
 
-    print("Review Answer:", review_answer, "\n")
+        print("Initial Answer:", init_answer, "\n")
 
-    # --- REFINE ANSWER ---
-    final_answer = init_answer
-    try:
-        is_correct = json.loads(review_answer).get("is_correct", True) 
-        if not is_correct:
-            final_prompt = MODIFIED_INIT_ANSWER_PROMPT.format(
-                INIT_ANSWER=init_answer, 
-                REVIEW=review_answer,
+        # --- REVIEW ---
+        # [MOD] The step policy may skip the review (low-risk class, no time left) or run it at low effort
+        review_answer = None
+        review_action = budget.decide("Review", complexity)
+        if review_action != "skip":
+            F_GENERAL_EXPERT_PROMPT = GENERAL_EXPERT_PROMPT.format(
+                detected_type=q_c["detected_type"],
+                complexity=complexity,
+                original_problem_text=reasoning_problem,
             )
-            final_answer, latest_tokens = token_speed_calculator(
-                "Refine Answer (1 Step)", token_log, latest_tokens, model,
-                mes=final_prompt, system_prompt=""
-            )
-    except (json.JSONDecodeError, AttributeError):
-        print("Warning: Review did not return valid JSON. Skipping refinement.")
+            configured_effort = model.reasoning_effort
+            if review_action == "shorten":
+                model.reasoning_effort = "low"
+            try:
+                review_answer, latest_tokens = token_speed_calculator(
+                    "Review" if review_action == "run" else "Review (low effort)", token_log, latest_tokens, model,
+                    mes=init_answer, system_prompt=F_GENERAL_EXPERT_PROMPT
+                )
+            finally:
+                model.reasoning_effort = configured_effort
+
+            print("Review Answer:", review_answer, "\n")
+
+        # --- REFINE ANSWER ---
+        final_answer = init_answer
+        try:
+            is_correct = json.loads(review_answer).get("is_correct", True) if review_answer is not None else True
+            if not is_correct and budget.decide("Refine Answer", complexity) == "skip":
+                print("Warning: Review flagged the model, but the step policy skips refinement.")
+            elif not is_correct:
+                final_prompt = MODIFIED_INIT_ANSWER_PROMPT.format(
+                    INIT_ANSWER=init_answer, 
+                    REVIEW=review_answer,
+                )
+                final_answer, latest_tokens = token_speed_calculator(
+                    "Refine Answer (1 Step)", token_log, latest_tokens, model,
+                    mes=final_prompt, system_prompt=""
+                )
+        except (json.JSONDecodeError, AttributeError):
+            print("Warning: Review did not return valid JSON. Skipping refinement.")
 
     print("Final Answer:", final_answer, "\n")
 
     # --- CODE GENERATOR & FIX ---
-    # 1) Generate initial code
-    math_ans, latest_tokens = token_speed_calculator(
-        "Code Generation", token_log, latest_tokens, model,
-        mes=final_answer, system_prompt=CODE_GENERATOR_PROMPT.format(math_model_text=final_answer)
+    # [MOD] Known dataset formats are parsed once here and injected as INSTANCE
+    # (always when the reasoning steps only saw a summary, otherwise the data would be lost)
+    instance = parse_instance(problem) if OPTIONS["inject_data"] or summarized else None
+    data_injected = instance is not None
+    solve_stats["data_injected"] = data_injected
+    if data_injected:
+        print(f"[Instance] Injecting pre-parsed {instance['type']} data as INSTANCE.")
+    raw_strings_note = (
+        "embeds raw_model_text/raw_classification_json, reads the instance data from INSTANCE"
+        if data_injected else "embeds the three raw strings"
     )
 
-    # 2) First pass through FIX_CODE_PROMPT to polish before execution
-    F_FIX_CODE_PROMPT = FIX_CODE_PROMPT.format(
-        code=math_ans,
-        raw_problem=problem,
-        raw_model=final_answer,
-        classification_json=classification_json_str,
-    )
-    math_ans, latest_tokens = token_speed_calculator(
-        "Code Fix Loop 1", token_log, latest_tokens, model,
-        mes="Please ensure the code runs end-to-end and prints 'Objective value: <number>'.",
-        system_prompt=F_FIX_CODE_PROMPT,
-    )
+    code_ready = False  # True once math_code / exec_output hold a successful run
+    math_ans = None
 
-    # Extract code from markdown fences
-    math_code = _extract_code_from_markdown(math_ans)
-    if math_code.strip() == "":
-        math_code = math_ans
-    print(f"Extracted Code:\n{math_code}\n")
+    # [MOD] Few-shot examples: successful programs of the most similar previously solved problems
+    examples = _retrieve_examples(problem, solve_stats) if RETRIEVAL_INDEX is not None else ""
 
-    # Guard: forbid external I/O and enforce embedded raw context
-    if _violates_io(math_code) or _missing_required_context(math_code):
-        fix_mes = (
-            "Detected forbidden external I/O or missing required embedded raw strings. "
-            "Remove all external reads and ensure raw_problem_text/raw_model_text/raw_classification_json are present."
+    # [MOD] Portfolio: K candidates generated and executed in parallel
+    if OPTIONS["portfolio_k"] > 1:
+        winner = _run_portfolio(final_answer, OPTIONS["portfolio_k"], token_log, solve_stats, instance, examples)
+        if winner["code"] is not None:
+            math_code, exec_output = winner["code"], winner["output"]
+            code_ready = True
+            print(f"[Portfolio] Candidate {winner['index']} accepted.")
+        else:
+            math_ans = winner["fallback_answer"]
+            print("[Portfolio] No candidate produced an objective; falling back to the fix loop.")
+
+    # 1) Generate initial code
+    if not code_ready and math_ans is None:
+        math_ans, latest_tokens = token_speed_calculator(
+            "Code Generation", token_log, latest_tokens, model,
+            mes=final_answer, system_prompt=_code_generator_prompt(final_answer, instance, examples)
         )
+
+    # [MOD] Lazy fixing: run the freshly generated code first and only pay for
+    # Code Fix Loop 1 when it fails to compile, trips the guard, errors or prints no objective.
+    fix_loop_mes = "Please ensure the code runs end-to-end and prints 'Objective value: <number>'."
+    lazy_fix = OPTIONS["lazy_fix"]
+    fix_loop_skipped = False
+    if not code_ready and not lazy_fix and budget.decide("Code Fix Loop 1") == "skip":
+        lazy_fix = fix_loop_skipped = True  # run the draft first; Code Fix Loop 1 only runs if it fails
+    if not code_ready and lazy_fix:
+        draft_code = _extract_code_from_markdown(math_ans)
+        if draft_code.strip() == "":
+            draft_code = math_ans
+        if not _compiles(draft_code):
+            print("[Lazy-Fix] Generated code has a syntax error; sending it through Code Fix Loop 1.")
+        elif _violates_io(draft_code) or _missing_required_context(draft_code, data_injected):
+            print("[Lazy-Fix] Generated code fails the I/O / raw-context guard; sending it through Code Fix Loop 1.")
+        else:
+            draft_output = run_generated_code(draft_code, instance)
+            code_ready = _has_objective(draft_output) and not _is_error_output(draft_output)
+            if code_ready:
+                math_code, exec_output = draft_code, draft_output
+                print("[Lazy-Fix] Generated code ran cleanly; Code Fix Loop 1 skipped.")
+            else:
+                print("[Lazy-Fix] Generated code did not produce an objective; sending it through Code Fix Loop 1.")
+                fix_loop_mes = "Runtime error / logs from previous run:\n" + summarize_output(draft_output) + "\n\n" + fix_loop_mes
+        solve_stats["prefix_skipped"] = code_ready
+        if fix_loop_skipped and not code_ready:
+            budget.defer("Code Fix Loop 1", "the draft failed, so the step runs after all")
+
+    if code_ready:
+        print(f"Extracted Code:\n{math_code}\n")
+        print(exec_output)
+    else:
+        # 2) First pass through FIX_CODE_PROMPT to polish before execution
         F_FIX_CODE_PROMPT = FIX_CODE_PROMPT.format(
-            code=math_code,
+            code=math_ans,
             raw_problem=problem,
             raw_model=final_answer,
             classification_json=classification_json_str,
         )
         math_ans, latest_tokens = token_speed_calculator(
-            "Code Fix Guard", token_log, latest_tokens, model,
-            mes=fix_mes, system_prompt=F_FIX_CODE_PROMPT,
+            "Code Fix Loop 1", token_log, latest_tokens, model,
+            mes=fix_loop_mes,
+            system_prompt=F_FIX_CODE_PROMPT,
         )
+
+        # Extract code from markdown fences
         math_code = _extract_code_from_markdown(math_ans)
         if math_code.strip() == "":
             math_code = math_ans
+        print(f"Extracted Code:\n{math_code}\n")
 
-    # 3) Execute once
-    exec_output = run_generated_code(math_code)
-    print(exec_output)
+        # Guard: forbid external I/O and enforce embedded raw context
+        if _violates_io(math_code) or _missing_required_context(math_code, data_injected):
+            fix_mes = (
+                "Detected forbidden external I/O or missing required embedded raw strings. "
+                "Remove all external reads and ensure raw_problem_text/raw_model_text/raw_classification_json are present."
+            )
+            if data_injected:
+                fix_mes = (
+                    "Detected forbidden external I/O or missing required embedded raw strings. "
+                    "Remove all external reads, ensure raw_model_text/raw_classification_json are present "
+                    "and read the instance data from the pre-defined INSTANCE dict."
+                )
+            F_FIX_CODE_PROMPT = FIX_CODE_PROMPT.format(
+                code=math_code,
+                raw_problem=problem,
+                raw_model=final_answer,
+                classification_json=classification_json_str,
+            )
+            math_ans, latest_tokens = token_speed_calculator(
+                "Code Fix Guard", token_log, latest_tokens, model,
+                mes=fix_mes, system_prompt=F_FIX_CODE_PROMPT,
+            )
+            math_code = _extract_code_from_markdown(math_ans)
+            if math_code.strip() == "":
+                math_code = math_ans
+
+        # 3) Execute once
+        exec_output = run_generated_code(math_code, instance)
+        print(exec_output)
 
     # 4) Auto-debug loop if runtime failed or no objective printed
     max_auto_fixes = 3
     attempt = 0
+    if OPTIONS["local_repair"]:
+        solve_stats["llm_rounds_avoided"] = 0
+    seen_programs = {code_key(math_code)}
     while (not _has_objective(exec_output) or _is_error_output(exec_output)) and attempt < max_auto_fixes:
+        # [MOD] Mechanical PuLP mistakes are rewritten locally; the LLM is only
+        # called when the repaired program still prints no objective.
+        if OPTIONS["local_repair"]:
+            repaired_code, fixes = repair_pulp_code(math_code)
+            if fixes and code_key(repaired_code) not in seen_programs:
+                print(f"[Local-Repair] Applied: {'; '.join(fixes)}")
+                math_code = repaired_code
+                seen_programs.add(code_key(math_code))
+                exec_output = run_generated_code(math_code, instance)
+                print(exec_output)
+                if _has_objective(exec_output) and not _is_error_output(exec_output):
+                    solve_stats["llm_rounds_avoided"] += 1
+                    break
+
         attempt += 1
         print(f"[Auto-Debug] Attempt {attempt}: objective missing or error detected. Re-invoking FIX_CODE_PROMPT…")
         # Build system prompt with original code, and pass error log as message
@@ -323,31 +1129,91 @@ def solve(problem: str) -> tuple[str, dict]:
             classification_json=classification_json_str,
         )
         fix_mes = (
-            "Runtime error / logs from previous run:\n" + exec_output +
-            "\n\nPlease fix the Python code so it runs successfully, embeds the three raw strings, performs no external I/O, "
-            "and outputs a line of the exact form 'Objective value: <number>'. Return ONLY the corrected Python code in a fenced block."
+            "Runtime error / logs from previous run (summary):\n" + summarize_output(exec_output) +
+            f"\n\nPlease fix the Python code so it runs successfully, {raw_strings_note}, performs no external I/O, "
+            "outputs a line of the exact form 'Objective value: <number>' and calls the pre-defined "
+            "report(objective=..., status=..., variables=...). Return ONLY the corrected Python code in a fenced block."
         )
         math_ans, latest_tokens = token_speed_calculator(
             f"Auto Debug Fix {attempt}", token_log, latest_tokens, model,
             mes=fix_mes, system_prompt=F_FIX_CODE_PROMPT,
         )
         # Extract code and execute again
-        math_code = _extract_code_from_markdown(math_ans)
-        if math_code.strip() == "":
-            math_code = math_ans
+        fixed_code = _extract_code_from_markdown(math_ans)
+        if fixed_code.strip() == "":
+            fixed_code = math_ans
         print(f"[Auto-Debug] New code extracted (attempt {attempt}).")
-        exec_output = run_generated_code(math_code)
+        program_key = code_key(fixed_code)
+        if program_key in seen_programs:
+            # Same program as an earlier attempt: its output is already known, so keep the last
+            # program and exec_output instead of running it again (or asking again)
+            print("[Auto-Debug] Fix returned a program identical to an earlier attempt; stopping the fix loop.")
+            solve_stats["fix_loop_repeat_stop"] = True
+            break
+        math_code = fixed_code
+        seen_programs.add(program_key)
+        exec_output = run_generated_code(math_code, instance)
         print(exec_output)
 
+    solve_stats["auto_debug_rounds"] = attempt
+    if EXEC_CACHE is not None:
+        solve_stats["exec_cache_hits"] = EXEC_CACHE.hits - cache_hits_before
+    if TEMPLATE_CACHE is not None and _has_objective(exec_output) and not _is_error_output(exec_output):
+        TEMPLATE_CACHE.put(
+            problem, math_code, data_injected,
+            tokens=sum(step["tokens_used"].get("total_tokens", 0) for step in token_log.values()),
+            seconds=sum(step["duration_seconds"] for step in token_log.values()),
+        )
+
+    solve_stats["final_code"] = math_code
+    solve_stats["skipped_steps"] = budget.decisions
+    record_durations(token_log)
+
     # Final result text returned from solve()
     result = exec_output
-    return result, token_log
+    return result, token_log, solve_stats
+
+
+def solve_direct(problem: str) -> tuple[str, dict, dict] | None:
+    """
+    [MOD] 標頭可辨識的資料集實例（TSP/GCP/NSP/VRP/Knapsack）直接執行 templates.py 的固定模型，
+    跳過分類、建模、審查與程式生成。
+
+    Returns:
+        tuple[str, dict, dict] | None: 與 solve() 相同；不是已知格式、解析失敗或範本沒有產生 objective 時
+        回傳 None，由呼叫端改走 LLM 流程。
+    """
+    instance = parse_instance(problem)
+    if instance is None:
+        return None
+    selected = select_template(instance, OPTIONS["route_time_limit"])
+    if selected is None:
+        return None
+    route, code = selected
+
+    start = time.monotonic()
+    exec_output = run_generated_code(code, instance)
+    duration = time.monotonic() - start
+    print(f"[Route] {route} template executed in {duration:.2f}s")
+    print(exec_output)
+    if not _has_objective(exec_output) or _is_error_output(exec_output):
+        print(f"[Route] {route} template produced no objective; falling back to the LLM pipeline.", "\n")
+        return None
+
+    token_log = {
+        f"Template {route}": {"tokens_used": {}, "duration_seconds": round(duration, 4), "tokens_per_second": 0}
+    }
+    return exec_output, token_log, {"route": f"template:{route}"}
 
 
 def extract(pipeline_ans: str) -> float:
     # print("🌟 程式結果：", pipeline_ans)
     if not isinstance(pipeline_ans, str):
         return "不是字串"
+    record = _result_record(pipeline_ans)
+    if record is not None and _record_objective(record) is not None:
+        print(f"🌟 Reported objective: {_record_objective(record)}")
+        return _record_objective(record)
     pattern = r"Objective value:\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)"  # [MOD] allow sci notation
     matches = re.findall(pattern, pipeline_ans)
     print(f"🌟 Matches found: {matches}")
@@ -356,6 +1222,135 @@ def extract(pipeline_ans: str) -> float:
     return float(matches[-1])
 
 
+def _print_run_summary(all_stats: list[dict]) -> None:
+    """
+    彙整整批執行的 solve_stats：布林欄位顯示次數，數值欄位顯示總和與平均。
+    """
+    if not all_stats:
+        return
+    print(f"===== Run summary ({len(all_stats)} problems) =====")
+    for key in sorted({k for stats in all_stats for k in stats}):
+        values = [stats[key] for stats in all_stats if key in stats]
+        if all(isinstance(v, bool) for v in values):
+            print(f"{key}: {sum(values)}/{len(values)}")
+        elif all(isinstance(v, (int, float)) for v in values):
+            print(f"{key}: total={round(sum(values), 4)}, mean={round(sum(values) / len(values), 4)}")
+
+
+def _print_group_summary(title: str, results: list[dict], key: str) -> None:
+    """
+    依 key 分組的題數、正確率與平均/最大延遲，例如 route（template:<type>/<mode> 或 llm）
+    或 policy（策略 + 被略過的步驟）。
+    """
+    groups = sorted({r[key] for r in results})
+    if not groups:
+        return
+    print(f"===== {title} =====")
+    for group in groups:
+        rows = [r for r in results if r[key] == group]
+        graded = [r["correct"] for r in rows if r["correct"] is not None]
+        accuracy = f"{sum(graded)}/{len(graded)}" if graded else "n/a"
+        latencies = [r["latency_seconds"] for r in rows]
+        print(
+            f"{group}: {len(rows)} problems, accuracy {accuracy}, "
+            f"latency mean={sum(latencies) / len(latencies):.2f}s max={max(latencies):.2f}s"
+        )
+
+
+def _print_template_cache_summary(dataset_stats: list[tuple[str, dict]]) -> None:
+    """依資料集（desc 檔所在目錄）彙整範本快取的命中率與省下的 token / 時間。"""
+    datasets = sorted({dataset for dataset, stats in dataset_stats if "template_cache_hit" in stats})
+    if not datasets:
+        return
+    print("===== Template cache =====")
+    for dataset in datasets:
+        rows = [stats for d, stats in dataset_stats if d == dataset and "template_cache_hit" in stats]
+        hits = [stats for stats in rows if stats["template_cache_hit"]]
+        rejected = sum(1 for stats in rows if stats.get("template_cache_rejected"))
+        saved_tokens = sum(stats["template_cache_saved_tokens"] for stats in hits)
+        saved_seconds = sum(stats["template_cache_saved_seconds"] for stats in hits)
+        print(
+            f"{dataset}: hits {len(hits)}/{len(rows)} ({100 * len(hits) / len(rows):.0f}%), rejected {rejected}, "
+            f"saved ~{saved_tokens} tokens / {saved_seconds:.1f}s of LLM time"
+        )
+
+
+def _print_retrieval_summary(all_stats: list[dict]) -> None:
+    """有 / 沒有檢索範例的題目各自的修正輪數，用來比較 few-shot 的效果。"""
+    groups = {"with retrieval": [], "without retrieval": []}
+    for stats in all_stats:
+        if "retrieval_examples" in stats and "auto_debug_rounds" in stats:
+            groups["with retrieval" if stats["retrieval_examples"] else "without retrieval"].append(stats)
+    if not any(groups.values()):
+        return
+    print("===== Retrieval =====")
+    for name, rows in groups.items():
+        if not rows:
+            continue
+        rounds = [stats["auto_debug_rounds"] for stats in rows]
+        query_ms = 1000 * sum(stats["retrieval_query_seconds"] for stats in rows) / len(rows)
+        print(
+            f"{name}: {len(rows)} problems, auto-debug rounds mean={sum(rounds) / len(rounds):.2f}, "
+            f"needed a fix round: {sum(1 for r in rounds if r)}/{len(rows)}, query {query_ms:.1f}ms"
+        )
+
+
+def _print_sandbox_summary() -> None:
+    """--sandbox：各 status 的程式執行次數與總用時。"""
+    if SANDBOX is None:
+        return
+    runs = sum(SANDBOX.status_counts.values())
+    print("===== Sandbox =====")
+    print(
+        f"{runs} program runs: " + ", ".join(f"{status} {n}" for status, n in sorted(SANDBOX.status_counts.items()))
+        + f"; wall {SANDBOX.wall_seconds:.1f}s, cpu {SANDBOX.cpu_seconds:.1f}s, "
+        f"worker startup {SANDBOX.startup_seconds:.2f}s (once), worker restarts {SANDBOX.restarts}"
+    )
+
+
+def _policy_label(policy: str, solve_stats: dict) -> str:
+    """Step policy 分組名稱：策略 + 實際被略過的步驟。"""
+    skipped = sorted({d["step"] for d in solve_stats.get("skipped_steps", []) if d["action"] == "skip"})
+    return f"{policy} ({'skipped ' + ', '.join(skipped) if skipped else 'no steps skipped'})"
+
+
+def _completed_log(log_path: str, desc_path: str) -> dict | None:
+    """--resume：log 已完整寫出且屬於同一個 desc 檔時回傳 log 內容，否則回傳 None。"""
+    if not os.path.isfile(log_path):
+        return None
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            log = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(log, dict) or log.get("desc_path") != os.path.abspath(desc_path):
+        return None
+    return log
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _parse_expected_answer(text: str) -> float | None:
+    """
+    .ans.txt 的數值答案：第一行的數字（LP / TSP / Knapsack）、`Answer: 5`（GCP）或 `Total Cost: 723.541`（VRP）。
+    NSP 的答案是排班表，回傳 None。
+    """
+    lines = text.strip().splitlines()
+    if not lines:
+        return None
+    try:
+        return float(lines[0].strip())
+    except ValueError:
+        pass
+    match = re.search(r"^(?:Answer|Total Cost):\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)\s*$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
 def main():
     # argument 在此
     parser = argparse.ArgumentParser(
@@ -374,10 +1369,164 @@ def main():
         "-r", "--reasoning", required=False, default="high", choices=["medium", "high"],
         help="Reasoning effort sent to the OpenAI API ('medium' or 'high')"
     )
+    parser.add_argument(
+        "--speculative", action="store_true",
+        help="Issue the initial answer with the preliminary type while the classification checks run"
+    )
+    parser.add_argument(
+        "--check-agree", type=int, default=OPTIONS["check_agree_k"],
+        help="Stop the classification checks after this many consecutive unchanged rounds (0 disables early exit)"
+    )
+    parser.add_argument(
+        "--check-max-rounds", type=int, default=OPTIONS["check_max_rounds"],
+        help="Maximum number of CHECK_MATCHING_PROMPT rounds"
+    )
+    parser.add_argument(
+        "--lazy-fix", action="store_true",
+        help="Run the generated code first and call FIX_CODE_PROMPT only if it fails"
+    )
+    parser.add_argument(
+        "--local-repair", action="store_true",
+        help="Apply deterministic AST repairs for common PuLP mistakes before asking the LLM to fix code"
+    )
+    parser.add_argument(
+        "--portfolio", type=int, default=OPTIONS["portfolio_k"], metavar="K",
+        help="Generate K code candidates concurrently and keep the majority objective (1 disables)"
+    )
+    parser.add_argument(
+        "--exec-cache", metavar="DIR", default=None,
+        help="Cache generated-code execution output in DIR, keyed by normalized AST and library versions"
+    )
+    parser.add_argument(
+        "--template-cache", nargs="?", const="", default=None, metavar="DIR",
+        help="Reuse a successful program for problems that differ only in numbers/data (persisted in DIR if given)"
+    )
+    parser.add_argument(
+        "--retrieve-from", nargs="+", default=None, metavar="LOG_DIR",
+        help="Index correctly solved problems in these log directories and add the most similar ones to code generation"
+    )
+    parser.add_argument(
+        "--retrieve-k", type=int, default=OPTIONS["retrieve_k"], metavar="K",
+        help="Number of retrieved examples per problem"
+    )
+    parser.add_argument(
+        "--inject-data", action="store_true",
+        help="Pre-parse TSP/GCP/Knapsack/NSP/VRP instances and inject them into the generated code as INSTANCE"
+    )
+    parser.add_argument(
+        "--summarize-above", type=int, default=OPTIONS["summary_threshold"], metavar="TOKENS",
+        help="Give the reasoning steps a schema-only summary of instances larger than TOKENS (0 disables)"
+    )
+    parser.add_argument(
+        "--step-policy", default=OPTIONS["step_policy"], choices=sorted(STEP_POLICIES),
+        help="Which optional steps (checks, review, refine, Code Fix Loop 1) may be skipped or shortened"
+    )
+    parser.add_argument(
+        "--deadline", type=float, default=OPTIONS["deadline_seconds"], metavar="SECONDS",
+        help="Per-problem time budget for the deadline-shedding policies (0 = no deadline)"
+    )
+    parser.add_argument(
+        "--fused", action="store_true",
+        help="Fused mode: classification with self-verification in one call, formulation + critique + revision in one call"
+    )
+    parser.add_argument(
+        "--llm-classify", action="store_true",
+        help="Always classify with the LLM, even when the dataset section headers identify the problem type"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip problems whose log is already written and continue interrupted ones from their checkpoint"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, metavar="N",
+        help="Solve N problems concurrently in threads (console lines are prefixed with the problem name)"
+    )
+    parser.add_argument(
+        "--gzip-logs", action="store_true",
+        help="Write thinking logs gzip-compressed (<problem>_thinking.log.gz)"
+    )
+    parser.add_argument(
+        "--solver-time-limit", type=float, default=OPTIONS["solver_time_limit"], metavar="SECONDS",
+        help="Cap the time limit of every pulp solver in generated code; the remaining --deadline also caps it (0 = none)"
+    )
+    parser.add_argument(
+        "--solver-threads", type=int, default=OPTIONS["solver_threads"], metavar="N",
+        help="Threads for pulp solvers in generated code that do not set their own (0 = solver default)"
+    )
+    parser.add_argument(
+        "--solver-gap", type=float, default=OPTIONS["solver_gap"], metavar="FRACTION",
+        help="Relative MIP gap for pulp solvers in generated code that do not set their own, e.g. 0.01 (0 = solver default)"
+    )
+    parser.add_argument(
+        "--solver-backend", choices=BACKENDS, default=OPTIONS["solver_backend"],
+        help="Solve CBC calls in generated code in-process with HiGHS (highspy) or scipy.optimize.milp; "
+             "auto = highs, else scipy. Falls back to CBC when the backend is missing or fails"
+    )
+    parser.add_argument(
+        "--sandbox", action="store_true",
+        help="Run generated code in pre-started worker processes (pulp/numpy pre-imported) with time and memory limits"
+    )
+    parser.add_argument(
+        "--sandbox-workers", type=int, default=0, metavar="N",
+        help="Sandbox worker processes (default: --jobs x --portfolio)"
+    )
+    parser.add_argument(
+        "--exec-timeout", type=float, default=300, metavar="SECONDS",
+        help="Sandbox wall-clock limit per program run, including the solver (0 = none)"
+    )
+    parser.add_argument(
+        "--exec-cpu", type=float, default=0, metavar="SECONDS",
+        help="Sandbox CPU-time limit per process (0 = none)"
+    )
+    parser.add_argument(
+        "--exec-memory", type=float, default=0, metavar="MB",
+        help="Sandbox address-space limit per process in MB (0 = none)"
+    )
+    parser.add_argument(
+        "--direct-route", action="store_true",
+        help="Solve TSP/GCP/NSP/VRP/Knapsack instances with the vetted templates.py models; the LLM only sees free-text problems"
+    )
+    parser.add_argument(
+        "--route-time-limit", type=float, default=OPTIONS["route_time_limit"], metavar="SECONDS",
+        help="Solver time limit for the direct-route templates"
+    )
     args = parser.parse_args()
 
-    global model
+    global model, EXEC_CACHE, TEMPLATE_CACHE, RETRIEVAL_INDEX, SANDBOX
     model = OpenAIReasoning(api_key=api_key, reasoning_effort=args.reasoning)
+    if args.exec_cache:
+        EXEC_CACHE = ExecutionCache(args.exec_cache)
+    if args.template_cache is not None:
+        TEMPLATE_CACHE = TemplateCache(args.template_cache or None)
+    if args.retrieve_from:
+        RETRIEVAL_INDEX = ExampleIndex.from_logs(args.retrieve_from)
+        print(f"[Retrieval] Indexed {len(RETRIEVAL_INDEX.examples)} solved problems in {RETRIEVAL_INDEX.build_seconds:.3f}s")
+    OPTIONS["retrieve_k"] = args.retrieve_k
+    OPTIONS["step_policy"] = args.step_policy
+    OPTIONS["deadline_seconds"] = args.deadline
+    OPTIONS["fused"] = args.fused
+    OPTIONS["speculative_init"] = args.speculative
+    OPTIONS["check_agree_k"] = args.check_agree
+    OPTIONS["check_max_rounds"] = args.check_max_rounds
+    OPTIONS["lazy_fix"] = args.lazy_fix
+    OPTIONS["local_repair"] = args.local_repair
+    OPTIONS["portfolio_k"] = args.portfolio
+    OPTIONS["inject_data"] = args.inject_data
+    OPTIONS["summary_threshold"] = args.summarize_above
+    OPTIONS["header_classify"] = not args.llm_classify
+    OPTIONS["direct_route"] = args.direct_route
+    OPTIONS["route_time_limit"] = args.route_time_limit
+    OPTIONS["solver_time_limit"] = args.solver_time_limit
+    OPTIONS["solver_threads"] = args.solver_threads
+    OPTIONS["solver_gap"] = args.solver_gap
+    OPTIONS["solver_backend"] = args.solver_backend
+    if args.sandbox:
+        SANDBOX = SandboxPool(
+            workers=args.sandbox_workers or args.jobs * args.portfolio,
+            wall_seconds=args.exec_timeout, cpu_seconds=args.exec_cpu, memory_mb=args.exec_memory,
+        )
+        print(f"[Sandbox] {SANDBOX.size} worker(s) ready in {SANDBOX.startup_seconds:.2f}s "
+              f"(pre-imported: {', '.join(SANDBOX.preloaded) or 'none'})")
 
     # ---- Support single file or directory input ----
     desc = args.input
@@ -385,7 +1534,8 @@ def main():
     if is_input_dir:
         desc_files = sorted(
             [os.path.join(desc, f) for f in os.listdir(desc) if f.endswith(".desc.txt")],
-            key=lambda p: int(re.search(r"q(\d+)", os.path.basename(p)).group(1))
+            # natural order, so q2 < q10 and non-q names (e.g. DSJC125.1) do not break the sort
+            key=lambda p: [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(p))]
         )
         if not desc_files:
             print(f"ERROR: no .desc.txt files found in directory {desc}")
@@ -397,69 +1547,149 @@ def main():
         desc_files = [desc]
 
     # --- Helper to derive per‑problem thinking‑log path ---
-    def _make_thinking_log_path(problem_id: int) -> str:
+    def _make_thinking_log_path(problem_name: str) -> str:
         if os.path.isdir(args.log):
             os.makedirs(args.log, exist_ok=True)
-            return os.path.join(args.log, f"q{problem_id}_thinking.log" if problem_id else "thinking.log")
+            return os.path.join(args.log, f"{problem_name}_thinking.log" if problem_name else "thinking.log")
         else:
             base, ext = os.path.splitext(args.log)
             return f"{base}_thinking{ext or '.log'}"
 
-    for desc_path in desc_files:
+    def _make_log_path(problem_name: str) -> str:
+        if os.path.isdir(args.log):
+            os.makedirs(args.log, exist_ok=True)
+            return os.path.join(args.log, f"{problem_name}_log.json" if problem_name else "log.json")
+        # If args.log is given as a file path, always overwrite/append to that file.
+        return args.log
+
+    def _make_checkpoint_path(problem_name: str) -> str:
+        if os.path.isdir(args.log):
+            return os.path.join(args.log, f"{problem_name}_checkpoint.json" if problem_name else "checkpoint.json")
+        base, _ = os.path.splitext(args.log)
+        return f"{base}_checkpoint.json"
+
+    def _run_problem(desc_path: str) -> tuple[dict, dict, str]:
+        """Solve one desc file and write its logs; returns (route result, solve_stats, dataset directory)."""
         problem_id_match = re.search(r"q(\d+)", os.path.basename(desc_path))
         problem_id = int(problem_id_match.group(1)) if problem_id_match else 0
+        # Datasets without qN names (GCP, NSP) are logged under their file stem
+        problem_name = f"q{problem_id}" if problem_id else re.sub(r"\.desc\.txt$", "", os.path.basename(desc_path))
+        dataset_dir = os.path.dirname(os.path.abspath(desc_path))
 
-        thinking_log_path = _make_thinking_log_path(problem_id)
+        thinking_log_path = _make_thinking_log_path(problem_name)
+        log_path = _make_log_path(problem_name)
+
+        # [MOD] Resume: finished problems are skipped but still counted in the summaries
+        if args.resume:
+            done = _completed_log(log_path, desc_path)
+            if done is not None:
+                print(f"[Resume] {problem_name}: already solved, skipping.")
+                done_stats = done.get("solve_stats", {})
+                return {
+                    "route": done.get("route", "llm"),
+                    "policy": _policy_label(done.get("policy", "full"), done_stats),
+                    "mode": done.get("mode", "staged"),
+                    "latency_seconds": done.get("latency_seconds", 0.0),
+                    "correct": done.get("correctness"),
+                }, done_stats, dataset_dir
 
         with open(desc_path, "r", encoding="utf-8") as f:
             problem_desc = f.read()
 
         ans_path = re.sub(r"\.desc\.txt$", ".ans.txt", desc_path)
-        problem_ans = None
+        final_problem_ans = None
         if os.path.isfile(ans_path):
             with open(ans_path, "r") as f:
-                problem_ans = f.readline().strip()
+                final_problem_ans = _parse_expected_answer(f.read())
 
-        # --- Capture all stdout during solve/extract ---
-        log_buf = io.StringIO()
-        with redirect_stdout(log_buf):
-            pipeline_output, problem_token_log = solve(problem_desc)
-            final_pipeline_ans = extract(pipeline_output)
+        # [MOD] Every completed step is checkpointed; --resume replays them instead of calling the API again
+        checkpoint = Checkpoint(_make_checkpoint_path(problem_name), problem_desc, resume=args.resume)
+        if checkpoint.completed_steps:
+            print(f"[Resume] {problem_name}: {len(checkpoint.completed_steps)} completed step(s) in the checkpoint.")
+        checkpoint_token = CHECKPOINT.set(checkpoint)
+        deadline_token = PROBLEM_DEADLINE.set(
+            time.monotonic() + OPTIONS["deadline_seconds"] if OPTIONS["deadline_seconds"] else None
+        )
+        # Concurrent problems each get their own model instance (token counts, effort overrides)
+        model_token = PROBLEM_MODEL.set(_spawn_model()) if args.jobs > 1 else None
 
-        thinking_log_text = log_buf.getvalue()
-        # Mirror captured output back to console
-        print(thinking_log_text, end="")
+        # [MOD] Everything printed while solving streams into this problem's thinking log
+        # (and to the console, prefixed with the problem name) as it happens
+        problem_start = time.monotonic()
+        with problem_log(thinking_log_path, problem_name, compress=args.gzip_logs):
+            routed = solve_direct(problem_desc) if OPTIONS["direct_route"] else None
+            if routed is not None:
+                pipeline_output, problem_token_log, solve_stats = routed
+            else:
+                pipeline_output, problem_token_log, solve_stats = solve(problem_desc)
+                template_failed = OPTIONS["direct_route"] and detect_instance_type(problem_desc) is not None
+                solve_stats["route"] = "llm (template failed)" if template_failed else "llm"
+            final_pipeline_ans = extract(pipeline_output)
+        latency = time.monotonic() - problem_start
+        CHECKPOINT.reset(checkpoint_token)
+        PROBLEM_DEADLINE.reset(deadline_token)
+        if model_token is not None:
+            PROBLEM_MODEL.reset(model_token)
+        if checkpoint.resumed_steps:
+            solve_stats["resumed_steps"] = checkpoint.resumed_steps
 
-        final_problem_ans = float(problem_ans) if problem_ans else None
-        is_correct = False
+        is_correct = None
         if final_problem_ans is not None:
             is_correct = abs(final_pipeline_ans - final_problem_ans) < 0.01
 
+        route = solve_stats.pop("route")
+        final_code = solve_stats.pop("final_code", None)
+        mode = "fused" if OPTIONS["fused"] else "staged"
+        route_result = {
+            "route": route,
+            "policy": _policy_label(OPTIONS["step_policy"], solve_stats),
+            "mode": mode,
+            "latency_seconds": latency,
+            "correct": is_correct,
+        }
+
         log_data_to_save = {
             "problem_id": problem_id,
-            "correctness": is_correct if problem_ans else None,
+            "route": route,
+            "policy": OPTIONS["step_policy"],
+            "mode": mode,
+            "latency_seconds": round(latency, 4),
+            "correctness": is_correct,
             "expected_answer": final_problem_ans,
             "pipeline_answer": final_pipeline_ans,
-            "token_usage_by_step": problem_token_log
+            "token_usage_by_step": problem_token_log,
+            "solve_stats": solve_stats,
+            "desc_path": os.path.abspath(desc_path),
+            "final_code": final_code,
         }
 
-        # Decide where to write the log
-        if os.path.isdir(args.log):
-            os.makedirs(args.log, exist_ok=True)
-            log_path = os.path.join(
-                args.log,
-                f"q{problem_id}_log.json" if problem_id else "log.json"
-            )
+        # The log is written atomically: a complete log marks the problem as done for --resume
+        _write_atomic(log_path, json.dumps(log_data_to_save, indent=4, ensure_ascii=False))
+        checkpoint.discard()
+        return route_result, solve_stats, dataset_dir
+
+    # [MOD] --jobs N solves N problems at a time in threads; results keep the input order
+    try:
+        if args.jobs > 1:
+            with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                results = list(pool.map(_run_problem, desc_files))
         else:
-            # If args.log is given as a file path, always overwrite/append to that file.
-            log_path = args.log
+            results = [_run_problem(desc_path) for desc_path in desc_files]
+    finally:
+        if SANDBOX is not None:
+            SANDBOX.close()
 
-        with open(log_path, "w", encoding="utf-8") as f:
-            json.dump(log_data_to_save, f, indent=4, ensure_ascii=False)
+    all_stats = [solve_stats for _, solve_stats, _ in results]
+    route_results = [route_result for route_result, _, _ in results]
+    dataset_stats = [(dataset_dir, solve_stats) for _, solve_stats, dataset_dir in results]
 
-        # Write thinking log
-        with open(thinking_log_path, "w", encoding="utf-8") as f_think:
-            f_think.write(thinking_log_text)
+    _print_run_summary(all_stats)
+    _print_group_summary("Routes", route_results, "route")
+    _print_group_summary("Step policy", route_results, "policy")
+    _print_group_summary("Mode", route_results, "mode")
+    _print_template_cache_summary(dataset_stats)
+    _print_retrieval_summary(all_stats)
+    _print_sandbox_summary()
 
 
 if __name__ == "__main__":
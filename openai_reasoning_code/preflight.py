@@ -0,0 +1,223 @@
+import os
+import re
+import csv
+import sys
+import argparse
+
+from prompts import (PROBLEM_MATCHING_PROMPT, INIT_ANSWER_PROMPT, GENERAL_EXPERT_PROMPT, MODIFIED_INIT_ANSWER_PROMPT,
+                     CODE_GENERATOR_PROMPT, FIX_CODE_PROMPT, CHECK_MATCHING_PROMPT,
+                     FUSED_CLASSIFICATION_PROMPT, FUSED_FORMULATION_PROMPT)
+from instance_data import summarize_instance, detect_instance_type
+from token_count import count_tokens, is_estimate
+
+
+""" 🌟 執行前的 token / 成本估算
+
+python preflight.py -i <dir 或 .desc.txt> [-m o3] [-r high] [-o preflight.csv]
+
+不呼叫 API：把每個 desc 檔代入 solve() 會用到的每個 prompt 模板，
+用本地 tokenizer 計算 prompt token，並記錄每一步問題原文出現幾次。
+模型輸出（分類 JSON、數學模型、程式碼）的長度無法事先得知，以 ASSUMED_* 的經驗值估算。
+"""
+
+# USD per 1M tokens (input, output) and context window; update when pricing changes
+MODEL_PRICING = {
+    "o3":          {"input": 2.00, "output": 8.00, "context": 200_000},
+    "o3-mini":     {"input": 1.10, "output": 4.40, "context": 200_000},
+    "o4-mini":     {"input": 1.10, "output": 4.40, "context": 200_000},
+    "o1":          {"input": 15.00, "output": 60.00, "context": 200_000},
+    "gpt-4o":      {"input": 2.50, "output": 10.00, "context": 128_000},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60, "context": 128_000},
+}
+
+# Completion tokens (visible + reasoning) per call at reasoning_effort="medium"
+ASSUMED_COMPLETION_TOKENS = {
+    "Classification": 1500,
+    "Check problem matching": 1500,
+    "Initial Answer": 4000,
+    "Review": 3000,
+    "Refine Answer (1 Step)": 3000,
+    "Classification (fused)": 2500,
+    "Formulation (fused)": 8000,
+    "Code Generation": 5000,
+    "Code Fix Loop 1": 4000,
+    "Auto Debug Fix": 4000,
+}
+EFFORT_FACTOR = {"low": 0.5, "medium": 1.0, "high": 2.0}
+
+# Sizes of intermediate outputs that are fed into later prompts
+ASSUMED_CLASSIFICATION_TOKENS = 120
+ASSUMED_FORMULATION_TOKENS = 800
+ASSUMED_REVIEW_TOKENS = 600
+ASSUMED_CODE_TOKENS = 1200
+ASSUMED_EXEC_OUTPUT_TOKENS = 400
+
+_MARK = "\u0000PROBLEM\u0000"
+
+
+def _measure(template_text: str, problem_tokens: int) -> tuple[int, int]:
+    """回傳 (prompt tokens, 問題原文出現次數)；原文以標記代入，避免重複 tokenize 大檔。"""
+    occurrences = template_text.count(_MARK)
+    return count_tokens(template_text.replace(_MARK, "")) + occurrences * problem_tokens, occurrences
+
+
+def pipeline_steps(check_rounds: int, fix_rounds: int, inject_data: bool,
+                   header_classified: bool = False, fused: bool = False) -> list[tuple[str, int, str, str, int]]:
+    """
+    solve() 依序的呼叫：(步驟名稱, 呼叫次數, system prompt, user message, 額外的已知 token 數)。
+    問題原文以 _MARK 代入，其他中間結果以固定長度估算（加在最後一欄）。
+    header_classified 時分類與檢查輪次由區段標頭決定，不呼叫模型。
+    fused 時分類 + 檢查、初始答案 + Review + Refine 各合併成一次呼叫。
+    """
+    # 沒有注入資料時，產生的程式必須把 raw_problem_text 整份嵌入
+    code = "" if inject_data else f'raw_problem_text = """{_MARK}"""'
+    steps = [
+        ("Classification", 1, PROBLEM_MATCHING_PROMPT, _MARK, 0),
+        ("Check problem matching", check_rounds,
+         CHECK_MATCHING_PROMPT.format(detected_type="ILP", math_model_text=""), "", 2 * ASSUMED_CLASSIFICATION_TOKENS),
+        ("Initial Answer", 1, INIT_ANSWER_PROMPT.format(detected_type="ILP", complexity="NP-hard"), _MARK, 0),
+        ("Review", 1,
+         GENERAL_EXPERT_PROMPT.format(detected_type="ILP", complexity="NP-hard", original_problem_text=_MARK), "",
+         ASSUMED_FORMULATION_TOKENS),
+        ("Refine Answer (1 Step)", 1, "", MODIFIED_INIT_ANSWER_PROMPT.format(INIT_ANSWER="", REVIEW=""),
+         ASSUMED_FORMULATION_TOKENS + ASSUMED_REVIEW_TOKENS),
+        ("Code Generation", 1, CODE_GENERATOR_PROMPT.format(math_model_text=""), "", 2 * ASSUMED_FORMULATION_TOKENS),
+        ("Code Fix Loop 1", 1, FIX_CODE_PROMPT.format(code=code), "", ASSUMED_CODE_TOKENS),
+    ]
+    if fused:
+        steps = [
+            ("Classification (fused)", 1, FUSED_CLASSIFICATION_PROMPT, _MARK, 0),
+            ("Formulation (fused)", 1, FUSED_FORMULATION_PROMPT.format(detected_type="ILP", complexity="NP-hard"),
+             _MARK, 0),
+        ] + steps[5:]
+        if header_classified:
+            steps = steps[1:]
+    elif header_classified:
+        steps = steps[2:]
+    if fix_rounds:
+        steps.append(("Auto Debug Fix", fix_rounds, FIX_CODE_PROMPT.format(code=code), "",
+                      ASSUMED_CODE_TOKENS + ASSUMED_EXEC_OUTPUT_TOKENS))
+    return steps
+
+
+def preflight_problem(problem: str, args) -> dict:
+    pricing = MODEL_PRICING[args.model]
+    problem_tokens = count_tokens(problem)
+    reasoning_tokens = problem_tokens
+    summary = summarize_instance(problem) if args.summarize_above and problem_tokens > args.summarize_above else None
+    if summary is not None:
+        reasoning_tokens = count_tokens(summary)
+
+    row = {"problem_tokens": problem_tokens, "reasoning_problem_tokens": reasoning_tokens}
+    prompt_total = completion_total = occurrences_total = 0
+    largest_prompt = 0
+    violations = []
+    inject_data = args.inject_data or summary is not None
+    header_classified = not args.llm_classify and detect_instance_type(problem) is not None
+    row["header_classified"] = header_classified
+    steps = pipeline_steps(args.check_rounds, args.fix_rounds, inject_data, header_classified, args.fused)
+    for name, calls, system_prompt, user_mes, extra_tokens in steps:
+        # 推理步驟看到的是摘要；程式修正步驟嵌入的是完整原文
+        text_tokens = reasoning_tokens if name in (
+            "Classification", "Initial Answer", "Review", "Classification (fused)", "Formulation (fused)"
+        ) else problem_tokens
+        system_tokens, system_occ = _measure(system_prompt, text_tokens)
+        user_tokens, user_occ = _measure(user_mes, text_tokens)
+        prompt_tokens = system_tokens + user_tokens + extra_tokens
+        completion_tokens = int(ASSUMED_COMPLETION_TOKENS[name] * EFFORT_FACTOR[args.reasoning])
+        if system_occ and name in ("Code Fix Loop 1", "Auto Debug Fix"):
+            # 修正後的程式會把嵌入的原文再輸出一次
+            completion_tokens += problem_tokens
+
+        row[f"{name} occurrences"] = system_occ + user_occ
+        row[f"{name} prompt_tokens"] = prompt_tokens
+        prompt_total += calls * prompt_tokens
+        completion_total += calls * completion_tokens
+        occurrences_total += calls * (system_occ + user_occ)
+        largest_prompt = max(largest_prompt, prompt_tokens)
+        if prompt_tokens + completion_tokens > pricing["context"]:
+            violations.append(name)
+
+    row.update({
+        "problem_occurrences": occurrences_total,
+        "prompt_tokens": prompt_total,
+        "completion_tokens": completion_total,
+        "largest_prompt": largest_prompt,
+        "cost_usd": round((prompt_total * pricing["input"] + completion_total * pricing["output"]) / 1_000_000, 4),
+        "context_violations": ";".join(violations),
+    })
+    return row
+
+
+def _natural_key(path: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="preflight.py",
+        description="Offline token, cost and context-window estimate for a model.py run"
+    )
+    parser.add_argument("-i", "--input", required=True, help="A .desc.txt file or a directory of .desc.txt files")
+    parser.add_argument("-m", "--model", default="o3-mini", choices=sorted(MODEL_PRICING), help="Model to price against")
+    parser.add_argument("-r", "--reasoning", default="high", choices=sorted(EFFORT_FACTOR), help="Reasoning effort")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-problem table to this CSV file")
+    parser.add_argument("--check-rounds", type=int, default=5, help="Expected CHECK_MATCHING_PROMPT rounds")
+    parser.add_argument("--fix-rounds", type=int, default=1, help="Expected Auto Debug Fix rounds")
+    parser.add_argument("--inject-data", action="store_true", help="Assume model.py --inject-data")
+    parser.add_argument("--llm-classify", action="store_true", help="Assume model.py --llm-classify")
+    parser.add_argument("--fused", action="store_true", help="Assume model.py --fused")
+    parser.add_argument("--summarize-above", type=int, default=0, metavar="TOKENS", help="Assume model.py --summarize-above")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        desc_files = sorted(
+            (os.path.join(args.input, f) for f in os.listdir(args.input) if f.endswith(".desc.txt")),
+            key=_natural_key,
+        )
+    elif os.path.isfile(args.input):
+        desc_files = [args.input]
+    else:
+        print(f"ERROR: input {args.input} not found.")
+        sys.exit(1)
+    if not desc_files:
+        print(f"ERROR: no .desc.txt files found in directory {args.input}")
+        sys.exit(1)
+
+    if is_estimate():
+        print("WARNING: tiktoken is not installed or cannot load its encoding (offline?); token counts are estimated as characters / 4.\n")
+
+    rows = []
+    for desc_path in desc_files:
+        with open(desc_path, "r", encoding="utf-8") as f:
+            problem = f.read()
+        rows.append({"problem": os.path.basename(desc_path), **preflight_problem(problem, args)})
+
+    columns = ["problem", "problem_tokens", "reasoning_problem_tokens", "problem_occurrences", "prompt_tokens",
+               "completion_tokens", "largest_prompt", "cost_usd", "context_violations"]
+    print(" | ".join(columns))
+    print(" | ".join("---" for _ in columns))
+    for row in rows:
+        print(" | ".join(str(row[c]) for c in columns))
+
+    total_prompt = sum(r["prompt_tokens"] for r in rows)
+    total_completion = sum(r["completion_tokens"] for r in rows)
+    total_cost = sum(r["cost_usd"] for r in rows)
+    oversized = [r["problem"] for r in rows if r["context_violations"]]
+    print(f"\nModel: {args.model} (reasoning={args.reasoning}), {len(rows)} problems")
+    print(f"Total prompt tokens: {total_prompt}, completion tokens (assumed): {total_completion}")
+    print(f"Estimated cost: ${total_cost:.2f}")
+    print(f"Problems exceeding the {MODEL_PRICING[args.model]['context']}-token context: {len(oversized)}")
+    for name in oversized:
+        print(f"  - {name}")
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nPer-problem table written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
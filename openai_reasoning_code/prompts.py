@@ -362,6 +362,8 @@ Convert the mathematical model below into a **stand-alone Python script**.
     - `Status: <Optimal/…>`  — use `LpStatus[prob.status]`  
     - One line per variable, e.g. `sled_dogs = 3`  
     - `Objective value: <value>`  
+    Then hand the result to the pre-defined `report` helper (it is injected by the executor — do **not** define or import it):  
+    `report(objective=pulp.value(prob.objective), status=LpStatus[prob.status], variables={{v.name: v.varValue for v in prob.variables()}})`  
     5. Output **only** valid Python code — no Markdown, no comments outside `# …`".  
     6. **After printing the solution, add a verification step. For each constraint, print the calculated left-hand side value and show that it satisfies the constraint. This confirms the solver's answer is truly feasible.**
     7. **Verification Rule:** When calculating constraint values for verification (after `prob.solve()`), you MUST wrap each variable with `pulp.value()`.
@@ -412,3 +414,118 @@ Please provide the fixed code:
 
 
 
+
+
+INSTANCE_DATA_PROMPT = """
+──────────────── Pre-parsed instance data ────────────────
+The executor has already parsed this {instance_type} instance and injects it into the script's global namespace
+as a dict named `INSTANCE`. **Do NOT embed, copy or re-parse the raw problem text** (ignore any instructions above
+about parsing sections such as `[ADJACENCY_MATRIX]`); read every number from `INSTANCE` instead.
+`INSTANCE` is pre-defined — do not define, import or assign it. `raw_problem_text` is not required.
+
+Available keys (numpy arrays when numpy is installed, otherwise lists):
+{instance_fields}
+"""
+
+
+INSTANCE_DATA_DOCS = {
+    "TSP": """    INSTANCE["n"]                 number of cities
+    INSTANCE["dist"]              n x n float matrix, 0-based; dist[i][j] is the distance from city i+1 to city j+1 (None for coordinate-only instances)
+    INSTANCE["coords"]            n x 2 float array of node coordinates (only when dist is None)
+    INSTANCE["edge_weight_type"]  e.g. "EUC_2D", "ATT", "GEO"
+    The official TSP cost of an edge depends on edge_weight_type (d = dist[i][j], or the Euclidean distance of the coords):
+      EUC_2D (and None): int(d + 0.5)
+      ATT (pseudo-Euclidean; dist holds plain Euclidean distances): r = d / sqrt(10); t = int(r + 0.5); cost = t + 1 if t < r else t
+      GEO: the TSPLIB geographical distance from coords (latitude / longitude in DDD.MM format); dist cannot be used""",
+    "GCP": """    INSTANCE["n"]          number of vertices, labelled 1..n
+    INSTANCE["m"]          number of edges
+    INSTANCE["edges"]      m x 2 int array of (u, v) pairs with u < v, 1-based
+    INSTANCE["adjacency"]  dict vertex -> sorted list of neighbours (both directions)""",
+    "Knapsack": """    INSTANCE["n"]         number of items
+    INSTANCE["values"]    int array of item values, 0-based
+    INSTANCE["weights"]   int array of item weights, 0-based
+    INSTANCE["capacity"]  knapsack capacity (total weight limit)""",
+    "NSP": """    INSTANCE["schedule_length"]  number of days in the rotation
+    INSTANCE["num_employees"]    number of employees (rows of the rotating schedule)
+    INSTANCE["shift_names"]      list of working shift names, e.g. ["D", "A", "N"]; "-" means day off
+    INSTANCE["shifts"]           list of dicts: name, start, duration, min_block, max_block
+    INSTANCE["requirements"]     len(shift_names) x schedule_length int array; requirements[s][d] employees on shift s, day d
+    INSTANCE["work_block"]       (min, max) consecutive working days
+    INSTANCE["off_block"]        (min, max) consecutive days off
+    INSTANCE["forbidden"]        list of forbidden consecutive shift pairs, e.g. ("N", "D")""",
+    "VRP": """    INSTANCE["n"]          number of nodes including the depot
+    INSTANCE["capacity"]   vehicle capacity
+    INSTANCE["vehicles"]   number of vehicles
+    INSTANCE["depot"]      depot node id
+    INSTANCE["node_ids"]   sorted list of node ids; the arrays below follow this order
+    INSTANCE["xy"]         n x 2 float array of coordinates
+    INSTANCE["demand"]     int array of demands (0 for the depot)
+    INSTANCE["coords"]     dict node id -> (x, y);  INSTANCE["demands"]: dict node id -> demand""",
+}
+
+
+RETRIEVED_EXAMPLES_PROMPT = """
+──────────────── Solved similar problems ────────────────
+The following problems were solved earlier and their PuLP programs ran successfully. Reuse their idioms
+(variable declarations, constraint naming, solver call, output and report(...) format) where they apply,
+but build the model strictly from the mathematical model given above — the numbers and the structure
+of the current problem may differ.
+
+{examples}
+"""
+
+
+# [MOD] Fused mode: one call replaces classification + the CHECK_MATCHING_PROMPT rounds, and one call replaces
+# initial answer + review + refine. The rules are taken from the staged prompts so both modes stay in sync.
+_CLASSIFICATION_RULES = PROBLEM_MATCHING_PROMPT[
+    PROBLEM_MATCHING_PROMPT.index("────────────────────  CLASSIFICATION RULES"):
+    PROBLEM_MATCHING_PROMPT.index("──────────────────────  OUTPUT FORMAT")
+]
+
+FUSED_CLASSIFICATION_PROMPT = """
+You are a veteran professor of Operations Research. You classify the optimisation problem in the user message
+and then act as your own meticulous peer reviewer, all in this single answer.
+
+─────────────────────────  TASK  ─────────────────────────
+1. **Draft**: classify the problem with the rules below.
+   AllowedTypes = {LP, ILP, MILP, QP, QCP, NLP, Knapsack, TSP, SetCover, Other}
+2. **Self-verification**: review the draft against the original text as a peer reviewer would.
+   - Countable, indivisible items imply ILP/MILP; divisible or abstract quantities suggest LP.
+   - A tour visiting each city exactly once can never be LP.
+   - Non-linear terms (x^2, x*y) imply NLP/QP/QCP.
+   - Re-check every variable in the draft's integer list against H0–H7.
+   - Conservatism rule: only change the draft when you can point to a specific heuristic or textual
+     evidence that it clearly violates.
+3. **Final**: the confirmed or corrected classification.
+
+""" + _CLASSIFICATION_RULES + """──────────────────────  OUTPUT FORMAT  ───────────────────
+Return **ONLY JSON** (no Markdown) with exactly these keys:
+{
+  "draft": {"detected_type": "<type>", "integer_vars": ["..."]},
+  "verification": "1–3 sentences: what you re-checked and whether the draft changed",
+  "detected_type": "<final type>",
+  "integer_vars":  ["final", "list", "of", "integer", "vars"],
+  "justification": "1–3 concise sentences explaining the final choice"
+}
+"""
+
+FUSED_FORMULATION_PROMPT = INIT_ANSWER_PROMPT + """
+──────────────────  SELF-CRITIQUE AND REVISION  ──────────────────
+Work in three passes and write all three, using exactly these section headers:
+
+### DRAFT FORMULATION
+Your formulation following the rules above.
+
+### CRITIQUE
+Review the draft as a senior professor would, strictly against the original problem text:
+1. Every variable and constraint must be supported by the text; NO constraint from the text may be missing
+   (numbers or limits that were not used usually indicate a missing constraint).
+2. Flag anything invented that the text does not support.
+3. Variable domains must match the Detected Type (integer variables for ILP, ...).
+4. Re-check every simplification step for precision and algebra errors.
+Then give one line of pure JSON: {{"is_correct": true | false, "issues": "<short list, empty if correct>"}}
+
+### FINAL FORMULATION
+The complete formulation with every issue from the critique fixed (identical to the draft when
+is_correct is true). It must stand on its own: no references to the draft, no commentary about changes.
+"""
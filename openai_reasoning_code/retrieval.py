@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import glob
+import time
+import hashlib
+
+from template_cache import replace_raw_problem_text
+
+
+""" 🌟 已解題目的近似重複檢索（MinHash / LSH）
+
+NL4Opt 類題目高度重複（飲食、生產組合、藥丸劑量…），模型每次都要重新摸索 PuLP 的寫法。
+這裡把過去 log（`*_log.json`，由 model.py 寫出，含 desc_path 與 final_code）中答對的題目建成索引，
+新題目取最相似的 k 題，把「題目 + 成功的程式」附在 CODE_GENERATOR_PROMPT 後面當作範例。
+
+純 Python：word 3-gram shingle → 64 個 MinHash → 16 band x 4 row 的 LSH 桶。
+幾百題的建置與查詢都在毫秒等級；LSH 候選不足 k 題時退回全部掃描。
+"""
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations() -> list[tuple[int, int]]:
+    # 固定種子，讓不同次執行的簽章可以互相比較
+    params = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % _PRIME or 1
+        b = int.from_bytes(digest[8:], "little") % _PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def _shingles(text: str) -> set[int]:
+    # 數字遮成 #，讓只差在數值的題目落在同一組 shingle
+    words = re.findall(r"[a-z]+|\d+(?:\.\d+)?", text.lower())
+    words = ["#" if w[0].isdigit() else w for w in words]
+    grams = {" ".join(words[i:i + SHINGLE]) for i in range(max(1, len(words) - SHINGLE + 1))}
+    return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little") for g in grams}
+
+
+def minhash(text: str) -> tuple[int, ...]:
+    shingles = _shingles(text)
+    return tuple(min(((a * s + b) % _PRIME) & _MAX_HASH for s in shingles) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    """估計的 Jaccard 相似度。"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class ExampleIndex:
+    def __init__(self):
+        self.examples = []  # dicts: desc_path, problem, code, signature
+        self.buckets = {}
+        self.build_seconds = 0.0
+
+    def add(self, desc_path: str, problem: str, code: str) -> None:
+        signature = minhash(problem)
+        index = len(self.examples)
+        self.examples.append({"desc_path": desc_path, "problem": problem, "code": code, "signature": signature})
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS])
+            self.buckets.setdefault(key, []).append(index)
+
+    @classmethod
+    def from_logs(cls, log_dirs: list[str]) -> "ExampleIndex":
+        """
+        讀取 log 目錄中答對（correctness 為 true）且有 final_code 的題目。
+        同一題出現多次時只保留一份。
+        """
+        start = time.monotonic()
+        index = cls()
+        seen = set()
+        for log_dir in log_dirs:
+            for log_path in sorted(glob.glob(os.path.join(log_dir, "*_log.json"))):
+                try:
+                    with open(log_path, "r", encoding="utf-8") as f:
+                        log = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                desc_path, code = log.get("desc_path"), log.get("final_code")
+                if log.get("correctness") is not True or not code or not desc_path or not os.path.isfile(desc_path):
+                    continue
+                with open(desc_path, "r", encoding="utf-8") as f:
+                    problem = f.read()
+                digest = hashlib.sha256(problem.encode("utf-8")).hexdigest()
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                index.add(desc_path, problem, code)
+        index.build_seconds = time.monotonic() - start
+        return index
+
+    def query(self, problem: str, k: int) -> list[tuple[float, dict]]:
+        """
+        Returns:
+            list[tuple[float, dict]]: 最相似的 k 題 (相似度, 範例)，不含與 problem 完全相同的題目。
+        """
+        if not self.examples or k <= 0:
+            return []
+        signature = minhash(problem)
+        candidates = set()
+        for band in range(BANDS):
+            candidates.update(self.buckets.get((band, signature[band * ROWS:(band + 1) * ROWS]), ()))
+        if len(candidates) < k:
+            candidates = range(len(self.examples))
+        scored = []
+        for i in candidates:
+            example = self.examples[i]
+            if example["problem"] == problem:
+                continue  # never hand the model its own answer
+            scored.append((similarity(signature, example["signature"]), example))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:k]
+
+
+def format_examples(matches: list[tuple[float, dict]]) -> str:
+    """把檢索結果排成 prompt 用的文字；範例程式中嵌入的原文以佔位字串取代，避免重複。"""
+    blocks = []
+    for rank, (score, example) in enumerate(matches, 1):
+        code = replace_raw_problem_text(example["code"], "<the example problem text above>") or example["code"]
+        blocks.append(
+            f"### Example {rank} (similarity {score:.2f})\n"
+            f"Problem:\n{example['problem'].strip()}\n\n"
+            f"Working code:\n```python\n{code.strip()}\n```"
+        )
+    return "\n\n".join(blocks)
@@ -0,0 +1,357 @@
+import os
+import sys
+import time
+import math
+import queue
+import codecs
+import pickle
+import shutil
+import signal
+import struct
+import tempfile
+import selectors
+import threading
+import traceback
+import subprocess
+
+from exec_output import BoundedOutput, KILLED_SENTINEL, TRACEBACK_BEGIN, TRACEBACK_END
+from solver_limits import limits_applied
+
+
+""" 🌟 子行程執行池（--sandbox）
+
+run_generated_code 原本在主行程裡 exec 產生的程式：無窮迴圈或一個跑不完的 CBC 會卡住整批，
+記憶體爆掉會把 runner 一起帶走。SandboxPool 在啟動時開好幾個 worker 行程（已經 import pulp / numpy
+與 model.py，啟動成本整批只付一次），每個工作由 worker fork 出一個乾淨的子行程執行：
+
+- 自己的 process group：逾時時連同它啟動的 CBC 一起 SIGKILL
+- wall-clock 逾時（worker 計時）、CPU 時間上限（RLIMIT_CPU）、記憶體上限（RLIMIT_AS），CBC 會繼承這些限制
+- 私人的暫存目錄（cwd、TMPDIR，PuLP 的 .mps / .sol 檔寫在這裡），結束後刪除
+- stdout / stderr 經由 pipe 讀回 worker，以 BoundedOutput 截斷後回傳，CBC 直接寫到 fd 的輸出也收得到
+
+被終止的工作回傳不同的 status（timeout / cpu_limit / memory_limit / killed / crashed），
+輸出最後加上一行 KILLED_SENTINEL，讓修正流程知道是程式跑不完而不是算錯。
+"""
+
+PRELOAD_MODULES = ("pulp", "numpy")
+KILLED_STATUSES = ("timeout", "cpu_limit", "memory_limit", "killed", "crashed")
+
+_EXIT_ERROR = 1
+_EXIT_MEMORY = 3
+_DRAIN_SECONDS = 1.0  # after a kill, how long to keep reading what the job already wrote
+_HEADER = struct.Struct(">I")
+
+
+def _send(stream, obj) -> None:
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def _read_exact(stream, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            raise EOFError("sandbox pipe closed")
+        data += chunk
+    return data
+
+
+def _recv(stream):
+    (size,) = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    return pickle.loads(_read_exact(stream, size))
+
+
+# -----------------------------
+# Worker side (python sandbox.py --worker)
+# -----------------------------
+def _kill_group(pgid: int) -> None:
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _job_child(job: dict, job_dir: str, out_w: int, err_w: int, namespace) -> None:
+    """fork 出來的子行程：套用限制後執行程式碼，不會 return。"""
+    import resource
+
+    exit_code = 0
+    try:
+        os.setsid()  # own process group, so a kill also reaches the solver processes it starts
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        os.close(out_w)
+        os.close(err_w)
+        if job["cpu_seconds"]:
+            soft = max(1, math.ceil(job["cpu_seconds"]))
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+        if job["memory_mb"]:
+            limit = int(job["memory_mb"] * 1024 * 1024)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        os.chdir(job_dir)
+        for var in ("TMPDIR", "TMP", "TEMP"):
+            os.environ[var] = job_dir
+        tempfile.tempdir = job_dir
+        pulp = sys.modules.get("pulp")
+        if pulp is not None and getattr(pulp, "LpSolverDefault", None) is not None:
+            pulp.LpSolverDefault.tmpDir = job_dir  # created at import time, before TMPDIR changed
+
+        env = namespace(job["instance"])
+        try:
+            with limits_applied(job["solver_limits"]):
+                exec(job["code"], env, env)
+        except SystemExit:
+            pass  # sys.exit() in generated code ends the job, not the worker
+        except MemoryError:
+            exit_code = _EXIT_MEMORY
+            print(TRACEBACK_BEGIN)
+            traceback.print_exc(file=sys.stdout)
+            print(TRACEBACK_END)
+        except Exception:
+            exit_code = _EXIT_ERROR
+            print(TRACEBACK_BEGIN)
+            traceback.print_exc(file=sys.stdout)
+            print(TRACEBACK_END)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _run_job(job: dict, namespace) -> dict:
+    """在 fork 出來的子行程中執行一個工作，回傳輸出、status 與資源用量。"""
+    job_dir = tempfile.mkdtemp(prefix="sandbox_job_")
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        _job_child(job, job_dir, out_w, err_w, namespace)
+    os.close(out_w)
+    os.close(err_w)
+
+    streams = {
+        out_r: (BoundedOutput(), codecs.getincrementaldecoder("utf-8")("replace")),
+        err_r: (BoundedOutput(), codecs.getincrementaldecoder("utf-8")("replace")),
+    }
+    selector = selectors.DefaultSelector()
+    for fd in streams:
+        selector.register(fd, selectors.EVENT_READ)
+    deadline = start + job["wall_seconds"] if job["wall_seconds"] else None
+    exited = None       # (wait status, rusage) once the job process has ended
+    drain_until = None  # set once the job is over; stray solver processes are killed and pipes drained
+    timed_out = False
+    while selector.get_map():
+        now = time.monotonic()
+        if drain_until is not None and now >= drain_until:
+            break
+        if deadline is not None and not timed_out and now >= deadline:
+            timed_out = True
+            _kill_group(pid)
+            drain_until = now + _DRAIN_SECONDS
+        limits = [0.2]
+        if deadline is not None and not timed_out:
+            limits.append(deadline - now)
+        for key, _ in selector.select(max(0.0, min(limits))):
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                selector.unregister(key.fd)
+                continue
+            buffer, decoder = streams[key.fd]
+            buffer.write(decoder.decode(chunk))
+        if exited is None:
+            reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+            if reaped:
+                exited = (status, rusage)
+                # Solver processes left behind would keep the pipes open
+                _kill_group(pid)
+                if drain_until is None:
+                    drain_until = time.monotonic() + _DRAIN_SECONDS
+    selector.close()
+    _kill_group(pid)
+    if exited is None:
+        _, status, rusage = os.wait4(pid, 0)
+        exited = (status, rusage)
+    for fd, (buffer, decoder) in streams.items():
+        buffer.write(decoder.decode(b"", final=True))
+        os.close(fd)
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+    wall = time.monotonic() - start
+    status, rusage = exited
+    cpu = rusage.ru_utime + rusage.ru_stime
+    if timed_out:
+        result, reason = "timeout", f"exceeded the {job['wall_seconds']:g}s wall-clock limit"
+    elif os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        if signum == signal.SIGXCPU or (job["cpu_seconds"] and signum == signal.SIGKILL and cpu >= job["cpu_seconds"]):
+            result, reason = "cpu_limit", f"exceeded the {job['cpu_seconds']:g}s CPU-time limit"
+        else:
+            result, reason = "killed", f"terminated by {signal.Signals(signum).name}"
+    elif os.WEXITSTATUS(status) == _EXIT_MEMORY:
+        limit = f" (limit {job['memory_mb']:g} MB)" if job["memory_mb"] else ""
+        result, reason = "memory_limit", f"ran out of memory{limit}"
+    elif os.WEXITSTATUS(status) == _EXIT_ERROR:
+        result, reason = "error", None
+    else:
+        result, reason = "ok", None
+
+    out_buf, _ = streams[out_r]
+    stderr_text = streams[err_r][0].getvalue()
+    if stderr_text:
+        out_buf.write("\n[STDERR]\n")
+        out_buf.write(stderr_text)
+    if result in KILLED_STATUSES:
+        out_buf.write(f"\n{KILLED_SENTINEL} {result}: the program {reason} and was stopped "
+                      f"(wall {wall:.1f}s, cpu {cpu:.1f}s)\n")
+    return {
+        "output": out_buf.getvalue(),
+        "status": result,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "max_rss_mb": round(rusage.ru_maxrss / 1024, 1),
+    }
+
+
+def _worker_main() -> None:
+    # The protocol uses the original stdout; anything else printed by the worker goes to stderr
+    proto_in = sys.stdin.buffer
+    proto_out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    start = time.monotonic()
+    preloaded = []
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+            preloaded.append(name)
+        except ImportError:
+            pass
+    from model import _exec_namespace
+    _send(proto_out, {"pid": os.getpid(), "preloaded": preloaded, "startup_seconds": time.monotonic() - start})
+    while True:
+        try:
+            job = _recv(proto_in)
+        except EOFError:
+            break
+        if job is None:
+            break
+        _send(proto_out, _run_job(job, _exec_namespace))
+
+
+# -----------------------------
+# Runner side
+# -----------------------------
+class SandboxPool:
+    """
+    預先啟動的 worker 行程池；run() 可由多個執行緒同時呼叫，每個工作佔用一個 worker。
+
+    Args:
+        workers (int): worker 行程數（同時執行的工作數上限）。
+        wall_seconds (float): 每個工作的 wall-clock 上限（0 = 不限）。
+        cpu_seconds (float): 每個行程的 CPU 時間上限（0 = 不限）。
+        memory_mb (float): 每個行程的位址空間上限（0 = 不限）。
+    """
+
+    def __init__(self, workers: int = 2, wall_seconds: float = 300, cpu_seconds: float = 0, memory_mb: float = 0):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("the sandbox needs a POSIX system (os.fork / resource)")
+        self.limits = {"wall_seconds": wall_seconds, "cpu_seconds": cpu_seconds, "memory_mb": memory_mb}
+        self.pid = os.getpid()
+        self.status_counts = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = []
+        start = time.monotonic()
+        self.size = max(1, workers)
+        spawned = [self._spawn() for _ in range(self.size)]
+        for proc in spawned:
+            self.preloaded = self._handshake(proc)["preloaded"]
+            self._idle.put(proc)
+        self.startup_seconds = time.monotonic() - start
+
+    def _spawn(self) -> subprocess.Popen:
+        here = os.path.dirname(os.path.abspath(__file__))
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(here, "sandbox.py"), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=here,
+        )
+        with self._lock:
+            self._workers.append(proc)
+        return proc
+
+    @staticmethod
+    def _handshake(proc: subprocess.Popen) -> dict:
+        try:
+            return _recv(proc.stdout)
+        except EOFError:
+            raise RuntimeError(f"sandbox worker failed to start (exit code {proc.wait()})") from None
+
+    def usable(self) -> bool:
+        # Processes forked from the runner (e.g. a ProcessPoolExecutor) must not share the worker pipes
+        return os.getpid() == self.pid
+
+    def run(self, code: str, instance: dict | None = None, solver_limits: dict | None = None) -> dict:
+        """
+        Args:
+            solver_limits (dict | None): solver_limits.limits_applied 的限制，在子行程中套用。
+
+        Returns:
+            dict: output（與 run_generated_code 相同格式）、status、wall_seconds、cpu_seconds、max_rss_mb。
+        """
+        job = {"code": code, "instance": instance, "solver_limits": solver_limits, **self.limits}
+        proc = self._idle.get()
+        try:
+            _send(proc.stdin, job)
+            result = _recv(proc.stdout)
+        except (EOFError, OSError, pickle.PickleError):
+            # The worker itself died (e.g. killed by the OOM killer); replace it
+            proc.kill()
+            proc.wait()
+            with self._lock:
+                self._workers.remove(proc)
+                self.restarts += 1
+            proc = self._spawn()
+            self._handshake(proc)
+            result = {
+                "output": f"{KILLED_SENTINEL} crashed: the sandbox worker exited while running the program\n",
+                "status": "crashed", "wall_seconds": 0.0, "cpu_seconds": 0.0, "max_rss_mb": 0.0,
+            }
+        finally:
+            self._idle.put(proc)
+        with self._lock:
+            self.status_counts[result["status"]] = self.status_counts.get(result["status"], 0) + 1
+            self.wall_seconds += result["wall_seconds"]
+            self.cpu_seconds += result["cpu_seconds"]
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for proc in workers:
+            try:
+                _send(proc.stdin, None)
+                proc.stdin.close()
+            except OSError:
+                pass
+        for proc in workers:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    _worker_main()
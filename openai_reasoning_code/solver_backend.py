@@ -0,0 +1,171 @@
+import math
+import functools
+import importlib.util
+
+
+""" 🌟 可替換的 solver 後端（--solver-backend）
+
+產生的程式都是 `prob.solve(PULP_CBC_CMD(...))`：PuLP 寫出 MPS 檔、啟動 cbc 行程、再讀回解檔，
+NL4Opt 這種幾個變數的 LP 大部分時間都花在這些額外成本上。這裡提供在同一個行程內求解的後端，
+solver_limits 的 LpProblem.solve 包裝在遇到 CBC（PULP_CBC_CMD / COIN_CMD 或預設 solver）時改用它：
+
+highs  PuLP 的 HiGHS 介面（highspy，行程內）
+scipy  scipy.optimize.milp（底層也是 HiGHS），以 scipy_milp_class() 把 LpProblem 轉成矩陣
+auto   highs，沒有安裝時 scipy
+cbc    不替換（預設）
+
+msg / timeLimit / threads / gapRel 沿用原本 solver 的設定。後端沒有安裝、丟出例外，
+或在時間上限之前就回傳 Not Solved / Undefined 時，改用原本的 CBC 再解一次。
+"""
+
+BACKENDS = ("cbc", "highs", "scipy", "auto")
+
+
+def _pulp_highs(**kwargs):
+    import pulp
+
+    highs = getattr(pulp, "HiGHS", None)  # in-process HiGHS interface, PuLP >= 2.8
+    if highs is None:
+        return None
+    solver = highs(**kwargs)
+    return solver if solver.available() else None
+
+
+def _scipy_milp(**kwargs):
+    solver = scipy_milp_class()(**kwargs)
+    return solver if solver.available() else None
+
+
+_FACTORIES = {"highs": (_pulp_highs,), "scipy": (_scipy_milp,), "auto": (_pulp_highs, _scipy_milp)}
+
+
+def backend_solver(name: str, template):
+    """
+    Args:
+        name (str): BACKENDS 之一。
+        template (pulp.LpSolver): 被取代的 solver；msg、時間上限、執行緒與 gap 沿用它的設定。
+
+    Returns:
+        pulp.LpSolver | None: 行程內的 solver；"cbc" 或後端沒有安裝時回傳 None。
+    """
+    kwargs = {
+        "mip": template.mip,
+        "msg": template.msg,
+        "timeLimit": template.timeLimit,
+        "gapRel": template.optionsDict.get("gapRel"),
+        "threads": template.optionsDict.get("threads"),
+    }
+    for factory in _FACTORIES.get(name, ()):
+        solver = factory(**kwargs)
+        if solver is not None:
+            return solver
+    return None
+
+
+def available_backends() -> list[str]:
+    import pulp
+
+    template = pulp.PULP_CBC_CMD(msg=False)
+    return ["cbc"] + [name for name in BACKENDS[1:] if backend_solver(name, template) is not None]
+
+
+def bound_and_gap(prob) -> tuple[float | None, float | None]:
+    """行程內後端的 best bound 與相對 gap（solver_limits 回報提早停止時使用）；其他 solver 回傳 (None, None)。"""
+    model = getattr(prob, "solverModel", None)
+    if model is None:
+        return None, None
+    if callable(getattr(model, "getInfo", None)):  # highspy.Highs: pulp.HiGHS minimises sense * objective, no constant
+        info = model.getInfo()
+        bound, gap = getattr(info, "mip_dual_bound", None), getattr(info, "mip_gap", None)
+        if bound is not None and math.isfinite(bound):
+            bound = prob.sense * bound + (prob.objective.constant if prob.objective is not None else 0.0)
+    else:  # scipy OptimizeResult, already in the problem's sense (see scipy_milp_class)
+        bound, gap = getattr(model, "pulp_bound", None), getattr(model, "mip_gap", None)
+    if bound is not None and not math.isfinite(bound):
+        bound = None
+    if gap is not None and not math.isfinite(gap):
+        gap = None
+    return bound, gap
+
+
+@functools.cache
+def scipy_milp_class():
+    """
+    以 scipy.optimize.milp 求解的 pulp solver 類別（第一次用到時才建立，import 這個模組不需要 pulp）。
+    把 LpProblem 轉成 c、稀疏矩陣 A 與上下界；到時間上限但有可行解時回報 IntegerFeasible。
+    """
+    import pulp
+
+    class ScipyMilpSolver(pulp.LpSolver):
+        name = "SCIPY_MILP"
+
+        def __init__(self, mip=True, msg=False, timeLimit=None, gapRel=None, threads=None, **kwargs):
+            # scipy.optimize.milp has no thread option; threads is accepted and ignored
+            super().__init__(mip=mip, msg=msg, timeLimit=timeLimit, gapRel=gapRel, threads=threads, **kwargs)
+
+        def available(self):
+            # Only looks for the package; scipy itself is imported when a problem is solved
+            return importlib.util.find_spec("scipy") is not None
+
+        def actualSolve(self, lp, **kwargs):
+            import numpy as np
+            try:
+                from scipy.optimize import milp, Bounds, LinearConstraint
+                from scipy.sparse import coo_matrix
+            except ImportError as e:  # scipy < 1.9 has no milp; solver_limits falls back to CBC
+                raise pulp.PulpSolverError(f"scipy.optimize.milp is not available: {e}") from e
+
+            variables = lp.variables()
+            index = {v.name: i for i, v in enumerate(variables)}
+            sense = lp.sense  # 1 = minimise, -1 = maximise; milp always minimises
+            c = np.zeros(len(variables))
+            for var, coef in (lp.objective or {}).items():
+                c[index[var.name]] = sense * coef
+
+            rows, cols, values, lower, upper = [], [], [], [], []
+            for row, constraint in enumerate(lp.constraints.values()):
+                for var, coef in constraint.items():
+                    rows.append(row)
+                    cols.append(index[var.name])
+                    values.append(coef)
+                rhs = -constraint.constant
+                lower.append(rhs if constraint.sense in (pulp.LpConstraintGE, pulp.LpConstraintEQ) else -np.inf)
+                upper.append(rhs if constraint.sense in (pulp.LpConstraintLE, pulp.LpConstraintEQ) else np.inf)
+            constraints = []
+            if lower:
+                matrix = coo_matrix((values, (rows, cols)), shape=(len(lower), len(variables))).tocsr()
+                constraints.append(LinearConstraint(matrix, lower, upper))
+            bounds = Bounds(
+                [v.lowBound if v.lowBound is not None else -np.inf for v in variables],
+                [v.upBound if v.upBound is not None else np.inf for v in variables],
+            )
+            integrality = [1 if self.mip and v.cat == pulp.LpInteger else 0 for v in variables]
+            options = {"disp": bool(self.msg)}
+            if self.timeLimit is not None:
+                options["time_limit"] = float(self.timeLimit)
+            if self.optionsDict.get("gapRel") is not None:
+                options["mip_rel_gap"] = float(self.optionsDict["gapRel"])
+
+            result = milp(c, constraints=constraints, integrality=integrality, bounds=bounds, options=options)
+            has_solution = result.x is not None
+            if result.status == 0:
+                status, sol_status = pulp.LpStatusOptimal, pulp.LpSolutionOptimal
+            elif result.status == 1 and has_solution:  # time / iteration limit with an incumbent
+                status, sol_status = pulp.LpStatusOptimal, pulp.LpSolutionIntegerFeasible
+            elif result.status == 2:
+                status, sol_status = pulp.LpStatusInfeasible, pulp.LpSolutionInfeasible
+            elif result.status == 3:
+                status, sol_status = pulp.LpStatusUnbounded, pulp.LpSolutionUnbounded
+            else:
+                status, sol_status = pulp.LpStatusNotSolved, pulp.LpSolutionNoSolutionFound
+            if has_solution:
+                lp.assignVarsVals({v.name: float(result.x[i]) for i, v in enumerate(variables)})
+            # Best bound in the problem's own sense (milp minimised sense * objective)
+            dual_bound = getattr(result, "mip_dual_bound", None)
+            constant = lp.objective.constant if lp.objective is not None else 0.0
+            result.pulp_bound = sense * dual_bound + constant if dual_bound is not None else None
+            lp.solverModel = result
+            lp.assignStatus(status, sol_status)
+            return status
+
+    return ScipyMilpSolver
@@ -0,0 +1,265 @@
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import model as pipeline
+from instance_data import parse_instance
+from templates import select_template
+from streaming_log import capture_output
+from solver_limits import limits_applied, solve_log
+from solver_backend import BACKENDS, available_backends
+
+
+""" 🌟 solver 後端比較（--solver-backend）
+
+python solver_bench.py -i ../datasets/dataset_LP/ILP/parsed_output ../datasets/dataset_Knapsack/small_100_1000
+                         ../datasets/dataset_GCP/parsed_output --logs <model.py 的 log 目錄> ...
+                         [--backends cbc highs scipy] [--limit 20] [--time-limit 60] [-o bench.csv]
+
+每一題取一個不需要 LLM 的 PuLP 程式：
+- --logs 中 model.py 的 log（desc_path 相同的 final_code），也就是 pipeline 實際執行的程式；
+- 沒有 log 時，有區段標頭的題目（Knapsack / GCP ...）用 templates.select_template 的範本。
+LP（NL4Opt）題目沒有範本，只能來自 log。
+
+同一個程式依序以每個後端在這個行程內執行（solver_limits 的 backend 限制，和 model.py --solver-backend 相同），
+每一組 (資料集, 後端) 回報：求解秒數（只算 LpProblem.solve）與整個程式秒數的 p50 / 平均、
+相對 CBC 的加速、objective 與 CBC 一致的比例、對 .ans 的正確率，以及退回 CBC 的程式數。
+"""
+
+
+def _natural_key(path: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def _dataset_name(input_dir: str) -> str:
+    """../datasets/dataset_GCP/parsed_output -> GCP"""
+    parts = os.path.abspath(input_dir).split(os.sep)
+    for part in reversed(parts):
+        if part.startswith(("dataset_", "datasest_")):
+            return part.split("_", 1)[1]
+    return os.path.basename(os.path.normpath(input_dir))
+
+
+def _logged_programs(log_dirs: list[str]) -> dict[str, str]:
+    """desc_path -> final_code，取自 model.py 寫出的 log JSON。"""
+    programs = {}
+    for log_dir in log_dirs:
+        for root, _, files in os.walk(log_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                        log = json.load(f)
+                except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if isinstance(log, dict) and log.get("desc_path") and isinstance(log.get("final_code"), str):
+                    programs[log["desc_path"]] = log["final_code"]
+    return programs
+
+
+def collect_programs(inputs: list[str], logged: dict[str, str], time_limit: float, limit: int) -> tuple[list[dict], int]:
+    """每個資料集最多 limit 題（0 = 全部）；回傳 (程式清單, 沒有程式可用而略過的題數)。"""
+    programs, skipped = [], 0
+    for input_dir in inputs:
+        dataset = _dataset_name(input_dir)
+        desc_files = sorted(
+            (os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith(".desc.txt")),
+            key=_natural_key,
+        )
+        selected = 0
+        for desc_path in desc_files:
+            if limit and selected >= limit:
+                break
+            with open(desc_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            instance = parse_instance(text)
+            code = logged.get(os.path.abspath(desc_path))
+            source = "log"
+            if code is None and instance is not None:
+                template = select_template(instance, time_limit)
+                if template is not None:
+                    source, code = f"template {template[0]}", template[1]
+            if code is None:
+                skipped += 1
+                continue
+            ans_path = re.sub(r"\.desc\.txt$", ".ans.txt", desc_path)
+            expected = None
+            if os.path.isfile(ans_path):
+                with open(ans_path, "r", encoding="utf-8") as f:
+                    expected = pipeline._parse_expected_answer(f.read())
+            programs.append({
+                "dataset": dataset,
+                "problem": os.path.basename(desc_path)[:-len(".desc.txt")],
+                "source": source,
+                "code": code,
+                "instance": instance,
+                "expected": expected,
+            })
+            selected += 1
+    return programs, skipped
+
+
+def _objective(output: str) -> float | None:
+    record = pipeline._result_record(output)
+    if record is not None and pipeline._record_objective(record) is not None:
+        return pipeline._record_objective(record)
+    matches = re.findall(r"Objective value:\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)", output)
+    return float(matches[-1]) if matches else None
+
+
+def _warm_up(backends: list[str]) -> None:
+    """先各解一個小問題，讓 highspy / scipy 的 import 不算進第一題的時間。"""
+    import pulp
+
+    for backend in backends:
+        prob = pulp.LpProblem("warm_up", pulp.LpMaximize)
+        x = pulp.LpVariable("x", 0, 3, cat="Integer")
+        prob += x
+        with limits_applied({"backend": backend}):
+            prob.solve(pulp.PULP_CBC_CMD(msg=False))
+
+
+def run_program(program: dict, backend: str, time_limit: float) -> dict:
+    """在這個行程內以 backend 執行一個程式（不經過 sandbox 與執行快取，時間才可比較）。"""
+    buffer = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    with limits_applied({"backend": backend, "time_limit": time_limit}):
+        with capture_output(buffer):
+            try:
+                exec(program["code"], pipeline._exec_namespace(program["instance"]))
+            except BaseException as e:  # SystemExit from sys.exit() in generated code included
+                if not isinstance(e, SystemExit) or e.code not in (None, 0):
+                    error = f"{type(e).__name__}: {e}"
+        solves = solve_log()
+    wall = time.perf_counter() - start
+    objective = _objective(buffer.getvalue())
+    expected = program["expected"]
+    return {
+        "dataset": program["dataset"],
+        "problem": program["problem"],
+        "source": program["source"],
+        "backend": backend,
+        "error": error,
+        "objective": objective,
+        "correct": abs(objective - expected) < 0.01 if objective is not None and expected is not None else None,
+        "wall_seconds": wall,
+        "solve_seconds": sum(s["seconds"] for s in solves),
+        "solves": len(solves),
+        "fallback": any(s.get("fallback") for s in solves),
+    }
+
+
+def _agrees(a: float | None, b: float | None) -> bool:
+    return a is not None and b is not None and abs(a - b) <= max(0.01, 1e-6 * abs(b))
+
+
+def summarize(records: list[dict]) -> list[dict]:
+    """每一組 (資料集, 後端) 一列；加速與一致性都和同一批程式的 cbc 結果比。"""
+    cbc = {(r["dataset"], r["problem"]): r for r in records if r["backend"] == "cbc"}
+    groups = {}
+    for record in records:
+        groups.setdefault((record["dataset"], record["backend"]), []).append(record)
+
+    rows = []
+    for (dataset, backend), runs in groups.items():
+        graded = [r["correct"] for r in runs if r["correct"] is not None]
+        paired = [(r, cbc[(dataset, r["problem"])]) for r in runs if (dataset, r["problem"]) in cbc]
+        wall = [r["wall_seconds"] for r in runs]
+        solve = [r["solve_seconds"] for r in runs if r["solves"]]
+        cbc_wall = sum(c["wall_seconds"] for _, c in paired)
+        cbc_solve = sum(c["solve_seconds"] for r, c in paired if r["solves"] and c["solves"])
+        own_solve = sum(r["solve_seconds"] for r, c in paired if r["solves"] and c["solves"])
+        rows.append({
+            "dataset": dataset,
+            "backend": backend,
+            "programs": len(runs),
+            "errors": sum(1 for r in runs if r["error"] or r["objective"] is None),
+            "no_solver_call": sum(1 for r in runs if not r["solves"]),
+            "fallbacks": sum(1 for r in runs if r["fallback"]),
+            "accuracy": round(sum(graded) / len(graded), 4) if graded else None,
+            "agree_with_cbc": round(sum(_agrees(r["objective"], c["objective"]) for r, c in paired) / len(paired), 4)
+            if paired else None,
+            "p50_solve": round(statistics.median(solve), 4) if solve else None,
+            "mean_solve": round(statistics.mean(solve), 4) if solve else None,
+            "p50_wall": round(statistics.median(wall), 4),
+            "mean_wall": round(statistics.mean(wall), 4),
+            "solve_speedup": round(cbc_solve / own_solve, 2) if own_solve > 0 else None,
+            "wall_speedup": round(cbc_wall / sum(r["wall_seconds"] for r, _ in paired), 2) if paired else None,
+        })
+    order = {name: i for i, name in enumerate(BACKENDS)}
+    rows.sort(key=lambda r: (r["dataset"], order.get(r["backend"], len(order))))
+    return rows
+
+
+def print_report(rows: list[dict]) -> None:
+    columns = ["dataset", "backend", "programs", "errors", "no_solver_call", "fallbacks", "accuracy", "agree_with_cbc",
+               "p50_solve", "mean_solve", "p50_wall", "mean_wall", "solve_speedup", "wall_speedup"]
+    print(" | ".join(columns))
+    print(" | ".join("---" for _ in columns))
+    for row in rows:
+        print(" | ".join(str(row[c]) for c in columns))
+    print("\nsolve = seconds inside LpProblem.solve per program; wall = whole program; speedups are relative to cbc")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="solver_bench.py",
+        description="Compare pulp solver backends (CBC / in-process HiGHS / scipy milp) on dataset programs"
+    )
+    parser.add_argument("-i", "--input", nargs="+", required=True, help="Dataset directories of .desc.txt files")
+    parser.add_argument("--logs", nargs="*", default=[], metavar="DIR",
+                        help="model.py log directories; their final_code is benchmarked (needed for LP problems)")
+    parser.add_argument("--backends", nargs="+", default=["cbc", "highs", "scipy"], choices=BACKENDS,
+                        help="Backends to compare (cbc is always run as the reference)")
+    parser.add_argument("--limit", type=int, default=0, help="At most N problems per dataset (0 = all)")
+    parser.add_argument("--time-limit", type=float, default=60, metavar="SECONDS",
+                        help="Solver time limit for every solve (also the templates' TIME_LIMIT)")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-(dataset, backend) table to this CSV file")
+    args = parser.parse_args()
+
+    available = available_backends()
+    backends = ["cbc"] + [b for b in dict.fromkeys(args.backends) if b != "cbc"]
+    for backend in backends:
+        if backend not in available:
+            print(f"[Bench] Backend {backend} is not installed (highspy / scipy); skipped.")
+    backends = [b for b in backends if b in available]
+
+    programs, skipped = collect_programs(args.input, _logged_programs(args.logs), args.time_limit, args.limit)
+    print(f"Bench: {len(programs)} program(s) x {len(backends)} backend(s) ({', '.join(backends)}); "
+          f"{skipped} problem(s) without a template or logged program skipped")
+    if not programs:
+        sys.exit(1)
+
+    _warm_up(backends)
+    records = []
+    for done, program in enumerate(programs, 1):
+        results = [run_program(program, backend, args.time_limit) for backend in backends]
+        records.extend(results)
+        print(f"[{done}/{len(programs)}] {program['dataset']} {program['problem']} ({program['source']}): " + " | ".join(
+            f"{r['backend']} {r['solve_seconds']:.3f}s/{r['wall_seconds']:.3f}s obj {r['objective']}"
+            + (" FALLBACK" if r["fallback"] else "") + (f" ERROR {r['error']}" if r["error"] else "")
+            for r in results
+        ))
+
+    print("\n===== Solver backend report =====")
+    rows = summarize(records)
+    print_report(rows)
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nPer-(dataset, backend) table written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import re
+import time
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+""" 🌟 產生的程式的 solver 時間 / 執行緒 / gap 限制
+
+產生的程式幾乎都是 `prob.solve(PULP_CBC_CMD(msg=False))`：沒有時間上限、只用一個執行緒，
+難一點的 GCP / TSP ILP 可以一直跑下去。這裡把 pulp.LpProblem.solve 換成一個包裝（只做一次），
+在真正求解前把目前 context 的限制套到這次用到的 solver 上：
+
+- timeLimit：取 solver 原本的設定與限制中較小的那個
+- threads / gapRel：程式自己沒有指定時才補上
+
+不論 solver 是 `PULP_CBC_CMD(...)`、`pulp.getSolver(...)`、`from pulp import *` 建立的，
+還是沒有指定（LpSolverDefault，先複製一份），最後都會經過 LpProblem.solve，所以只需要攔這一個地方。
+
+時間到了而停下來時，印出 `[Solver limit]` 一行（incumbent、best bound、gap），
+並記錄在 context 中，report() 會把它附在結果紀錄的 solver_limit 欄位，表示這個 objective 沒有證明最佳。
+CBC 的 bound 取自它的 log（msg=False 時暫時寫到暫存目錄的 logPath），行程內後端的則取自 solverModel。
+
+限制中有 backend（--solver-backend）時，原本要交給 CBC 的求解先改用 solver_backend 的行程內 solver，
+失敗時印出 `[Solver backend]` 一行，再用原本的 CBC 求解。
+"""
+
+SOLVER_LIMITS = contextvars.ContextVar("solver_limits", default=None)
+_INSTALL_LOCK = threading.Lock()
+_installed = False
+
+_CBC_STOPPED = re.compile(r"^Result - Stopped on (time|iterations|nodes|gap|solutions)", re.MULTILINE)
+_CBC_BOUND = re.compile(r"^(?:Upper|Lower) bound:\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)", re.MULTILINE)
+
+
+def install() -> None:
+    """把 pulp.LpProblem.solve 換成套用限制的版本（只做一次；沒有設定限制時行為不變）。"""
+    global _installed
+    with _INSTALL_LOCK:
+        if _installed:
+            return
+        import pulp
+        pulp.LpProblem.solve = _limited_solve(pulp.LpProblem.solve)
+        _installed = True
+
+
+@contextmanager
+def limits_applied(limits: dict | None):
+    """
+    在這個 context 中執行的 LpProblem.solve 都套用 limits。
+
+    Args:
+        limits (dict | None): time_limit（秒）、threads、gap_rel（相對 gap，0.01 = 1%）、
+            backend（solver_backend.BACKENDS 之一）；None 時什麼都不做。
+    """
+    if not limits:
+        yield
+        return
+    install()
+    token = SOLVER_LIMITS.set({**limits, "hits": [], "solves": []})
+    try:
+        yield
+    finally:
+        SOLVER_LIMITS.reset(token)
+
+
+def last_limit_hit() -> dict | None:
+    """這個 context 中最近一次因限制而提早停止的求解；沒有時回傳 None。"""
+    state = SOLVER_LIMITS.get()
+    return state["hits"][-1] if state and state["hits"] else None
+
+
+def _option(solver, name: str):
+    """threads / gapRel：CMD 類的 solver 放在 optionsDict，pulp.HiGHS 這類則是 solver 的屬性。"""
+    if name in vars(solver):
+        return getattr(solver, name)
+    return solver.optionsDict.get(name)
+
+
+def _set_option(solver, name: str, value) -> None:
+    if name in vars(solver):
+        setattr(solver, name, value)
+    else:
+        solver.optionsDict[name] = value
+
+
+def solve_log() -> list[dict]:
+    """這個 context 中每一次求解實際用的 solver、狀態與秒數（fallback=True 表示後端失敗、改用 CBC 重解）。"""
+    state = SOLVER_LIMITS.get()
+    return list(state["solves"]) if state else []
+
+
+def _apply(solver, state: dict) -> dict:
+    """把限制寫進 solver，回傳實際改動的設定。"""
+    changes = {}
+    time_limit = state.get("time_limit")
+    if time_limit and (solver.timeLimit is None or solver.timeLimit > time_limit):
+        solver.timeLimit = changes["timeLimit"] = time_limit
+    if state.get("threads") and _option(solver, "threads") is None:
+        _set_option(solver, "threads", state["threads"])
+        changes["threads"] = state["threads"]
+    if state.get("gap_rel") and _option(solver, "gapRel") is None:
+        _set_option(solver, "gapRel", state["gap_rel"])
+        changes["gapRel"] = state["gap_rel"]
+    return changes
+
+
+def _limit_hit(prob, solver, elapsed: float, log_text: str) -> dict | None:
+    import pulp
+
+    match = _CBC_STOPPED.search(log_text or "")
+    reason = match.group(1) if match else None
+    if reason is None and solver.timeLimit:
+        # Solvers without a parsed log: a feasible-but-unproven solution, or the whole time limit used up
+        if prob.sol_status == pulp.LpSolutionIntegerFeasible or elapsed >= 0.98 * solver.timeLimit:
+            reason = "time"
+    if reason is None:
+        return None
+    incumbent = pulp.value(prob.objective) if prob.sol_status in (
+        pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible
+    ) else None
+    bound, gap = None, None
+    match = _CBC_BOUND.search(log_text or "")
+    if match:
+        bound = float(match.group(1))
+    elif not isinstance(solver, pulp.COIN_CMD):
+        from solver_backend import bound_and_gap
+        bound, gap = bound_and_gap(prob)
+    if gap is None and incumbent is not None and bound is not None:
+        gap = abs(bound - incumbent) / max(abs(incumbent), 1e-9)
+    return {
+        "solver": solver.name,
+        "stopped_on": reason,
+        "time_limit": solver.timeLimit,
+        "gap_rel": _option(solver, "gapRel"),
+        "elapsed_seconds": round(elapsed, 2),
+        "incumbent": incumbent,
+        "best_bound": bound,
+        "gap": round(gap, 6) if gap is not None else None,
+        "optimality_proven": False,
+    }
+
+
+def _record_hit(state: dict, hit: dict | None) -> None:
+    if hit is None:
+        return
+    state["hits"].append(hit)
+    gap = f"{100 * hit['gap']:.2f}%" if hit["gap"] is not None else "unknown"
+    limit = f"the {hit['time_limit']:g}s time limit" if hit["stopped_on"] == "time" else f"its {hit['stopped_on']} limit"
+    print(
+        f"[Solver limit] {hit['solver']} stopped on {limit} after {hit['elapsed_seconds']:.1f}s: "
+        f"incumbent {hit['incumbent']}, best bound {hit['best_bound']}, gap {gap} (optimality not proven)"
+    )
+
+
+def _backend_solve(original, prob, cbc, state: dict, changes: dict, kwargs: dict):
+    """
+    以 --solver-backend 指定的行程內 solver 取代 CBC 求解。
+
+    Returns:
+        int | None: 求解狀態；後端無法使用或失敗時回傳 None，由呼叫端改用原本的 CBC。
+    """
+    import pulp
+    from solver_backend import backend_solver
+
+    solver = backend_solver(state["backend"], cbc)
+    if solver is None:
+        return None
+    start = time.monotonic()
+    try:
+        status = original(prob, solver, **kwargs)
+    except Exception as e:
+        failure = f"{type(e).__name__}: {e}"
+    else:
+        elapsed = time.monotonic() - start
+        timed_out = solver.timeLimit is not None and elapsed >= 0.98 * solver.timeLimit
+        if status not in (pulp.LpStatusNotSolved, pulp.LpStatusUndefined) or timed_out:
+            state["solves"].append({"solver": solver.name, "status": pulp.LpStatus[status], "seconds": elapsed})
+            if changes:
+                _record_hit(state, _limit_hit(prob, solver, elapsed, ""))
+            return status
+        failure = f"status {pulp.LpStatus[status]}"
+    state["solves"].append(
+        {"solver": solver.name, "status": failure, "seconds": time.monotonic() - start, "fallback": True}
+    )
+    print(f"[Solver backend] {solver.name} failed ({failure}); falling back to {cbc.name}")
+    return None
+
+
+def _limited_solve(original):
+    def solve(self, solver=None, **kwargs):
+        state = SOLVER_LIMITS.get()
+        if state is None:
+            return original(self, solver, **kwargs)
+        import pulp
+
+        if not solver:
+            solver = self.solver or pulp.LpSolverDefault
+        if solver is pulp.LpSolverDefault:
+            solver = solver.copy()  # shared by every program in the process
+        changes = _apply(solver, state)
+
+        if state.get("backend") and isinstance(solver, pulp.COIN_CMD):
+            status = _backend_solve(original, self, solver, state, changes, kwargs)
+            if status is not None:
+                return status
+
+        log_path = None
+        if changes and isinstance(solver, pulp.COIN_CMD) and not solver.msg and not solver.optionsDict.get("logPath"):
+            # The CBC log holds the best bound; it only goes to a file when msg=False
+            fd, log_path = tempfile.mkstemp(suffix="_cbc.log")
+            os.close(fd)
+            solver.optionsDict["logPath"] = log_path
+        start = time.monotonic()
+        try:
+            status = original(self, solver, **kwargs)
+        finally:
+            elapsed = time.monotonic() - start
+            log_text = ""
+            if log_path is not None:
+                try:
+                    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                        log_text = f.read()
+                    os.remove(log_path)
+                except OSError:
+                    pass
+                solver.optionsDict.pop("logPath", None)
+
+        state["solves"].append({"solver": solver.name, "status": pulp.LpStatus[status], "seconds": elapsed})
+        if changes:
+            _record_hit(state, _limit_hit(self, solver, elapsed, log_text))
+        return status
+
+    solve.__wrapped__ = original
+    return solve
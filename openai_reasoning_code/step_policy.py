@@ -0,0 +1,121 @@
+import re
+import time
+import threading
+
+
+""" 🌟 步驟略過策略
+
+solve() 中有些步驟不是產生答案的必要條件：CHECK_MATCHING_PROMPT 的檢查輪、Review、Refine、Code Fix Loop 1
+（程式可以先直接執行，失敗才修）。這裡依兩種訊號決定要不要執行：
+
+1. 複雜度類別：LP ("P") 問題的 solver 會回報最佳解狀態，本身就是很強的正確性驗證，Review / Refine 可以省掉
+2. 時間預算：每題的剩餘時間不足以跑完該步驟（以本次執行中各步驟的平均耗時估算）+ 產生程式的保留時間時，
+   先嘗試縮短（Review 改用 low reasoning effort），仍不夠就略過
+
+每個被略過 / 縮短的步驟都會連同原因記錄下來；略過 Code Fix Loop 1 後草稿失敗、步驟仍然執行時改記為 deferred。
+"""
+
+# skip: complexity class -> optional steps skipped for that class
+# shed_on_deadline: drop / shorten optional steps when the remaining budget is too small
+STEP_POLICIES = {
+    "full": {"skip": {}, "shed_on_deadline": False},
+    "low-risk": {"skip": {"P": ("Review", "Refine Answer")}, "shed_on_deadline": False},
+    "deadline": {"skip": {}, "shed_on_deadline": True},
+    "adaptive": {"skip": {"P": ("Review", "Refine Answer")}, "shed_on_deadline": True},
+}
+
+OPTIONAL_STEPS = ("Check problem matching", "Review", "Refine Answer", "Code Fix Loop 1")
+SHORTENABLE_STEPS = ("Review",)
+SHORTENED_FACTOR = 0.35  # low reasoning effort vs. the configured effort, roughly
+
+# Starting estimates (seconds) before the run has measured anything
+_step_seconds = {
+    "Check problem matching": 20.0,
+    "Review": 60.0,
+    "Refine Answer": 60.0,
+    "Code Generation": 90.0,
+    "Code Fix Loop 1": 90.0,
+}
+_EMA_WEIGHT = 0.3
+_STEP_SECONDS_LOCK = threading.Lock()  # solve() runs concurrently under --jobs
+
+
+def _base_step(name: str) -> str:
+    """`Check problem matching 3` / `Refine Answer (1 Step)` -> 共同的步驟名稱。"""
+    name = re.sub(r"\s*\(.*\)$", "", name)
+    return re.sub(r"\s+\d+$", "", name)
+
+
+def estimate(step: str) -> float:
+    with _STEP_SECONDS_LOCK:
+        return _step_seconds.get(_base_step(step), 60.0)
+
+
+def record_durations(token_log: dict) -> None:
+    """以這一題的實際耗時更新各步驟的估計值（指數移動平均）。"""
+    for name, entry in token_log.items():
+        if "low effort" in name:
+            continue  # shortened steps would drag the full-step estimate down
+        base = _base_step(name)
+        seconds = entry.get("duration_seconds")
+        if base in _step_seconds and isinstance(seconds, (int, float)):
+            with _STEP_SECONDS_LOCK:
+                _step_seconds[base] = (1 - _EMA_WEIGHT) * _step_seconds[base] + _EMA_WEIGHT * seconds
+
+
+class StepBudget:
+    """
+    一題的步驟決策。
+
+    Args:
+        policy (str): STEP_POLICIES 的名稱。
+        deadline_seconds (float): 每題的時間預算，0 表示不限時。
+    """
+
+    def __init__(self, policy: str, deadline_seconds: float = 0):
+        self.policy = policy
+        self.config = STEP_POLICIES[policy]
+        self.deadline_seconds = deadline_seconds
+        self.start = time.monotonic()
+        self.decisions = []  # {"step", "action", "reason"}
+
+    def remaining(self) -> float | None:
+        if not self.deadline_seconds:
+            return None
+        return self.deadline_seconds - (time.monotonic() - self.start)
+
+    def decide(self, step: str, complexity: str | None = None) -> str:
+        """
+        Returns:
+            str: "run"、"shorten"（只有 SHORTENABLE_STEPS）或 "skip"。
+        """
+        if step not in OPTIONAL_STEPS:
+            return "run"
+        if complexity is not None and step in self.config["skip"].get(complexity, ()):
+            return self._record(step, "skip", f"complexity class {complexity}: solver status verifies the model")
+
+        remaining = self.remaining()
+        if self.config["shed_on_deadline"] and remaining is not None:
+            # Always keep enough time to generate (and run) the code
+            reserve = estimate("Code Generation")
+            needed = estimate(step) + reserve
+            if remaining < needed:
+                shortened = SHORTENED_FACTOR * estimate(step) + reserve
+                if step in SHORTENABLE_STEPS and remaining >= shortened:
+                    return self._record(step, "shorten", f"deadline: {remaining:.0f}s left < {needed:.0f}s for the full step")
+                return self._record(step, "skip", f"deadline: {remaining:.0f}s left < {needed:.0f}s needed")
+        return "run"
+
+    def defer(self, step: str, reason: str) -> None:
+        """先前記錄為 skip 的步驟最後還是執行了：改記為 deferred，策略報告才和實際執行的步驟一致。"""
+        for decision in reversed(self.decisions):
+            if decision["step"] == step and decision["action"] == "skip":
+                decision["action"] = "deferred"
+                decision["reason"] = f"{decision['reason']}; {reason}"
+                print(f"[Policy:{self.policy}] deferred {step} ({reason})", "\n")
+                return
+
+    def _record(self, step: str, action: str, reason: str) -> str:
+        self.decisions.append({"step": step, "action": action, "reason": reason})
+        print(f"[Policy:{self.policy}] {action} {step} ({reason})", "\n")
+        return action
@@ -0,0 +1,175 @@
+import io
+import sys
+import gzip
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+""" 🌟 以 context 區分的輸出（取代 redirect_stdout / redirect_stderr）
+
+redirect_stdout 會換掉整個 process 的 sys.stdout，兩題同時在不同執行緒跑時輸出會互相混在一起。
+這裡只在第一次使用時把 sys.stdout / sys.stderr 換成一個轉發器，實際寫到哪裡由 ContextVar 決定：
+
+- capture_output(out, err)：run_generated_code 用來收集產生的程式的輸出（只影響目前的 context）
+- problem_log(path, prefix)：main() 用來把一題的所有 print 即時寫進它的 thinking log（可選 gzip），
+  同時在 console 上以 `[prefix] ` 開頭逐行輸出，多題平行時也分得出來是哪一題
+
+沒有設定時照常寫到原本的 stdout / stderr。
+執行緒池不會繼承 ContextVar，背景工作用 bind() 包起來才會寫進同一題的 log。
+"""
+
+_STDOUT = contextvars.ContextVar("stdout_sink", default=None)
+_STDERR = contextvars.ContextVar("stderr_sink", default=None)
+_CONSOLE_LOCK = threading.Lock()
+_INSTALL_LOCK = threading.Lock()
+_REAL_STDOUT = sys.stdout
+_REAL_STDERR = sys.stderr
+
+
+class _ContextStream(io.TextIOBase):
+    """sys.stdout / sys.stderr 的替身：寫進目前 context 的 sink，沒有 sink 時寫進原本的 stream。"""
+
+    def __init__(self, sink_var: contextvars.ContextVar, fallback):
+        super().__init__()
+        self.sink_var = sink_var
+        self.fallback = fallback
+
+    def _target(self):
+        sink = self.sink_var.get()
+        return sink if sink is not None else self.fallback
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        self._target().write(s)
+        return len(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return self.fallback.isatty()
+
+    def fileno(self) -> int:
+        return self.fallback.fileno()
+
+    @property
+    def encoding(self):
+        return getattr(self.fallback, "encoding", "utf-8")
+
+
+def install() -> None:
+    """把 sys.stdout / sys.stderr 換成轉發器（只做一次）。"""
+    global _REAL_STDOUT, _REAL_STDERR
+    with _INSTALL_LOCK:
+        if not isinstance(sys.stdout, _ContextStream):
+            _REAL_STDOUT = sys.stdout
+            sys.stdout = _ContextStream(_STDOUT, _REAL_STDOUT)
+        if not isinstance(sys.stderr, _ContextStream):
+            _REAL_STDERR = sys.stderr
+            sys.stderr = _ContextStream(_STDERR, _REAL_STDERR)
+
+
+@contextmanager
+def capture_output(stdout, stderr=None):
+    """只在目前 context 中把 print / stderr 導到 stdout、stderr（未指定時同 stdout）。"""
+    install()
+    out_token = _STDOUT.set(stdout)
+    err_token = _STDERR.set(stderr if stderr is not None else stdout)
+    try:
+        yield
+    finally:
+        _STDERR.reset(err_token)
+        _STDOUT.reset(out_token)
+
+
+class ProblemLog(io.TextIOBase):
+    """
+    一題的 thinking log：寫入的內容立即寫進檔案，並逐行加上前綴送到 console。
+
+    Args:
+        path (str | None): thinking log 路徑；compress 時另加 `.gz`。None 時只輸出到 console。
+        prefix (str): console 每一行的前綴（通常是題目名稱）。
+        console (bool): 是否同時輸出到 console。
+        compress (bool): 以 gzip 寫檔。
+    """
+
+    def __init__(self, path: str | None, prefix: str = "", console: bool = True, compress: bool = False):
+        super().__init__()
+        self.path = f"{path}.gz" if path and compress and not path.endswith(".gz") else path
+        if path is None:
+            self.file = None
+        elif compress:
+            self.file = gzip.open(self.path, "wt", encoding="utf-8")
+        else:
+            self.file = open(self.path, "w", encoding="utf-8")
+        self.prefix = f"[{prefix}] " if prefix else ""
+        self.console = console
+        self._partial = ""
+        self._finished = False
+        self._lock = threading.Lock()  # background threads of the same problem share the log
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        with self._lock:
+            if self._finished:
+                # A background thread that outlived its problem: keep the text on the console only
+                with _CONSOLE_LOCK:
+                    _REAL_STDOUT.write(s)
+                return len(s)
+            if self.file is not None:
+                self.file.write(s)
+            if self.console:
+                text = self._partial + s
+                *lines, self._partial = text.split("\n")
+                if lines:
+                    with _CONSOLE_LOCK:
+                        _REAL_STDOUT.write("".join(f"{self.prefix}{line}\n" for line in lines))
+        return len(s)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self.file is not None and not self.file.closed:
+                self.file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.console and self._partial:
+                with _CONSOLE_LOCK:
+                    _REAL_STDOUT.write(f"{self.prefix}{self._partial}\n")
+                self._partial = ""
+            self._finished = True
+            if self.file is not None and not self.file.closed:
+                self.file.close()
+        super().close()
+
+
+@contextmanager
+def problem_log(path: str | None, prefix: str = "", console: bool = True, compress: bool = False):
+    """在這個 context 中所有 print（含 stderr）都寫進這一題的 thinking log。"""
+    log = ProblemLog(path, prefix, console, compress)
+    try:
+        with capture_output(log):
+            yield log
+    finally:
+        log.close()
+
+
+def bind(fn):
+    """讓 fn 在其他執行緒中也寫進目前 context 的 log。"""
+    stdout, stderr = _STDOUT.get(), _STDERR.get()
+
+    def bound(*args, **kwargs):
+        out_token = _STDOUT.set(stdout)
+        err_token = _STDERR.set(stderr)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _STDERR.reset(err_token)
+            _STDOUT.reset(out_token)
+
+    return bound
@@ -0,0 +1,296 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import model as pipeline
+from reasoning import OpenAIReasoning
+from exec_cache import ExecutionCache
+from preflight import MODEL_PRICING, EFFORT_FACTOR
+from streaming_log import problem_log
+
+
+""" 🌟 模型 × reasoning_effort 掃描
+
+python sweep.py -i <dir 或 .desc.txt> --models o3 o4-mini --efforts low medium high
+               [--pipelines code reasoning] [--offset 0 --limit 20] [-j 8] [-o sweep.csv]
+
+把同一批題目以每一組 (模型, reasoning_effort) 跑過 model.py 的 solve()（code）
+和 openai_reasoning/main.py 的 run()（reasoning），每一組回報：
+正確率、p50/p95 延遲、平均 token、總花費與每題花費（以 preflight.MODEL_PRICING 計價），
+並標出 Pareto frontier：沒有任何一組在正確率、每題花費、p95 延遲上都不差且至少一項更好。
+
+所有 (組合, 題目) 同時丟進執行緒池；每個完成的格子寫進 --cache 目錄，
+key 是 pipeline + 模型 + effort + 題目內容 + solve() 的 OPTIONS，重跑或加大網格時只補沒跑過的格子。
+每個格子的 thinking log 也放在同一個目錄。
+"""
+
+PIPELINES = ("code", "reasoning")
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "reasoning_tokens", "total_tokens")
+
+_REASONING_CLIENT = None
+_REASONING_LOCK = threading.Lock()
+
+
+def _natural_key(path: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def _cell_key(pipeline_name: str, model_name: str, effort: str, problem: str) -> str:
+    options = pipeline.OPTIONS if pipeline_name == "code" else {}
+    return hashlib.sha256(json.dumps(
+        {
+            "pipeline": pipeline_name, "model": model_name, "effort": effort,
+            "problem": hashlib.sha256(problem.encode("utf-8")).hexdigest(), "options": options,
+        },
+        sort_keys=True, default=str,
+    ).encode("utf-8")).hexdigest()[:24]
+
+
+def _cost(model_name: str, tokens: dict) -> float:
+    # completion_tokens already include the reasoning tokens
+    pricing = MODEL_PRICING[model_name]
+    return (tokens.get("prompt_tokens", 0) * pricing["input"]
+            + tokens.get("completion_tokens", 0) * pricing["output"]) / 1_000_000
+
+
+def _expected_answer(desc_path: str) -> float | None:
+    ans_path = re.sub(r"\.desc\.txt$", ".ans.txt", desc_path)
+    if not os.path.isfile(ans_path):
+        return None
+    with open(ans_path, "r", encoding="utf-8") as f:
+        return pipeline._parse_expected_answer(f.read())
+
+
+def _run_code_pipeline(desc_path: str, problem: str, model_name: str, effort: str) -> dict:
+    """model.py solve() with its own model instance; tokens are summed over the step log."""
+    token = pipeline.PROBLEM_MODEL.set(OpenAIReasoning(api_key=pipeline.api_key, model=model_name, reasoning_effort=effort))
+    try:
+        output, token_log, _ = pipeline.solve(problem)
+        answer = pipeline.extract(output)
+    finally:
+        pipeline.PROBLEM_MODEL.reset(token)
+    tokens = dict.fromkeys(TOKEN_KEYS, 0)
+    for step in token_log.values():
+        if step.get("resumed"):
+            continue
+        for key in TOKEN_KEYS:
+            tokens[key] += step.get("tokens_used", {}).get(key, 0)
+    expected = _expected_answer(desc_path)
+    correct = abs(answer - expected) < 0.01 if expected is not None else None
+    return {"answer": answer, "expected": expected, "correct": correct, "tokens": tokens}
+
+
+def _run_reasoning_pipeline(desc_path: str, problem: str, model_name: str, effort: str) -> dict:
+    """openai_reasoning/main.py run(); all cells share one OpenAI client."""
+    global _REASONING_CLIENT
+    with _REASONING_LOCK:
+        if _REASONING_CLIENT is None:
+            # openai_reasoning is a package next to this directory
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            if root not in sys.path:
+                sys.path.insert(0, root)
+            from openai import OpenAI
+            _REASONING_CLIENT = OpenAI(api_key=pipeline.api_key)
+    from openai_reasoning.main import run
+    log = run(desc_path, None, effort, client=_REASONING_CLIENT, model_name=model_name)
+    tokens = {key: log["token_usage"].get(key, 0) for key in TOKEN_KEYS}
+    return {"answer": log["llm_answer"], "expected": log["correct_answer"], "correct": log["correct"], "tokens": tokens}
+
+
+RUNNERS = {"code": _run_code_pipeline, "reasoning": _run_reasoning_pipeline}
+
+
+def run_cell(cache_dir: str, pipeline_name: str, model_name: str, effort: str, desc_path: str) -> tuple[dict, bool]:
+    """
+    跑一個 (pipeline, 模型, effort, 題目) 格子；cache 裡已有結果時直接回傳。
+
+    Returns:
+        tuple[dict, bool]: 結果紀錄，以及是否來自 cache。
+    """
+    with open(desc_path, "r", encoding="utf-8") as f:
+        problem = f.read()
+    key = _cell_key(pipeline_name, model_name, effort, problem)
+    cell_path = os.path.join(cache_dir, f"{key}.json")
+    if os.path.isfile(cell_path):
+        try:
+            with open(cell_path, "r", encoding="utf-8") as f:
+                return json.load(f), True
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    problem_name = re.sub(r"\.desc\.txt$", "", os.path.basename(desc_path))
+    record = {"pipeline": pipeline_name, "model": model_name, "effort": effort, "problem": problem_name,
+              "desc_path": os.path.abspath(desc_path)}
+    start = time.monotonic()
+    with problem_log(os.path.join(cache_dir, f"{key}_thinking.log"), console=False):
+        try:
+            record.update(RUNNERS[pipeline_name](desc_path, problem, model_name, effort))
+        except Exception as e:
+            print(f"ERROR: {type(e).__name__}: {e}")
+            record.update({"error": f"{type(e).__name__}: {e}", "correct": False,
+                           "tokens": dict.fromkeys(TOKEN_KEYS, 0)})
+    record["latency_seconds"] = round(time.monotonic() - start, 4)
+    record["cost_usd"] = round(_cost(model_name, record["tokens"]), 6)
+
+    # Failed cells are not cached, so a rerun retries them
+    if "error" not in record:
+        tmp_path = f"{cell_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, cell_path)
+    return record, False
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(records: list[dict]) -> list[dict]:
+    """每一組 (pipeline, 模型, effort) 一列，frontier 欄位標出 Pareto-optimal 的組合。"""
+    groups = {}
+    for record in records:
+        groups.setdefault((record["pipeline"], record["model"], record["effort"]), []).append(record)
+
+    rows = []
+    for (pipeline_name, model_name, effort), cells in groups.items():
+        graded = [c["correct"] for c in cells if c["correct"] is not None]
+        latencies = [c["latency_seconds"] for c in cells if "error" not in c]
+        cost = sum(c["cost_usd"] for c in cells)
+        row = {
+            "pipeline": pipeline_name,
+            "model": model_name,
+            "effort": effort,
+            "problems": len(cells),
+            "errors": sum(1 for c in cells if "error" in c),
+            "accuracy": round(sum(graded) / len(graded), 4) if graded else None,
+            "p50_latency": round(_percentile(latencies, 0.5), 2) if latencies else None,
+            "p95_latency": round(_percentile(latencies, 0.95), 2) if latencies else None,
+            "cost_usd": round(cost, 4),
+            "cost_per_problem": round(cost / len(cells), 5),
+        }
+        for key in TOKEN_KEYS:
+            row[f"mean_{key}"] = round(sum(c["tokens"].get(key, 0) for c in cells) / len(cells))
+        rows.append(row)
+
+    # Frontier per pipeline: higher accuracy, lower cost per problem, lower p95 latency
+    for row in rows:
+        row["frontier"] = row["accuracy"] is not None and row["p95_latency"] is not None and not any(
+            other is not row and other["pipeline"] == row["pipeline"]
+            and other["accuracy"] is not None and other["p95_latency"] is not None
+            and other["accuracy"] >= row["accuracy"]
+            and other["cost_per_problem"] <= row["cost_per_problem"]
+            and other["p95_latency"] <= row["p95_latency"]
+            and (other["accuracy"], -other["cost_per_problem"], -other["p95_latency"])
+            != (row["accuracy"], -row["cost_per_problem"], -row["p95_latency"])
+            for other in rows
+        )
+    order = {name: i for i, name in enumerate(EFFORT_FACTOR)}
+    rows.sort(key=lambda r: (r["pipeline"], r["model"], order.get(r["effort"], len(order))))
+    return rows
+
+
+def print_report(rows: list[dict]) -> None:
+    columns = ["pipeline", "model", "effort", "problems", "errors", "accuracy", "p50_latency", "p95_latency",
+               "mean_total_tokens", "mean_reasoning_tokens", "cost_usd", "cost_per_problem"]
+    print(" | ".join([*columns, "frontier"]))
+    print(" | ".join("---" for _ in range(len(columns) + 1)))
+    for row in rows:
+        print(" | ".join([*(str(row[c]) for c in columns), "*" if row["frontier"] else ""]))
+    print("\n* = Pareto frontier (accuracy vs. cost per problem vs. p95 latency, per pipeline)")
+    for pipeline_name in sorted({r["pipeline"] for r in rows}):
+        frontier = [r for r in rows if r["pipeline"] == pipeline_name and r["frontier"]]
+        frontier.sort(key=lambda r: r["cost_per_problem"])
+        print(f"{pipeline_name}: " + (" -> ".join(
+            f"{r['model']}/{r['effort']} (acc {r['accuracy']}, ${r['cost_per_problem']}/problem, p95 {r['p95_latency']}s)"
+            for r in frontier
+        ) or "n/a"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="sweep.py",
+        description="Accuracy / latency / token / cost sweep over models and reasoning efforts"
+    )
+    parser.add_argument("-i", "--input", required=True, help="A .desc.txt file or a directory of .desc.txt files")
+    parser.add_argument("--models", nargs="+", default=["o3"], choices=sorted(MODEL_PRICING), help="Models to sweep")
+    parser.add_argument("--efforts", nargs="+", default=["high"], choices=list(EFFORT_FACTOR), help="Reasoning efforts to sweep")
+    parser.add_argument("--pipelines", nargs="+", default=["code"], choices=PIPELINES,
+                        help="code = model.py solve(), reasoning = openai_reasoning/main.py run()")
+    parser.add_argument("--offset", type=int, default=0, help="Skip the first N problems (natural order)")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most N problems (0 = all)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, metavar="N", help="Cells solved concurrently")
+    parser.add_argument("--cache", default="sweep_cache", metavar="DIR",
+                        help="Per-cell results and thinking logs; cells already in DIR are not run again")
+    parser.add_argument("--exec-cache", metavar="DIR", default=None,
+                        help="Share generated-code execution results across cells (model.py --exec-cache)")
+    parser.add_argument("--fused", action="store_true", help="Run the code pipeline in fused mode (model.py --fused)")
+    parser.add_argument("--inject-data", action="store_true", help="model.py --inject-data for the code pipeline")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-configuration table to this CSV file")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        desc_files = sorted(
+            (os.path.join(args.input, f) for f in os.listdir(args.input) if f.endswith(".desc.txt")),
+            key=_natural_key,
+        )
+    elif os.path.isfile(args.input):
+        desc_files = [args.input]
+    else:
+        print(f"ERROR: input {args.input} not found.")
+        sys.exit(1)
+    desc_files = desc_files[args.offset:args.offset + args.limit if args.limit else None]
+    if not desc_files:
+        print(f"ERROR: no .desc.txt files selected from {args.input}")
+        sys.exit(1)
+
+    pipeline.OPTIONS["fused"] = args.fused
+    pipeline.OPTIONS["inject_data"] = args.inject_data
+    if args.exec_cache:
+        pipeline.EXEC_CACHE = ExecutionCache(args.exec_cache)
+    os.makedirs(args.cache, exist_ok=True)
+
+    cells = [
+        (pipeline_name, model_name, effort, desc_path)
+        for pipeline_name in args.pipelines
+        for model_name in args.models
+        for effort in args.efforts
+        for desc_path in desc_files
+    ]
+    print(f"Sweep: {len(args.pipelines)} pipeline(s) x {len(args.models)} model(s) x {len(args.efforts)} effort(s) "
+          f"x {len(desc_files)} problem(s) = {len(cells)} cells")
+
+    records = []
+    cached = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_cell, args.cache, *cell) for cell in cells]
+        for done, future in enumerate(as_completed(futures), 1):
+            record, from_cache = future.result()
+            records.append(record)
+            cached += from_cache
+            outcome = record.get("error") or {True: "correct", False: "incorrect", None: "ungraded"}[record["correct"]]
+            print(f"[{done}/{len(cells)}] {record['pipeline']} {record['model']}/{record['effort']} {record['problem']}: "
+                  f"{outcome}, {record['latency_seconds']:.1f}s, ${record['cost_usd']:.4f}"
+                  + (" (cached)" if from_cache else ""))
+
+    print(f"\n===== Sweep report ({cached}/{len(cells)} cells from cache) =====")
+    rows = summarize(records)
+    print_report(rows)
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nPer-configuration table written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import re
+import ast
+import json
+import hashlib
+import threading
+
+from instance_data import is_data_row
+
+
+""" 🌟 參數化實例的程式範本快取
+
+同一個資料集裡的題目常常只差在數字（例如 small_100_1000 的 100 題 Knapsack 題目敘述完全相同，
+只有 CSV 與容量不同）。把題目中的數字遮成 `#`、資料區塊縮成一行 `<DATA>` 後取 hash 當作結構指紋；
+指紋相同時，把上一題成功的程式「重新綁定」到新題目的資料上直接執行，不必再呼叫 LLM：
+
+- 讀 INSTANCE 的程式：原封不動，執行時注入新題目的 INSTANCE
+- 嵌入 raw_problem_text 的程式：把這個字串換成新題目的原文
+
+若程式把舊題目的數字寫死成常數（舊題目有、新題目沒有的數字出現在程式的數值常數中），
+重新綁定會得到錯誤答案，因此不重用。重新綁定後的程式仍須由呼叫端實際執行驗證。
+"""
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+
+def structural_fingerprint(text: str) -> str:
+    """遮蔽數字與資料區塊後的題目結構 hash。"""
+    lines = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if is_data_row(line):
+            if lines and lines[-1] == "<DATA>":
+                continue
+            line = "<DATA>"
+        else:
+            line = re.sub(r"\s+", " ", re.sub(_NUMBER, "#", line))
+        lines.append(line)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def _numbers(text: str) -> set[float]:
+    return {float(v) for v in re.findall(_NUMBER, text)}
+
+
+def _code_numbers(tree: ast.AST) -> set[float]:
+    return {
+        float(node.value) for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+    }
+
+
+class _RawProblemRebinder(ast.NodeTransformer):
+    """把 `raw_problem_text = "..."` 的字串常數換成新題目的原文。"""
+
+    def __init__(self, problem: str):
+        self.problem = problem
+        self.rebound = False
+
+    def visit_Assign(self, node: ast.Assign):
+        if (
+            any(isinstance(t, ast.Name) and t.id == "raw_problem_text" for t in node.targets)
+            and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+        ):
+            node.value = ast.Constant(value=self.problem)
+            self.rebound = True
+        return node
+
+
+def replace_raw_problem_text(code: str, text: str) -> str | None:
+    """把程式中 `raw_problem_text = "..."` 的字串換成 text；無法解析或沒有這個指派時回傳 None。"""
+    try:
+        tree = ast.parse(code.replace('\u00A0', ' '))
+    except SyntaxError:
+        return None
+    rebinder = _RawProblemRebinder(text)
+    tree = rebinder.visit(tree)
+    if not rebinder.rebound:
+        return None
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+
+def rebind_program(entry: dict, problem: str) -> str | None:
+    """
+    把快取中的程式綁定到新題目的資料上。
+
+    Args:
+        entry (dict): TemplateCache.get() 回傳的紀錄。
+        problem (str): 新題目的原文。
+
+    Returns:
+        str | None: 可以直接執行的程式；程式寫死了舊題目的數字、或找不到可替換的 raw_problem_text 時回傳 None。
+    """
+    try:
+        tree = ast.parse(entry["code"].replace('\u00A0', ' '))
+    except SyntaxError:
+        return None
+
+    # Numbers that belonged to the old instance only; a program that hard-codes any of them is not reusable
+    stale = set(entry["source_numbers"]) - _numbers(problem)
+    if _code_numbers(tree) & stale:
+        return None
+
+    if entry["data_injected"]:
+        return entry["code"]
+    return replace_raw_problem_text(entry["code"], problem)
+
+
+class TemplateCache:
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, problem: str) -> dict | None:
+        key = structural_fingerprint(problem)
+        with self._lock:
+            entry = self.memory.get(key)
+        if entry is None and self.cache_dir and os.path.isfile(self._path(key)):
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self.memory[key] = entry
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, problem: str, code: str, data_injected: bool, tokens: int, seconds: float) -> None:
+        """
+        保存一個已驗證成功的程式。
+
+        Args:
+            tokens (int) / seconds (float): 產生這個程式花費的 token 與時間，命中時記為省下的量。
+        """
+        key = structural_fingerprint(problem)
+        entry = {
+            "code": code,
+            "data_injected": data_injected,
+            "source_numbers": sorted(_numbers(problem)),
+            "tokens": tokens,
+            "seconds": round(seconds, 4),
+        }
+        with self._lock:
+            self.memory[key] = entry
+        if self.cache_dir:
+            # 先寫暫存檔再 rename，避免中斷時留下半份 JSON
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
@@ -0,0 +1,542 @@
+""" 🌟 已知資料集格式的固定模型範本
+
+標頭可辨識的實例（TSP / GCP / Knapsack / NSP / VRP，見 instance_data.detect_instance_type）
+不需要 LLM 分類、建模、寫程式：這裡的程式是人工檢查過的模型，直接讀取 INSTANCE 求解，
+輸出格式與 CODE_GENERATOR_PROMPT 要求的一致（`Objective value:` 行 + report(...)），
+因此可以原封不動交給 run_generated_code 執行、快取。
+
+依實例大小選擇路徑：
+exact      PuLP/CBC 精確模型（NSP 有 HiGHS 時改用 HiGHS），以 TIME_LIMIT（秒，None 為不限）限制整個求解的時間；
+           TSP / GCP 到時間上限時回報手上的解（status "Heuristic"）
+heuristic  超過 EXACT_SIZE_LIMITS 的實例改用建構式啟發法 + 局部搜尋，不保證最佳
+"""
+
+# 超過此大小（見 instance_size）就改走 heuristic
+EXACT_SIZE_LIMITS = {
+    "TSP": 150,          # nodes
+    "GCP": 200,          # nodes
+    "Knapsack": 100000,  # items
+    "NSP": 2000,         # employees x days
+    "VRP": 25,           # nodes incl. depot
+}
+
+
+_TSP_DISTANCES = '''
+import math
+
+n = INSTANCE["n"]
+weight_type = INSTANCE["edge_weight_type"]
+if weight_type == "GEO" and INSTANCE["coords"] is None:
+    # The parsed matrix holds planar distances between lat/lon pairs; GEO lengths cannot be recovered
+    raise RuntimeError("DATA_VALIDATION_FAILED: GEO distances need node coordinates")
+
+
+def _geo_radians(v):
+    degrees = int(v)
+    return math.pi * (degrees + 5.0 * (v - degrees) / 3.0) / 180.0
+
+
+def raw_distance(i, j):
+    if INSTANCE["dist"] is not None:
+        # The parsed ATT matrix holds plain Euclidean distances
+        d = float(INSTANCE["dist"][i][j])
+        return d / math.sqrt(10.0) if weight_type == "ATT" else d
+    (xi, yi), (xj, yj) = INSTANCE["coords"][i], INSTANCE["coords"][j]
+    if weight_type == "ATT":
+        return math.sqrt(((xi - xj) ** 2 + (yi - yj) ** 2) / 10.0)
+    if weight_type == "GEO":
+        lat_i, lon_i, lat_j, lon_j = map(_geo_radians, (xi, yi, xj, yj))
+        q1, q2, q3 = math.cos(lon_i - lon_j), math.cos(lat_i - lat_j), math.cos(lat_i + lat_j)
+        return 6378.388 * math.acos(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0
+    return math.hypot(xi - xj, yi - yj)
+
+
+def cost(i, j):
+    # TSPLIB: nearest integer; ATT rounds up when the nearest integer is below the real distance
+    r = raw_distance(i, j)
+    t = int(r + 0.5)
+    if weight_type == "ATT" and t < r:
+        t += 1
+    return t
+
+
+def tour_length(tour):
+    return sum(cost(tour[k], tour[(k + 1) % len(tour)]) for k in range(len(tour)))
+'''
+
+_TSP_EXACT = _TSP_DISTANCES + '''
+import time
+import pulp
+
+# Assignment relaxation + iterative subtour elimination (DFJ cuts added only when violated)
+c = [[cost(i, j) for j in range(n)] for i in range(n)]
+prob = pulp.LpProblem("tsp", pulp.LpMinimize)
+x = {(i, j): pulp.LpVariable(f"x_{i}_{j}", cat="Binary") for i in range(n) for j in range(n) if i != j}
+prob += pulp.lpSum(c[i][j] * var for (i, j), var in x.items())
+for i in range(n):
+    prob += pulp.lpSum(x[i, j] for j in range(n) if j != i) == 1, f"out_{i}"
+    prob += pulp.lpSum(x[j, i] for j in range(n) if j != i) == 1, f"in_{i}"
+
+
+def subtours():
+    succ = {i: j for (i, j), var in x.items() if var.varValue > 0.5}
+    unvisited, found = set(range(n)), []
+    while unvisited:
+        cycle, node = [], min(unvisited)
+        while node in unvisited:
+            unvisited.remove(node)
+            cycle.append(node)
+            node = succ[node]
+        found.append(cycle)
+    return found
+
+
+def patch(found):
+    """Merge the subtours into one tour, each time with the cheapest exchange of two arcs."""
+    found = sorted(found, key=len, reverse=True)
+    tour = found[0]
+    for other in found[1:]:
+        _, a, b = min(
+            (c[tour[a]][other[(b + 1) % len(other)]] + c[other[b]][tour[(a + 1) % len(tour)]]
+             - c[tour[a]][tour[(a + 1) % len(tour)]] - c[other[b]][other[(b + 1) % len(other)]], a, b)
+            for a in range(len(tour)) for b in range(len(other))
+        )
+        tour = tour[:a + 1] + other[b + 1:] + other[:b + 1] + tour[a + 1:]
+    return tour
+
+
+def nearest_neighbour():
+    tour, left = [0], set(range(1, n))
+    while left:
+        tour.append(min(left, key=lambda j: c[tour[-1]][j]))
+        left.remove(tour[-1])
+    return tour
+
+
+# TIME_LIMIT bounds the whole cut loop, not each solve
+deadline = None if TIME_LIMIT is None else time.monotonic() + TIME_LIMIT
+cuts, cycles, proven = 0, None, True
+while True:
+    remaining = None if deadline is None else deadline - time.monotonic()
+    if remaining is not None and remaining <= 0:
+        proven = False
+        break
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=None if remaining is None else max(1, remaining)))
+    if pulp.LpStatus[prob.status] != "Optimal":
+        proven = False
+        break
+    cycles = subtours()
+    if prob.sol_status != pulp.LpSolutionOptimal:
+        proven = False  # stopped on the time limit with an incumbent
+    if len(cycles) == 1 or not proven:
+        break
+    for cycle in cycles:
+        prob += pulp.lpSum(x[i, j] for i in cycle for j in cycle if i != j) <= len(cycle) - 1, f"subtour_{cuts}"
+        cuts += 1
+
+if proven:
+    tour, status = cycles[0], "Optimal"
+else:
+    # Out of time: the last solution's subtours patched into one tour (no solution yet: nearest neighbour)
+    tour, status = (patch(cycles) if cycles else nearest_neighbour()), "Heuristic"
+objective = tour_length(tour)
+print("Tour:", [v + 1 for v in tour])
+print(f"Subtour cuts added: {cuts}")
+print(f"Objective value: {objective}")
+report(objective=objective, status=status, variables={"tour": [v + 1 for v in tour]}, method="exact", cuts=cuts)
+'''
+
+_TSP_HEURISTIC = _TSP_DISTANCES + '''
+import time
+
+# Nearest neighbour construction followed by 2-opt until no improvement or TIME_LIMIT
+start = time.monotonic()
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+tour = [0]
+if np is not None and INSTANCE["coords"] is not None:
+    # Vectorised construction on the raw coordinates (the rounding rule does not change the order much)
+    points = np.asarray(INSTANCE["coords"], dtype=float)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        d = np.hypot(*(points - points[tour[-1]]).T)
+        d[visited] = np.inf
+        nxt = int(d.argmin())
+        visited[nxt] = True
+        tour.append(nxt)
+else:
+    remaining = set(range(1, n))
+    while remaining:
+        last = tour[-1]
+        nxt = min(remaining, key=lambda j: cost(last, j))
+        remaining.remove(nxt)
+        tour.append(nxt)
+
+improved = True
+while improved and (TIME_LIMIT is None or time.monotonic() - start < TIME_LIMIT):
+    improved = False
+    for i in range(n - 1):
+        a, b = tour[i], tour[i + 1]
+        for j in range(i + 2, n if i > 0 else n - 1):
+            c_, d_ = tour[j], tour[(j + 1) % n]
+            if cost(a, c_) + cost(b, d_) < cost(a, b) + cost(c_, d_):
+                tour[i + 1:j + 1] = reversed(tour[i + 1:j + 1])
+                improved = True
+                break
+        if TIME_LIMIT is not None and time.monotonic() - start >= TIME_LIMIT:
+            break
+
+objective = tour_length(tour)
+print("Tour:", [v + 1 for v in tour])
+print(f"Objective value: {objective}")
+report(objective=objective, status="Heuristic", variables={"tour": [v + 1 for v in tour]}, method="heuristic")
+'''
+
+_GCP_DSATUR = '''
+n = INSTANCE["n"]
+adjacency = {int(v): [int(u) for u in neigh] for v, neigh in INSTANCE["adjacency"].items()}
+nodes = sorted(adjacency)
+
+
+def dsatur():
+    colors = {}
+    while len(colors) < len(nodes):
+        v = max(
+            (v for v in nodes if v not in colors),
+            key=lambda v: (len({colors[u] for u in adjacency[v] if u in colors}), len(adjacency[v])),
+        )
+        used = {colors[u] for u in adjacency[v] if u in colors}
+        colors[v] = next(c for c in range(len(nodes)) if c not in used)
+    return colors
+
+
+def valid(colors):
+    return all(colors[u] != colors[v] for v in nodes for u in adjacency[v])
+
+
+heuristic_colors = dsatur()
+upper = len(set(heuristic_colors.values()))
+'''
+
+_GCP_EXACT = _GCP_DSATUR + '''
+import pulp
+
+# Greedy clique: a lower bound, and its vertices can be pre-assigned distinct colors
+clique = []
+for v in sorted(nodes, key=lambda v: -len(adjacency[v])):
+    if all(v in adjacency[u] for u in clique):
+        clique.append(v)
+
+if len(clique) == upper:
+    colors, status = heuristic_colors, "Optimal"
+    print(f"DSATUR coloring matches the clique bound {upper}; no ILP needed.")
+else:
+    palette = range(upper)
+    prob = pulp.LpProblem("gcp", pulp.LpMinimize)
+    x = {(v, c): pulp.LpVariable(f"x_{v}_{c}", cat="Binary") for v in nodes for c in palette}
+    w = {c: pulp.LpVariable(f"w_{c}", cat="Binary") for c in palette}
+    prob += pulp.lpSum(w.values())
+    for v in nodes:
+        prob += pulp.lpSum(x[v, c] for c in palette) == 1, f"assign_{v}"
+    for v in nodes:
+        for u in adjacency[v]:
+            if u > v:
+                for c in palette:
+                    prob += x[u, c] + x[v, c] <= w[c], f"edge_{u}_{v}_{c}"
+    for c in palette:
+        if c + 1 < upper:
+            prob += w[c] >= w[c + 1], f"order_{c}"
+    for k, v in enumerate(clique):
+        prob += x[v, k] == 1, f"clique_{v}"
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=TIME_LIMIT))
+    status = pulp.LpStatus[prob.status]
+    colors = heuristic_colors
+    if status == "Optimal":
+        ilp_colors = {v: next(c for c in palette if x[v, c].varValue > 0.5) for v in nodes}
+        if valid(ilp_colors) and len(set(ilp_colors.values())) <= upper:
+            colors = ilp_colors
+    if colors is heuristic_colors:
+        # No usable ILP solution (e.g. time limit without an incumbent): the DSATUR coloring is still valid
+        status = "Heuristic"
+
+objective = len(set(colors.values()))
+print(f"Clique lower bound: {len(clique)}, DSATUR upper bound: {upper}")
+print(f"Objective value: {objective}")
+report(objective=objective, status=status, variables={"colors": colors},
+       method="exact", lower_bound=len(clique))
+'''
+
+_GCP_HEURISTIC = _GCP_DSATUR + '''
+colors = heuristic_colors
+if not valid(colors):
+    raise RuntimeError("DATA_VALIDATION_FAILED: DSATUR produced an invalid coloring")
+objective = len(set(colors.values()))
+print(f"Objective value: {objective}")
+report(objective=objective, status="Heuristic", variables={"colors": colors},
+       method="heuristic")
+'''
+
+_KNAPSACK_EXACT = '''
+import pulp
+
+values = [int(v) for v in INSTANCE["values"]]
+weights = [int(w) for w in INSTANCE["weights"]]
+capacity = INSTANCE["capacity"]
+if capacity is None or len(values) != len(weights):
+    raise RuntimeError("DATA_VALIDATION_FAILED: knapsack capacity or item list missing")
+n = len(values)
+
+prob = pulp.LpProblem("knapsack", pulp.LpMaximize)
+x = [pulp.LpVariable(f"x_{i}", cat="Binary") for i in range(n)]
+prob += pulp.lpSum(values[i] * x[i] for i in range(n))
+prob += pulp.lpSum(weights[i] * x[i] for i in range(n)) <= capacity, "capacity"
+prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=TIME_LIMIT))
+status = pulp.LpStatus[prob.status]
+
+selected = [i for i in range(n) if x[i].varValue is not None and x[i].varValue > 0.5]
+objective = sum(values[i] for i in selected)
+print(f"Selected items: {len(selected)}, total weight: {sum(weights[i] for i in selected)} / {capacity}")
+print(f"Objective value: {objective}")
+report(objective=objective, status=status, variables={"selected": selected}, method="exact")
+'''
+
+_NSP_EXACT = '''
+import pulp
+
+# Rotating schedule: the employee rows are read one after another as a single cyclic
+# sequence of length employees x days; block lengths and forbidden sequences wrap around.
+days = INSTANCE["schedule_length"]
+employees = INSTANCE["num_employees"]
+shift_names = [s["name"] for s in INSTANCE["shifts"]] or INSTANCE["shift_names"]
+requirements = [[int(r) for r in row] for row in INSTANCE["requirements"]]
+T = days * employees
+
+prob = pulp.LpProblem("nsp", pulp.LpMinimize)
+y = {(t, s): pulp.LpVariable(f"y_{t}_{s}", cat="Binary") for t in range(T) for s in shift_names}
+work = {t: pulp.lpSum(y[t, s] for s in shift_names) for t in range(T)}
+prob += pulp.lpSum([])  # feasibility problem
+
+for t in range(T):
+    prob += work[t] <= 1, f"one_shift_{t}"
+for k, s in enumerate(shift_names):
+    for d in range(days):
+        prob += pulp.lpSum(y[e * days + d, s] for e in range(employees)) == requirements[k][d], f"cover_{s}_{d}"
+
+
+def add_block_limits(name, active, lo, hi):
+    """active(t) is a 0/1 expression; runs of 1s must have length in [lo, hi] (cyclically)."""
+    for t in range(T):
+        if hi < T:
+            prob.addConstraint(pulp.lpSum(active(t + k) for k in range(hi + 1)) <= hi, f"{name}_max_{t}")
+        for k in range(1, lo):
+            # a run starting at t (active(t) = 1, active(t - 1) = 0) covers t .. t + lo - 1
+            prob.addConstraint(active(t + k) >= active(t) - active(t - 1), f"{name}_min_{t}_{k}")
+
+
+def at(expr_of):
+    return lambda t: expr_of(t % T)
+
+
+add_block_limits("work", at(lambda t: work[t]), *INSTANCE["work_block"])
+add_block_limits("off", at(lambda t: 1 - work[t]), *INSTANCE["off_block"])
+for shift in INSTANCE["shifts"]:
+    s = shift["name"]
+    add_block_limits(f"block_{s}", at(lambda t, s=s: y[t, s]), shift["min_block"], shift["max_block"])
+
+
+def indicator(t, name):
+    t %= T
+    return 1 - work[t] if name == "-" else y[t, name]
+
+
+for f_idx, seq in enumerate(INSTANCE["forbidden"]):
+    for t in range(T):
+        prob += pulp.lpSum(indicator(t + k, name) for k, name in enumerate(seq)) <= len(seq) - 1, f"forbid_{f_idx}_{t}"
+
+# CBC often spends the whole TIME_LIMIT without finding a rotation that HiGHS finds in seconds
+solver = pulp.HiGHS(msg=False, timeLimit=TIME_LIMIT) if hasattr(pulp, "HiGHS") else None
+if solver is None or not solver.available():
+    solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=TIME_LIMIT)
+prob.solve(solver)
+status = pulp.LpStatus[prob.status]
+if prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+    # No objective: a schedule found before the time limit meets every constraint and is optimal
+    status = "Optimal"
+    cell = lambda t: next((s for s in shift_names if y[t, s].varValue > 0.5), "-")
+    schedule = [[cell(e * days + d) for d in range(days)] for e in range(employees)]
+    for e, row in enumerate(schedule):
+        print(f"{e}: [{', '.join(row)}]")
+    print("Objective value: 0")
+    report(objective=0, status=status, variables={"schedule": schedule}, method="exact")
+else:
+    print(f"Solver status: {status}")
+    report(status=status, method="exact")
+'''
+
+_VRP_DISTANCES = '''
+import math
+
+node_ids = list(INSTANCE["node_ids"])
+xy = [tuple(float(v) for v in p) for p in INSTANCE["xy"]]
+demand = [int(q) for q in INSTANCE["demand"]]
+capacity = INSTANCE["capacity"]
+vehicles = INSTANCE["vehicles"]
+depot = node_ids.index(INSTANCE["depot"]) if INSTANCE["depot"] in node_ids else 0
+n = len(node_ids)
+customers = [i for i in range(n) if i != depot]
+if capacity is None or any(demand[i] > capacity for i in customers):
+    raise RuntimeError("DATA_VALIDATION_FAILED: vehicle capacity missing or smaller than a single demand")
+
+
+def dist(i, j):
+    return math.hypot(xy[i][0] - xy[j][0], xy[i][1] - xy[j][1])
+
+
+def route_cost(route):
+    path = [depot] + route + [depot]
+    return sum(dist(path[k], path[k + 1]) for k in range(len(path) - 1))
+
+
+def finish(routes, status, method):
+    objective = round(sum(route_cost(r) for r in routes), 3)
+    named = [[node_ids[i] for i in r] for r in routes]
+    for k, r in enumerate(named, 1):
+        print(f"Route {k}: {r} (demand {sum(demand[node_ids.index(v)] for v in r)})")
+    print(f"Number of routes: {len(routes)}")
+    print(f"Objective value: {objective}")
+    report(objective=objective, status=status, variables={"routes": named}, method=method, routes=len(routes))
+'''
+
+_VRP_EXACT = _VRP_DISTANCES + '''
+import pulp
+
+# Two-index CVRP with MTZ-style load variables
+prob = pulp.LpProblem("cvrp", pulp.LpMinimize)
+x = {(i, j): pulp.LpVariable(f"x_{i}_{j}", cat="Binary") for i in range(n) for j in range(n) if i != j}
+load = {i: pulp.LpVariable(f"load_{i}", lowBound=demand[i], upBound=capacity) for i in customers}
+prob += pulp.lpSum(dist(i, j) * var for (i, j), var in x.items())
+for i in customers:
+    prob += pulp.lpSum(x[i, j] for j in range(n) if j != i) == 1, f"out_{i}"
+    prob += pulp.lpSum(x[j, i] for j in range(n) if j != i) == 1, f"in_{i}"
+depot_out = pulp.lpSum(x[depot, j] for j in customers)
+prob += depot_out == pulp.lpSum(x[j, depot] for j in customers), "depot_balance"
+if vehicles:
+    prob += depot_out == vehicles, "vehicles"
+for i in customers:
+    for j in customers:
+        if i != j:
+            prob += load[j] >= load[i] + demand[j] - capacity * (1 - x[i, j]), f"load_{i}_{j}"
+prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=TIME_LIMIT))
+status = pulp.LpStatus[prob.status]
+
+if status == "Optimal":
+    succ = {i: j for (i, j), var in x.items() if var.varValue > 0.5 and i != depot}
+    routes = []
+    for start in (j for j in customers if x[depot, j].varValue > 0.5):
+        route, node = [], start
+        while node != depot:
+            route.append(node)
+            node = succ[node]
+        routes.append(route)
+    finish(routes, status, "exact")
+else:
+    print(f"Solver status: {status}")
+    report(status=status, method="exact")
+'''
+
+_VRP_HEURISTIC = _VRP_DISTANCES + '''
+import time
+
+# Clarke-Wright savings, then 2-opt inside each route
+start = time.monotonic()
+route_of = {i: [i] for i in customers}
+loads = {i: demand[i] for i in customers}
+savings = sorted(
+    ((dist(depot, i) + dist(depot, j) - dist(i, j), i, j) for i in customers for j in customers if i < j),
+    reverse=True,
+)
+for saving, i, j in savings:
+    if saving <= 0:
+        break
+    ri, rj = route_of[i], route_of[j]
+    if ri is rj or loads[ri[0]] + loads[rj[0]] > capacity:
+        continue
+    # i and j must be route ends; orient so that i is the tail of ri and j the head of rj
+    if ri[-1] != i:
+        if ri[0] != i:
+            continue
+        ri.reverse()
+    if rj[0] != j:
+        if rj[-1] != j:
+            continue
+        rj.reverse()
+    merged = ri + rj
+    total = loads[ri[0]] + loads[rj[0]]
+    for v in merged:
+        route_of[v] = merged
+    loads[merged[0]] = total
+    loads[merged[-1]] = total
+
+routes = []
+for route in route_of.values():
+    if not any(route is r for r in routes):
+        routes.append(route)
+
+for route in routes:
+    improved = True
+    while improved and (TIME_LIMIT is None or time.monotonic() - start < TIME_LIMIT):
+        improved = False
+        for a in range(len(route) - 1):
+            for b in range(a + 1, len(route)):
+                candidate = route[:a] + route[a:b + 1][::-1] + route[b + 1:]
+                if route_cost(candidate) < route_cost(route) - 1e-9:
+                    route[:] = candidate
+                    improved = True
+
+if vehicles and len(routes) != vehicles:
+    print(f"Note: savings heuristic uses {len(routes)} routes, instance specifies {vehicles} vehicles.")
+finish(routes, "Heuristic", "heuristic")
+'''
+
+_TEMPLATES = {
+    ("TSP", "exact"): _TSP_EXACT,
+    ("TSP", "heuristic"): _TSP_HEURISTIC,
+    ("GCP", "exact"): _GCP_EXACT,
+    ("GCP", "heuristic"): _GCP_HEURISTIC,
+    ("Knapsack", "exact"): _KNAPSACK_EXACT,
+    ("NSP", "exact"): _NSP_EXACT,
+    ("VRP", "exact"): _VRP_EXACT,
+    ("VRP", "heuristic"): _VRP_HEURISTIC,
+}
+
+
+def instance_size(instance: dict) -> int:
+    if instance["type"] == "NSP":
+        return instance["schedule_length"] * instance["num_employees"]
+    return instance["n"]
+
+
+def select_template(instance: dict, time_limit: float | None = None) -> tuple[str, str] | None:
+    """
+    依類型與大小挑選範本程式。
+
+    Args:
+        instance (dict): instance_data.parse_instance 的結果。
+        time_limit (float | None): 求解時間上限（秒），寫進程式的 TIME_LIMIT。
+
+    Returns:
+        tuple[str, str] | None: (路徑名稱，例如 "TSP/exact", 程式碼)；沒有對應範本時回傳 None。
+    """
+    instance_type = instance["type"]
+    if instance_type not in EXACT_SIZE_LIMITS:
+        return None
+    mode = "exact" if instance_size(instance) <= EXACT_SIZE_LIMITS[instance_type] else "heuristic"
+    if (instance_type, mode) not in _TEMPLATES:
+        # 沒有啟發法的類型（Knapsack / NSP）仍走精確模型，靠 TIME_LIMIT 控制時間
+        mode = "exact"
+    code = f"TIME_LIMIT = {time_limit!r}\n" + _TEMPLATES[(instance_type, mode)].lstrip("\n")
+    return f"{instance_type}/{mode}", code
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The pipeline modules are imported flat (`from code_repair import ...`), as model.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import pytest
+
+from code_repair import repair_pulp_code
+
+
+PROBLEM = 'import pulp\nprob = pulp.LpProblem("p", pulp.LpMaximize)\nx = pulp.LpVariable.dicts("x", range(3), lowBound=0)\n'
+
+# Programs that must come back unchanged: numeric casts of plain Python values and `+=` on non-problem targets
+UNCHANGED = [
+    ("float of a data cell", PROBLEM + "row = ['a', 'b', '2.5']\nc = float(row[2])\n"),
+    ("int of len()", PROBLEM + "items = [1, 2]\nk = int(len(items))\n"),
+    ("round of a plain total", PROBLEM + "total = 1.234\nr = round(total, 2)\n"),
+    ("int of a solved value", PROBLEM + "prob.solve(pulp.PULP_CBC_CMD(msg=False))\nv = int(x[0].varValue)\n"),
+    ("float of pulp.value()", PROBLEM + "prob.solve(pulp.PULP_CBC_CMD(msg=False))\nv = float(pulp.value(prob.objective))\n"),
+    ("counter += comparison", PROBLEM + "a, b, count = 2, 1, 0\ncount += a > b\n"),
+    ("no LpProblem at all", "a, b, count = 2, 1, 0\ncount += a > b\nn = int(3.7)\n"),
+]
+
+# (description, program, fix that must be reported, text that must appear in the repaired program)
+REPAIRED = [
+    ("int of an LpVariable", PROBLEM + "k = int(x[0])\n", "int() on PuLP expressions", "int(_repair_lp_value(x[0]))"),
+    ("float of an lpSum", PROBLEM + "total = pulp.lpSum(x.values())\nv = float(total)\n",
+     "float() on PuLP expressions", "float(_repair_lp_value(total))"),
+    ("round of the objective", PROBLEM + "prob += x[0] + x[1]\nr = round(prob.objective)\n",
+     "round() on PuLP expressions", "round(_repair_lp_value(prob.objective))"),
+    ("float of an expression built from x", PROBLEM + "expr = 2 * x[1] + 3\nv = float(expr)\n",
+     "float() on PuLP expressions", "float(_repair_lp_value(expr))"),
+    ("strict constraint", PROBLEM + "prob += x[0] + x[1] < 4\n", "strict '<'/'>' constraint", "x[0] + x[1] <= 4"),
+    ("strict named constraint", PROBLEM + 'prob += (x[0] > 1, "lower bound")\n', "strict '<'/'>' constraint", "x[0] >= 1"),
+    ("spaces in a constraint name", PROBLEM + 'prob += (x[0] <= 1, "upper bound")\n',
+     "spaces removed from constraint name", "'upper_bound'"),
+    ("spaces in a variable name", PROBLEM + 'y = pulp.LpVariable("my var", lowBound=0)\n',
+     "spaces removed from LpVariable() name", "'my_var'"),
+    ("bare solve()", PROBLEM + "prob.solve()\n", "prob.solve() given PULP_CBC_CMD(msg=False)",
+     "prob.solve(pulp.PULP_CBC_CMD(msg=False))"),
+    ("PULP_CBC_CMD without import", PROBLEM + "prob.solve(PULP_CBC_CMD())\n",
+     "PULP_CBC_CMD referenced through the pulp module", "pulp.PULP_CBC_CMD(msg=False)"),
+]
+
+
+@pytest.mark.parametrize("description, code", UNCHANGED, ids=[case[0] for case in UNCHANGED])
+def test_plain_python_is_left_alone(description, code):
+    assert repair_pulp_code(code) == (code, [])
+
+
+@pytest.mark.parametrize("description, code, fix, expected", REPAIRED, ids=[case[0] for case in REPAIRED])
+def test_pulp_mistakes_are_repaired(description, code, fix, expected):
+    repaired, fixes = repair_pulp_code(code)
+    assert any(f.startswith(fix) for f in fixes), fixes
+    assert expected in repaired
+
+
+def test_repaired_casts_run():
+    repaired, _ = repair_pulp_code(PROBLEM + "prob += x[0]\nprob += x[0] <= 4\nprob.solve()\nresult = int(x[0]) + round(prob.objective)\n")
+    namespace = {}
+    exec(repaired, namespace)
+    assert namespace["result"] == 8
+
+
+def test_unparsable_code_is_returned_unchanged():
+    code = "def broken(:\n    pass\n"
+    assert repair_pulp_code(code) == (code, [])
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from exec_output import KILLED_SENTINEL, RESULT_SENTINEL
+from sandbox import SandboxPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(workers=1, wall_seconds=3, memory_mb=512)
+    yield pool
+    pool.close()
+
+
+# (description, program, expected status, text expected in the output)
+CASES = [
+    ("report", "print('Objective value: 5')\nreport(objective=5, status='Optimal', variables={'x': 1})\n",
+     "ok", RESULT_SENTINEL),
+    ("infinite loop", "while True:\n    pass\n", "timeout", KILLED_SENTINEL),
+    ("memory blow-up", "blocks = []\nwhile True:\n    blocks.append(bytearray(64 * 1024 * 1024))\n",
+     "memory_limit", KILLED_SENTINEL),
+    ("runtime error", "raise ValueError('bad data')\n", "error", "ValueError"),
+]
+
+
+@pytest.mark.parametrize("description, code, status, text", CASES, ids=[case[0] for case in CASES])
+def test_run(pool, description, code, status, text):
+    result = pool.run(code)
+    assert result["status"] == status, result["output"]
+    assert text in result["output"]
+
+
+def test_report_record(pool):
+    result = pool.run("report(objective=5, status='Optimal', variables={'x': 1})\n")
+    line = next(line for line in result["output"].splitlines() if line.startswith(RESULT_SENTINEL))
+    record = json.loads(line[len(RESULT_SENTINEL):])
+    assert record["objective"] == 5
+    assert record["status"] == "Optimal"
+
+
+def test_worker_survives_killed_jobs(pool):
+    pool.run("while True:\n    pass\n")
+    result = pool.run("print('Objective value: 1')\n")
+    assert result["status"] == "ok"
+    assert "Objective value: 1" in result["output"]
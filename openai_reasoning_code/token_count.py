@@ -0,0 +1,42 @@
+try:
+    import tiktoken
+except ImportError:  # 沒有 tiktoken 時用字元數估算
+    tiktoken = None
+
+
+""" 🌟 本地 token 計數
+
+o-series / gpt-4o 系列使用 o200k_base；沒有安裝 tiktoken，或 tiktoken 載不到編碼檔（離線、沒有快取）時，
+以「每 4 個字元約 1 token」估算。
+"""
+
+DEFAULT_ENCODING = "o200k_base"
+_encodings = {}
+_failed_encodings = {}  # encoding name -> load error; not retried (each retry would wait on the network again)
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(encoding_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _encoding(encoding_name: str):
+    if tiktoken is None or encoding_name in _failed_encodings:
+        return None
+    if encoding_name not in _encodings:
+        try:
+            _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+        except Exception as e:  # the BPE file is downloaded on first use
+            _failed_encodings[encoding_name] = f"{type(e).__name__}: {e}"
+            print(f"[Tokens] tiktoken could not load {encoding_name} ({type(e).__name__}); using the chars/4 estimate.")
+            return None
+    return _encodings[encoding_name]
+
+
+def is_estimate(encoding_name: str = DEFAULT_ENCODING) -> bool:
+    """True 表示 count_tokens 回傳的是字元數估算值（沒有 tiktoken，或編碼檔載入失敗）。"""
+    return _encoding(encoding_name) is None